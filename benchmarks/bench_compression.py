@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+'''
+Compression ratio and read/write throughput of the compressed tree file formats.
+
+cd benchmarks
+python3 bench_compression.py
+'''
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from generate_library import generate_library
+
+from academic_publication_manager.modules.storage import storage_for_path, JSON_EXTENSION
+
+SIZES = [10000, 50000]
+EXTENSIONS = ["", ".gz", ".xz", ".bz2"]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'entries':>8} {'format':>7} {'MB':>7} {'ratio':>6} {'write':>8} {'read':>8} {'write MB/s':>11} {'read MB/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in SIZES:
+            library = generate_library(n)
+            raw_mb = None
+            for extension in EXTENSIONS:
+                path = os.path.join(directory, f"lib{n}{JSON_EXTENSION}{extension}")
+                storage = storage_for_path(path)
+                storage.use_cache = False
+                t_write, _ = timed(lambda: storage.write_tree(library))
+                size_mb = os.path.getsize(path) / 1e6
+                if raw_mb is None:
+                    raw_mb = size_mb
+
+                storage = storage_for_path(path)
+                storage.use_cache = False
+                t_read, data = timed(storage.load)
+                assert data == library
+
+                print(f"{n:>8} {extension or 'json':>7} {size_mb:>7.1f} {raw_mb / size_mb:>6.1f} "
+                      f"{t_write:>7.3f}s {t_read:>7.3f}s {raw_mb / t_write:>11.1f} {raw_mb / t_read:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+'''
+Export of productions to a .bib file: the previous exporter, which built a BibDatabase
+and a BibTexWriter per entry and concatenated the whole output in a string, vs. the
+streaming exporter, which formats each entry once and writes it to the file. The old
+exporter modifies the productions, so it runs on a copy made before the timing.
+
+cd benchmarks
+python3 bench_export.py
+'''
+
+import os
+import sys
+import copy
+import time
+import tempfile
+import tracemalloc
+
+import bibtexparser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from generate_library import generate_library
+
+from academic_publication_manager.modules.interning import Interner
+from academic_publication_manager.modules.to_bibtex import write_bibtex
+
+SIZES = [10000, 100000]
+
+
+def old_export(productions, id_list, path):
+    out = ""
+    for prod_id in id_list:
+        entry = productions[prod_id]
+        entry["ID"] = prod_id
+        entry["ENTRYTYPE"] = entry.pop("entry-type")
+        bib_db = bibtexparser.bibdatabase.BibDatabase()
+        bib_db.entries = [entry]
+        writer = bibtexparser.bwriter.BibTexWriter()
+        writer.indent = "  "
+        writer.order_entries_by = ("ID",)
+        out += writer.write(bib_db) + "\n\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(out)
+
+
+def new_export(productions, id_list, path):
+    with open(path, "w", encoding="utf-8") as f:
+        write_bibtex(f, productions, id_list)
+
+
+def measure(func, productions, id_list, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(productions, id_list, path)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    print(f"{'entries':>8} {'exporter':>9} {'time':>8} {'entries/s':>10} {'MB/s':>7} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in SIZES:
+            interner = Interner()
+            productions = {prod_id: interner.compact(production)
+                           for prod_id, production in generate_library(n)["productions"].items()}
+            id_list = list(productions)
+            plain = {prod_id: dict(production.items()) for prod_id, production in productions.items()}
+
+            old_path = os.path.join(directory, "old.bib")
+            new_path = os.path.join(directory, "new.bib")
+            results = [
+                ("old", measure(old_export, copy.deepcopy(plain), id_list, old_path), old_path),
+                ("stream", measure(new_export, productions, id_list, new_path), new_path),
+            ]
+            for name, (seconds, peak), path in results:
+                mb = os.path.getsize(path) / 1e6
+                print(f"{n:>8} {name:>9} {seconds:>7.2f}s {n / seconds:>10.0f} {mb / seconds:>7.1f} {peak / 1e6:>8.1f}")
+
+            with open(old_path, encoding="utf-8") as f_old, open(new_path, encoding="utf-8") as f_new:
+                assert f_old.read() == f_new.read(), "the exporters wrote different files"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+'''
+Memory used by the productions of a tree file, measured with tracemalloc: plain dicts
+as parsed from the JSON file vs. the compact interned Records built by the loaders.
+The load times include the overhead of tracemalloc.
+
+cd benchmarks
+python3 bench_interning.py
+'''
+
+import os
+import sys
+import gc
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from generate_library import generate_library
+
+from academic_publication_manager.modules.storage    import JsonStorage
+from academic_publication_manager.modules.treefile   import atomic_write_json
+from academic_publication_manager.modules.treeloader import iter_tree_file
+
+SIZES = [10000, 100000]
+
+
+def load_plain(path):
+    # Carga sem interning: um dict por produção, como o JSON é analisado
+    data = {"productions": {}}
+    with open(path, 'rb') as f:
+        for kind, key, value in iter_tree_file(f):
+            if kind == "section":
+                data[key] = value
+            else:
+                data["productions"][key] = value
+    return data
+
+
+def load_compact(path):
+    return JsonStorage(path, use_cache=False).load()
+
+
+def measure(func, path):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = func(path)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak, seconds, data
+
+
+def main():
+    print(f"{'entries':>8} {'loader':>8} {'MB':>8} {'peak MB':>8} {'B/entry':>8} {'load':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in SIZES:
+            path = os.path.join(directory, f"lib{n}.Publications.json")
+            atomic_write_json(path, generate_library(n))
+            results = {}
+            for name, func in (("dict", load_plain), ("compact", load_compact)):
+                current, peak, seconds, data = measure(func, path)
+                results[name] = data
+                print(f"{n:>8} {name:>8} {current / 1e6:>8.1f} {peak / 1e6:>8.1f} "
+                      f"{current / n:>8.0f} {seconds:>7.2f}s")
+                del data
+            assert results["dict"]["productions"] == results["compact"]["productions"]
+
+
+if __name__ == "__main__":
+    main()
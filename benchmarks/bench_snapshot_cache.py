@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+'''
+Cold vs. warm open time of *.Publications.json files with the snapshot cache.
+
+cd benchmarks
+python3 bench_snapshot_cache.py
+'''
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from generate_library import generate_library
+
+from academic_publication_manager.modules.storage  import JsonStorage
+from academic_publication_manager.modules.treefile import atomic_write_json
+
+SIZES = [10000, 50000, 100000]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'entries':>8} {'MB':>7} {'json.load':>10} {'cold':>8} {'cold+cache':>11} {'warm':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in SIZES:
+            path = os.path.join(directory, f"lib{n}.Publications.json")
+            atomic_write_json(path, generate_library(n))
+            size_mb = os.path.getsize(path) / 1e6
+
+            def json_load():
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+
+            t_json, reference = timed(json_load)
+            t_cold, _ = timed(JsonStorage(path, use_cache=False).load)
+            t_build, _ = timed(JsonStorage(path).load)
+            t_warm, data = timed(JsonStorage(path).load)
+            assert data == reference
+
+            print(f"{n:>8} {size_mb:>7.1f} {t_json:>9.3f}s {t_cold:>7.3f}s {t_build:>10.3f}s {t_warm:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
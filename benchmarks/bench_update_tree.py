@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+'''
+update_tree() on a tree of 50k nodes, with every folder expanded and every row
+painted once (DecorationRole -> 16x16 pixmap): one new QIcon per row, as the
+QTreeWidget version did, vs. the icons shared through modules/icons.py.
+
+cd benchmarks
+QT_QPA_PLATFORM=offscreen python3 bench_update_tree.py
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore    import Qt, QModelIndex
+from PyQt5.QtGui     import QIcon
+
+from generate_library import generate_library
+
+from academic_publication_manager.modules.resources import resource_path
+from academic_publication_manager.modules.icons     import preload_icons
+from academic_publication_manager.modules.treemodel import StructureModel
+
+N_PRODUCTIONS = 50000
+
+
+class PerItemIconModel(StructureModel):
+    # Um QIcon novo (e um PNG decodificado) por linha, como no populate_tree antigo
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and index.isValid():
+            name = 'file.png' if self.node(index).is_production else 'folder.png'
+            return QIcon(resource_path('icons', name))
+        return super().data(index, role)
+
+
+def update_tree(model, data):
+    # Reconstrói a árvore, cria todas as linhas e pinta cada ícone uma vez
+    model.set_tree(data)
+    stack = [QModelIndex()]
+    rows = 0
+    while stack:
+        parent = stack.pop()
+        while model.canFetchMore(parent):
+            model.fetchMore(parent)
+        for row in range(model.rowCount(parent)):
+            index = model.index(row, 0, parent)
+            model.data(index, Qt.DisplayRole)
+            model.data(index, Qt.DecorationRole).pixmap(16, 16)
+            rows += 1
+            stack.append(index)
+    return rows
+
+
+def main():
+    app = QApplication(sys.argv)
+    data = generate_library(N_PRODUCTIONS)
+
+    start = time.perf_counter()
+    preload_icons()
+    print(f"preload_icons: {time.perf_counter() - start:.3f}s")
+
+    print(f"{'icons':>10} {'nodes':>8} {'update_tree':>12}")
+    for name, model in (("per item", PerItemIconModel()), ("shared", StructureModel())):
+        start = time.perf_counter()
+        rows = update_tree(model, data)
+        print(f"{name:>10} {rows:>8} {time.perf_counter() - start:>11.2f}s")
+
+
+if __name__ == "__main__":
+    main()
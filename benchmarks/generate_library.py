@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+'''
+Generates synthetic libraries for the benchmarks.
+
+cd benchmarks
+python3 generate_library.py 100000 /tmp/big.Publications.json
+'''
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from academic_publication_manager.modules.production import bibtex_examples
+from academic_publication_manager.modules.to_bibtex  import reorder_dict
+
+JOURNALS = ["Journal of Examples", "Pattern Recognition", "IEEE Access", "Neurocomputing",
+            "Information Sciences", "Expert Systems with Applications"]
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def generate_library(n_productions, n_groups=20, n_projects=10, seed=0):
+    """
+    Creates a data tree with n_productions productions spread over groups and projects.
+
+    Args:
+        n_productions (int): Number of productions.
+        n_groups (int): Number of folders inside Root.
+        n_projects (int): Number of folders inside each group.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: Tree with the keys "structure" and "productions".
+    """
+    rng = random.Random(seed)
+    root = {}
+    folders = []
+    for g in range(n_groups):
+        group = root.setdefault(f"Group {g}", {})
+        for p in range(n_projects):
+            folders.append(group.setdefault(f"Project {p}", {}))
+
+    entry_types = list(bibtex_examples)
+    productions = {}
+    for i in range(n_productions):
+        entry_type = rng.choice(entry_types)
+        entry = {key: "" for key in bibtex_examples[entry_type]}
+        entry["entry-type"] = entry_type
+        entry["title"] = f"On the example number {i} of {rng.choice(['learning', 'vision', 'signals', 'graphs'])}"
+        entry["author"] = " and ".join(f"Author{rng.randrange(5000)}, A." for _ in range(rng.randint(1, 5)))
+        entry["year"] = str(rng.randint(1990, 2025))
+        if "journal" in entry:
+            entry["journal"] = rng.choice(JOURNALS)
+        if "month" in entry:
+            entry["month"] = rng.choice(MONTHS)
+        if "pages" in entry:
+            start = rng.randint(1, 900)
+            entry["pages"] = f"{start}-{start + rng.randint(5, 30)}"
+        prod_id = f"author{i}_{entry['year']}"
+        productions[prod_id] = reorder_dict(entry, priority_keys=["entry-type", "title", "year"], en_alpha=True)
+        rng.choice(folders)[prod_id] = None
+
+    return {"structure": {"Root": root}, "productions": productions}
+
+
+if __name__ == "__main__":
+    import json
+
+    data = generate_library(int(sys.argv[1]))
+    with open(sys.argv[2], 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
@@ -1,9 +1,12 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSplitter, QScrollArea, QPushButton, QTableWidget, QLineEdit, QMessageBox, QTextEdit, QFormLayout
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSplitter, QScrollArea, QPushButton, QTableView, QLineEdit, QMessageBox, QTextEdit, QAbstractItemView
+from PyQt5.QtCore import Qt, QTimer
 
 import json
 
-from academic_publication_manager.modules.customtreeview import CustomTreeWidget
+from academic_publication_manager.modules.customtreeview import CustomTreeView
+from academic_publication_manager.modules.treemodel      import StructureModel
+from academic_publication_manager.modules.tablemodel     import ProductionTableModel, FILTER_DELAY_MS
+from academic_publication_manager.modules.metadataform   import MetadataFormPool
 
 class BaseBodyUi:
     def init_ui(self):
@@ -14,7 +17,7 @@ class BaseBodyUi:
         - The central widget and main layout
         - A vertical splitter dividing top and bottom sections
         - A horizontal splitter in the top section for tree view and metadata panel
-        - A custom tree widget for folder structure
+        - A custom tree view over the model of the folder structure
         - A metadata panel with scrollable area
         - A bottom section with table view and filter input
         """
@@ -33,20 +36,25 @@ class BaseBodyUi:
 
         top_layout.addWidget(horizontal_splitter)
 
-        # Use CustomTreeWidget instead of QTreeWidget
-        self.tree_widget = CustomTreeWidget(self)  # Pass self as parent to access BibManager methods
-        self.tree_widget.setHeaderLabel("Folder structure")
-        self.tree_widget.itemClicked.connect(self.on_tree_item_clicked)
-        self.tree_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.tree_widget.customContextMenuRequested.connect(self.show_context_menu)
-        horizontal_splitter.addWidget(self.tree_widget)
+        # The model updates only the rows that change, see StructureModel
+        self.tree_model = StructureModel(self)
+        self.tree_view = CustomTreeView(self)  # Pass self as parent to access BibManager methods
+        self.tree_view.setModel(self.tree_model)
+        self.tree_view.clicked.connect(self.on_tree_item_clicked)
+        self.tree_view.expanded.connect(self.on_tree_item_expanded)
+        self.tree_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree_view.customContextMenuRequested.connect(self.show_context_menu)
+        horizontal_splitter.addWidget(self.tree_view)
 
         self.general_panel = QWidget()
         self.general_layout = QVBoxLayout(self.general_panel)
         
         self.metadata_panel = QWidget()
         self.general_layout.addWidget(self.metadata_panel)
-        metadata_layout = QFormLayout(self.metadata_panel)
+        metadata_layout = QVBoxLayout(self.metadata_panel)
+        metadata_layout.setContentsMargins(0, 0, 0, 0)
+        # One form per set of fields, reused when another production is shown
+        self.metadata_forms = MetadataFormPool(metadata_layout)
         self.metadata_fields = {}
         self.metadata_panel.setEnabled(False)
 
@@ -68,38 +76,47 @@ class BaseBodyUi:
         bottom_layout = QVBoxLayout(bottom_widget)
         vertical_splitter.addWidget(bottom_widget)
 
-        TITLES = ["Title", "Year", "ID"]
+        # The table reads the rows from the productions only when they are shown, and
+        # sorts and filters them itself
+        self.table_model = ProductionTableModel(self)
 
-        self.table_widget = QTableWidget()
-        self.table_widget.setColumnCount(len(TITLES))
-        self.table_widget.setHorizontalHeaderLabels(TITLES)
-        self.table_widget.cellClicked.connect(self.on_table_row_clicked)
-        self.table_widget.setSortingEnabled(True)
-        bottom_layout.addWidget(self.table_widget)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_view.clicked.connect(self.on_table_row_clicked)
+        # Sem ordenação até o usuário clicar num cabeçalho
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        bottom_layout.addWidget(self.table_view)
 
         self.filter_input = QLineEdit()
         self.filter_input.setPlaceholderText("Filter by title or year...")
-        self.filter_input.textChanged.connect(self.filter_table)
+        # The filter runs once the typing pauses, not on every key
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.filter_table)
+        self.filter_input.textChanged.connect(self.filter_timer.start)
         bottom_layout.addWidget(self.filter_input)
 
 
         horizontal_splitter.setSizes([300, 300])
 
-    def on_tree_item_clicked(self, item, column):
+    def on_tree_item_clicked(self, index):
         """
         Handle click events on tree items.
         
         Args:
-            item (QTreeWidgetItem): The clicked tree item
-            column (int): The column index that was clicked
+            index (QModelIndex): The clicked tree item
             
         This method:
-        - Clears the table widget
+        - Clears the table
         - If the item has associated data, loads its metadata and updates the table
         - Otherwise, disables metadata panel and loads productions for the selected folder
         """
-        self.table_widget.setRowCount(0)
-        data = item.data(0, Qt.UserRole)
+        self.table_model.clear()
+        data = index.data(Qt.UserRole)
         if data:
             self.load_metadata(data)
             self.update_table([data])
@@ -107,11 +124,22 @@ class BaseBodyUi:
             self.metadata_panel.setEnabled(False)
             self.save_metadata_btn.setEnabled(False)
             self.current_prod_id = None
-            path = self.get_item_path(item)
+            path = self.get_item_path(index)
             productions = self.get_productions_in_folder(path)
             self.update_table(productions)
 
 
+    def on_tree_item_expanded(self, index):
+        """
+        Reads the content of an expanded folder if it is still on disk (sharded trees).
+
+        Args:
+            index (QModelIndex): The expanded tree item
+        """
+        if not index.data(Qt.UserRole):
+            self.ensure_loaded(self.get_item_path(index), recursive=False)
+
+
     def save_metadata_func(self):
         """
         Save the current metadata to the data structure.
@@ -120,17 +148,19 @@ class BaseBodyUi:
         - Validates that a production is selected
         - Collects metadata from all fields
         - Attempts to parse JSON data if field values look like JSON
-        - Updates the production data
-        - Saves to file
-        - Updates the tree and table views
-        - Restores expanded items in the tree
+        - Updates the changed fields of the production as one undo step, which
+          saves the file and updates the rows of the production in the tree
+        - Updates the table view
         """
         if not self.current_prod_id:
             QMessageBox.warning(self, "Warning", "No production selected to save metadata.")
             return
+        if self.is_loading():
+            return
         
         prod_id, path = self.current_prod_id
         prod = self.data["productions"].get(prod_id, {})
+        records = []
         
         for key, edit in self.metadata_fields.items():
         
@@ -138,38 +168,31 @@ class BaseBodyUi:
                 value = edit.toPlainText()
             else: 
                 value = edit.text()
- 
-            prod[key] = value
-        
-        
-        self.data["productions"][prod_id] = prod
-        
-        self.save_file()
+            
+            if prod.get(key) != value:
+                records.append(dict(op="update-field", id=prod_id, key=key, value=value))
         
-        expanded_items = self.get_expanded_items()
-        self.update_tree()
-        self.restore_expanded_items(expanded_items)
+        # update-field copia o registro: os snapshots gravados podem ainda referenciá-lo
+        self.apply_changes(records, f"Edit {prod_id}")
         
         self.update_table([(prod_id, path)])
 
-    def on_table_row_clicked(self, row, column):
+    def on_table_row_clicked(self, index):
         """
         Handle click events on table rows.
         
         Args:
-            row (int): The clicked row index
-            column (int): The clicked column index
+            index (QModelIndex): The clicked cell
             
         This method:
         - Gets the production ID from the clicked row
         - Loads metadata for the selected production if valid
         - Otherwise disables the metadata panel
         """
+        row_data = index.data(Qt.UserRole) if index.isValid() else None
         
-        ID_COL_POS = 2 # Column posicion of bibliographic publication ID 
-        
-        if row >= 0 and self.table_widget.item(row, ID_COL_POS):
-            prod_id = self.table_widget.item(row, ID_COL_POS).text()
+        if row_data:
+            prod_id = row_data[0]
             path = self.get_production_path(prod_id)
             if path:
                 self.load_metadata((prod_id, path))
@@ -183,21 +206,16 @@ class BaseBodyUi:
         """
         Filter the table contents based on the filter input text.
         
-        The filtering is case-insensitive and matches against both title and ID columns.
-        Rows are hidden if they don't contain the filter text in either column.
+        Called when the typing pauses (see filter_timer). The filtering is case-insensitive
+        and matches against the title, year and ID columns; rows that don't contain the
+        filter text in any column are hidden.
         """
-        filter_text = self.filter_input.text().lower()
-        for row in range(self.table_widget.rowCount()):
-            title   = self.table_widget.item(row, 0).text().lower() if self.table_widget.item(row, 0) else ""
-            year    = self.table_widget.item(row, 1).text().lower() if self.table_widget.item(row, 1) else ""
-            prod_id = self.table_widget.item(row, 2).text().lower() if self.table_widget.item(row, 2) else ""
-            visible = filter_text in title or filter_text in year or filter_text in prod_id
-            self.table_widget.setRowHidden(row, not visible)
+        self.table_model.set_filter(self.filter_input.text())
 
 
     def show_context_menu(self):
         """
-        Show a context menu for the tree widget.
+        Show a context menu for the tree view.
         
         Note:
             This is an abstract method that must be implemented by subclasses.
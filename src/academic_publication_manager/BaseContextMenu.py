@@ -1,15 +1,15 @@
 from PyQt5.QtWidgets import QMenu, QMessageBox, QInputDialog, QLineEdit, QFileDialog
-from PyQt5.QtGui     import QIcon
-from PyQt5.QtCore    import Qt
+from PyQt5.QtCore    import Qt, QItemSelectionModel
 
 from copy import deepcopy
 import copy
 
-from academic_publication_manager.modules.resources   import resource_path
+from academic_publication_manager.modules.icons       import get_icon
 from academic_publication_manager.modules.production  import bibtex_examples
 from academic_publication_manager.modules.to_bibtex   import reorder_dict
-from academic_publication_manager.modules.to_bibtex   import id_list_to_bibtex_string
-from academic_publication_manager.modules.to_bibtex   import bibtex_to_dicts
+from academic_publication_manager.modules.journal     import get_folder
+from academic_publication_manager.modules.bibimport   import find_bib_files, bib_file_folders
+from academic_publication_manager.modules.bibsync     import sync_state
 
 class BaseContextMenu:
     def show_context_menu(self, position):
@@ -22,43 +22,48 @@ class BaseContextMenu:
         The menu items vary depending on whether the clicked item is a production (leaf node)
         or a folder (parent node).
         """
-        item = self.tree_widget.itemAt(position)
-        if item:
+        index = self.tree_view.indexAt(position)
+        indexes = self.selected_tree_indexes(index)
+        if len(indexes) > 1:
+            if not self.is_loading() and all(self.ensure_loaded(self.get_item_path(i)) for i in indexes):
+                self.show_batch_context_menu(indexes, position)
+            return
+        if index.isValid() and not self.is_loading() and self.ensure_loaded(self.get_item_path(index)):
             menu = QMenu()
             
             # Delete 
-            delete_action = menu.addAction( QIcon(resource_path('icons', 'edit-delete.png')), "Delete")
+            delete_action = menu.addAction( get_icon('edit-delete.png'), "Delete")
             delete_action.setStatusTip("Delete the current element")
-            delete_action.triggered.connect(lambda: self.delete_item(item))
+            delete_action.triggered.connect(lambda: self.delete_item(index))
             
             # Separator
             menu.addSeparator()
             
-            if item.data(0, Qt.UserRole):  # It's a production (leaf node)
+            if index.data(Qt.UserRole):  # It's a production (leaf node)
                 
                 # Change ID
-                change_id_action = menu.addAction(  QIcon(resource_path('icons', 'edit_file.png')), "Change ID")
+                change_id_action = menu.addAction(  get_icon('edit_file.png'), "Change ID")
                 change_id_action.setStatusTip("Change the ID name of current bibliographic production")
-                change_id_action.triggered.connect(lambda: self.change_production_id(item))
+                change_id_action.triggered.connect(lambda: self.change_production_id(index))
                 
                 # Duplicate
-                duplicate_action = menu.addAction(  QIcon(resource_path('icons', 'copy_file.png')), "Duplicate Publication")
+                duplicate_action = menu.addAction(  get_icon('copy_file.png'), "Duplicate Publication")
                 duplicate_action.setStatusTip("Duplicate the current bibliographic production with another ID name")
-                duplicate_action.triggered.connect(lambda: self.duplicate_production(item))
+                duplicate_action.triggered.connect(lambda: self.duplicate_production(index))
                 
                 # Separator
                 menu.addSeparator()
                 
             else:  # It's a folder
                 # New folder
-                new_folder_action = menu.addAction( QIcon(resource_path('icons', 'new_folder.png')), "New folder")
+                new_folder_action = menu.addAction( get_icon('new_folder.png'), "New folder")
                 new_folder_action.setStatusTip("Create a new folder inside the current folder")
-                new_folder_action.triggered.connect(lambda: self.create_new_folder(item))
+                new_folder_action.triggered.connect(lambda: self.create_new_folder(index))
                 
                 # Rename folder
-                rename_folder_action = menu.addAction(  QIcon(resource_path('icons', 'folder.png')), "Rename folder")
+                rename_folder_action = menu.addAction(  get_icon('folder.png'), "Rename folder")
                 rename_folder_action.setStatusTip("Rename the current folder")
-                rename_folder_action.triggered.connect(lambda: self.rename_folder(item))
+                rename_folder_action.triggered.connect(lambda: self.rename_folder(index))
 
                 # new prduction
                 menu_production = QMenu("New production", self)
@@ -66,11 +71,11 @@ class BaseContextMenu:
                 
                 # New production
                 for entry_type in bibtex_examples:
-                    new_production_action = menu_production.addAction( QIcon(resource_path('icons', 'save_file.png')), entry_type)
+                    new_production_action = menu_production.addAction( get_icon('new_file.png'), entry_type)
                     new_production_action.setStatusTip("Add a new bibliographic production of type:"+" "+entry_type)
                     
                     new_production_action.triggered.connect(
-                        lambda checked=False, et=entry_type: self.create_new_production(item, et)
+                        lambda checked=False, et=entry_type: self.create_new_production(index, et)
                     )
 
                 for action in menu_production.actions():
@@ -80,15 +85,25 @@ class BaseContextMenu:
                 menu.addSeparator()
                 
                 # load bibfile
-                loadfrombib_action = menu.addAction( QIcon(resource_path('icons', 'open_file.png')), "Load from *.bib")
-                loadfrombib_action.setStatusTip("Load many bibliographic productions from a *.bib file")
-                loadfrombib_action.triggered.connect(lambda: self.loadfrombib_item(item))
+                loadfrombib_action = menu.addAction( get_icon('open_file.png'), "Load from *.bib")
+                loadfrombib_action.setStatusTip("Load many bibliographic productions from one or more *.bib files")
+                loadfrombib_action.triggered.connect(lambda: self.loadfrombib_item(index))
+
+                # load bibfiles from a directory
+                loadfrombibdir_action = menu.addAction( get_icon('open_file.png'), "Load from folder of *.bib")
+                loadfrombibdir_action.setStatusTip("Load the *.bib files of a folder, each one into its own subfolder")
+                loadfrombibdir_action.triggered.connect(lambda: self.loadfrombibdir_item(index))
+
+                # sync from bibfile
+                syncfrombib_action = menu.addAction( get_icon('open_file.png'), "Sync from *.bib")
+                syncfrombib_action.setStatusTip("Update the folder with the entries added, changed or removed in a *.bib file")
+                syncfrombib_action.triggered.connect(lambda: self.syncfrombib_item(index))
             
             
             # Save bibfile
-            saveasbib_action = menu.addAction( QIcon(resource_path('icons', 'save.png')), "Save as *.bib")
+            saveasbib_action = menu.addAction( get_icon('save.png'), "Save as *.bib")
             saveasbib_action.setStatusTip("Save bibliographic productions into a *.bib file")
-            saveasbib_action.triggered.connect(lambda: self.saveasbib_item(item))
+            saveasbib_action.triggered.connect(lambda: self.saveasbib_item(index))
 
             
             for action in menu.actions():
@@ -96,65 +111,106 @@ class BaseContextMenu:
             
                       
                 
-            menu.exec_(self.tree_widget.viewport().mapToGlobal(position))
+            menu.exec_(self.tree_view.viewport().mapToGlobal(position))
 
 
 
-    def collect_production_ids(self, structure):
+    def selected_tree_indexes(self, index):
         """
-        Recursively collects all production IDs from a given folder structure.
+        Gets the items an action applies to: all the selected items if the clicked
+        item is one of them, otherwise only the clicked item.
         
         Args:
-            structure (dict): The folder structure to search through.
+            index (QModelIndex): The clicked item.
             
         Returns:
-            list: A list of all production IDs found in the structure.
+            list: The items (QModelIndex).
+        """
+        if not index.isValid():
+            return []
+        selected = self.tree_view.selectionModel().selectedRows()
+        if index in selected:
+            return selected
+        return [index]
+
+
+    def show_batch_context_menu(self, indexes, position):
+        """
+        Displays the context menu of several selected items. Each action applies to
+        all the items as a single operation (one save and one undo step).
+        
+        Args:
+            indexes (list): The selected items (QModelIndex).
+            position (QPoint): The position where the context menu should appear.
         """
-        prod_ids = []
-        if not isinstance(structure, dict):
-            return prod_ids
-        for key, value in structure.items():
-            if value is None and key in self.data.get("productions", {}):
-                prod_ids.append(key)
-            elif isinstance(value, dict):
-                prod_ids.extend(self.collect_production_ids(value))
-        return prod_ids
+        n = len(indexes)
+        productions = [index for index in indexes if index.data(Qt.UserRole)]
+        menu = QMenu()
+
+        delete_action = menu.addAction(get_icon('edit-delete.png'), f"Delete {n} items")
+        delete_action.setStatusTip("Delete the selected elements")
+        delete_action.triggered.connect(lambda: self.delete_items(indexes))
+
+        move_action = menu.addAction(get_icon('folder.png'), f"Move {n} items to folder...")
+        move_action.setStatusTip("Move the selected elements to another folder")
+        move_action.triggered.connect(lambda: self.move_items_to_folder(indexes))
+
+        if productions:
+            duplicate_action = menu.addAction(get_icon('copy_file.png'), f"Duplicate {len(productions)} publications")
+            duplicate_action.setStatusTip("Duplicate the selected bibliographic productions with new ID names")
+            duplicate_action.triggered.connect(lambda: self.duplicate_productions(productions))
+
+        menu.addSeparator()
+
+        saveasbib_action = menu.addAction(get_icon('save.png'), "Save as *.bib")
+        saveasbib_action.setStatusTip("Save the bibliographic productions of the selected elements into a *.bib file")
+        saveasbib_action.triggered.connect(lambda: self.saveasbib_items(indexes))
+
+        for action in menu.actions():
+            action.hovered.connect(lambda a=action: self.statusBar().showMessage(a.statusTip(), 3000))
+
+        menu.exec_(self.tree_view.viewport().mapToGlobal(position))
 
 
-    def delete_item(self, item):
+    def collect_production_ids(self, path):
+        """
+        Collects all production IDs of a folder and its subfolders.
+        
+        Args:
+            path (list): The path to the folder.
+            
+        Returns:
+            list: A list of all production IDs found in the folder.
+        """
+        productions = self.data.get("productions", {})
+        return [prod_id for prod_id, _ in self.production_index.productions_in(path)
+                if prod_id in productions]
+
+
+    def delete_item(self, index):
         """
         Deletes an item (either a production or folder) from the structure.
         
         Args:
-            item (QTreeWidgetItem): The item to be deleted.
+            index (QModelIndex): The item to be deleted.
             
         Shows a confirmation dialog before deletion. For folders, deletes all
         subfolders and productions recursively.
         """
-        data = item.data(0, Qt.UserRole)
-        item_text = item.text(0).split(" (")[0]
-        path = self.get_item_path(item)
+        data = index.data(Qt.UserRole)
+        path = self.get_item_path(index)
+        item_text = path[-1]
 
         if data:  # It's a production (leaf node)
             prod_id, parent_path = data
             confirm = QMessageBox.question(
                 self, "Confirm Deletion",
-                f"Do you want to delete the output '{item.text(0)}'?",
+                f"Do you want to delete the output '{index.data()}'?",
                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No
             )
             if confirm == QMessageBox.No:
                 return
-                
-            current = self.data["structure"]
-            for key in parent_path:
-                current = current[key]
-            
-            current.pop(prod_id, None)
-            self.data["productions"].pop(prod_id, None)
-            if self.current_prod_id == (prod_id, parent_path):
-                self.current_prod_id = None
-                self.metadata_panel.setEnabled(False)
-                self.save_metadata_btn.setEnabled(False)
+            self.delete_paths([parent_path + [prod_id]], "Delete production")
         else:  # It's a folder
             confirm = QMessageBox.question(
                 self, "Confirm Deletion",
@@ -163,32 +219,132 @@ class BaseContextMenu:
             )
             if confirm == QMessageBox.No:
                 return
-            current = self.data["structure"]
-                        
-            parent = current
-            for key in path:
-                parent = current
-                current = current[key]
+            self.delete_paths([path], "Delete folder")
+
+    def delete_items(self, indexes):
+        """
+        Deletes several items (productions and folders) as a single operation.
+        
+        Args:
+            indexes (list): The selected items (QModelIndex).
             
-            prod_ids = self.collect_production_ids(current)
-            parent.pop(path[-1], None)
-            for prod_id in prod_ids:
-                self.data["productions"].pop(prod_id, None)
-                
-            if self.current_prod_id and self.current_prod_id[1][:len(path)] == path:
-                self.current_prod_id = None
-                self.metadata_panel.setEnabled(False)
-                self.save_metadata_btn.setEnabled(False)
+        Shows one confirmation dialog for all the items.
+        """
+        confirm = QMessageBox.question(
+            self, "Confirm Deletion",
+            f"Do you want to delete the {len(indexes)} selected items, with all their subfolders and productions?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if confirm == QMessageBox.No:
+            return
+        self.delete_paths([self.get_item_path(index) for index in indexes], f"Delete {len(indexes)} items")
+
+    def move_items(self, source_paths, target_path):
+        """
+        Moves folders and productions into a folder as a single operation.
+        
+        The entries are relinked in the structure (nothing is copied), one save is
+        requested for the whole move and only the moved rows change in the tree.
+        
+        An entry whose name is already taken in the destination folder is not moved,
+        so nothing there is replaced; the skipped names are shown in the status bar.
+        
+        Args:
+            source_paths (list): Paths of the moved entries; an entry inside another
+                moved folder goes with it.
+            target_path (list): Path of the destination folder.
+            
+        Returns:
+            list: The new paths of the moved entries.
+        """
+        try:
+            target = get_folder(self.data["structure"], target_path)
+        except (KeyError, TypeError):
+            return []
+        if not isinstance(target, dict):
+            return []
+
+        records = []
+        taken = set(target)
+        skipped = []
+        for path in self.outermost_paths(source_paths):
+            name = path[-1]
+            # Mesma pasta, ou pasta movida para dentro de si mesma
+            if path[:-1] == target_path or target_path[:len(path)] == path:
+                continue
+            try:
+                parent = get_folder(self.data["structure"], path[:-1])
+            except (KeyError, TypeError):
+                continue
+            if not isinstance(parent, dict) or name not in parent:
+                continue
+            if parent[name] is None and name not in self.data["productions"]:
+                continue
+            if name in taken:
+                skipped.append(name)
+                continue
+            taken.add(name)
+            records.append(dict(op="move", src=path, dst=target_path))
+
+        # As entradas são religadas na estrutura, sem cópia
+        moved = self.apply_changes(records, f"Move {len(records)} item(s)")
+        if skipped:
+            self.status_bar.showMessage(f"Not moved, the name already exists in {'/'.join(target_path)}: "
+                                        f"{', '.join(skipped)}", 5000)
+        return [target_path + [record["src"][-1]] for record in moved]
 
-        self.clean_structure(self.data["structure"])
+
+    def outermost_paths(self, paths):
+        """
+        Removes the paths that are inside another path of the list.
         
-        self.save_file()
+        Args:
+            paths (list): Paths of folders and productions.
+            
+        Returns:
+            list: The other paths, shortest first.
+        """
+        outermost = []
+        for path in sorted(paths, key=len):
+            if path and not any(path[:len(other)] == other for other in outermost):
+                outermost.append(path)
+        return outermost
+
+
+    def delete_paths(self, paths, label):
+        """
+        Deletes folders (with all their content) and productions as a single operation.
         
-        expanded_items = self.get_expanded_items()
-        self.update_tree()
-        self.restore_expanded_items(expanded_items)
+        Other references to the deleted productions in the structure are removed too.
         
-        self.table_widget.setRowCount(0)
+        Args:
+            paths (list): Paths of the deleted entries.
+            label (str): Description of the deletion for the undo step.
+        """
+        paths = self.outermost_paths(paths)
+        records = []
+        removed_ids = []
+        for path in paths:
+            try:
+                value = get_folder(self.data["structure"], path)
+            except (KeyError, TypeError):
+                continue
+            if value is None:
+                prod_ids = [path[-1]] if path[-1] in self.data["productions"] else []
+            else:
+                prod_ids = self.collect_production_ids(path)
+            records.append(dict(op="remove", path=path, productions=prod_ids))
+            removed_ids.extend(prod_ids)
+
+        for prod_id in removed_ids:
+            for folder in self.production_index.folders_of(prod_id):
+                ref_path = folder + [prod_id]
+                if not any(ref_path[:len(path)] == path for path in paths):
+                    records.append(dict(op="remove", path=ref_path, productions=[]))
+
+        self.apply_changes(records, label)
+        self.table_model.clear()
+
 
     def extract_id_from_text(self, text):
         """
@@ -223,37 +379,25 @@ class BaseContextMenu:
         Finds a tree item by its path in the structure.
         
         Args:
-            path (list): The path to the item as a list of folder names.
+            path (list): The path to the item as a list of folder names (and the ID of a production).
             
         Returns:
-            QTreeWidgetItem: The found item, or None if not found.
+            QModelIndex: The found item, or None if not found.
         """
-        current_item = self.tree_widget.invisibleRootItem()
-        for name in path:
-            found = False
-            for i in range(current_item.childCount()):
-                child = current_item.child(i)
-                child_text = child.text(0).split(" (")[0]
-                if child_text == name:
-                    current_item = child
-                    found = True
-                    break
-            if not found:
-                return None
-        return current_item
+        return self.tree_model.index_for_path(path)
 
 
-    def change_production_id(self, item):
+    def change_production_id(self, index):
         """
         Changes the ID of a production.
         
         Args:
-            item (QTreeWidgetItem): The production item to modify.
+            index (QModelIndex): The production item to modify.
             
         Shows an input dialog to get the new ID, validates it, and updates
         the structure and productions if valid.
         """
-        old_prod_id, parent_path = item.data(0, Qt.UserRole)
+        old_prod_id, parent_path = index.data(Qt.UserRole)
         while True:
             new_prod_id, ok = QInputDialog.getText( self, 
                                                     "Change ID", 
@@ -271,48 +415,38 @@ class BaseContextMenu:
                 continue
             break
 
-        current = self.data["structure"]
-        for key in parent_path:
-            current = current[key]
-        current[new_prod_id] = current.get(old_prod_id)
-        current.pop(old_prod_id, None)
-        if old_prod_id in self.data["productions"]:
-            self.data["productions"][new_prod_id] = self.data["productions"].pop(old_prod_id)
-
-        if self.current_prod_id == (old_prod_id, parent_path):
+        # Antes de aplicar, para que o painel de metadados continue com a produção
+        was_current = self.current_prod_id == (old_prod_id, parent_path)
+        if was_current:
             self.current_prod_id = (new_prod_id, parent_path)
 
-        self.save_file()
-        self.update_tree()
-
+        record = dict(op="rename", path=parent_path + [old_prod_id], name=new_prod_id, production=True)
+        if not self.apply_changes([record], f"Change ID of {old_prod_id}"):
+            if was_current:
+                self.current_prod_id = (old_prod_id, parent_path)
+            return
 
-        new_item = self.find_tree_item_by_path(parent_path)
-        if new_item:
-            new_item.setExpanded(True)
-            # Now search among children
-            for i in range(new_item.childCount()):
-                child = new_item.child(i)
-                if self.extract_id_from_text(child.text(0)) == new_prod_id:
-                    self.tree_widget.setCurrentItem(child)
-                    break
+        new_item = self.find_tree_item_by_path(parent_path + [new_prod_id])
+        if new_item is not None:
+            self.tree_view.setCurrentIndex(new_item)
 
-        self.table_widget.setRowCount(0)
+        self.table_model.clear()
         if self.current_prod_id:
             self.load_metadata(self.current_prod_id)
             self.update_table([self.current_prod_id])
 
     
-    def duplicate_production(self, item):
+    def duplicate_production(self, index):
         """
         Duplicates a production with a new ID.
         
         Args:
-            item (QTreeWidgetItem): The production item to duplicate.
+            index (QModelIndex): The production item to duplicate.
             
         Shows an input dialog to get the new ID, validates it, creates a copy
         of the production with the new ID, and updates the structure.
         """
-        prod_id, parent_path = item.data(0, Qt.UserRole)
+        prod_id, parent_path = index.data(Qt.UserRole)
         while True:
             new_prod_id, ok = QInputDialog.getText(self, "Duplicate Publication", 
                                                   f"Enter new ID for duplicated '{prod_id}':", 
@@ -329,74 +463,112 @@ class BaseContextMenu:
                 continue
             break
 
-        # Copy metadata from original production
-        original_prod = self.data["productions"].get(prod_id, {})
-        new_prod = deepcopy(original_prod)
-        self.data["productions"][new_prod_id] = new_prod
-
-        # Add new production to the same parent folder
-        current = self.data["structure"]
-        for key in parent_path:
-            current = current[key]
-        current[new_prod_id] = None
-
-        # Save and update interface
-        self.save_file()
-        
-        # Preserve expanded state of the tree
-        expanded_items = self.get_expanded_items()
-        self.update_tree()
-        self.restore_expanded_items(expanded_items)
+        # Copy metadata from original production, into the same parent folder
+        new_prod = deepcopy(self.data["productions"].get(prod_id, {}))
+        record = dict(op="add", path=parent_path, name=new_prod_id, node=None,
+                      productions={new_prod_id: new_prod})
+        if not self.apply_changes([record], f"Duplicate {prod_id}"):
+            return
 
         # Select the new production
-        new_item = self.find_tree_item_by_path(parent_path)
-        if new_item:
-            new_item.setExpanded(True)
-            for i in range(new_item.childCount()):
-                child = new_item.child(i)
-                if self.extract_id_from_text(child.text(0)) == new_prod_id:
-                    self.tree_widget.setCurrentItem(child)
-                    self.on_tree_item_clicked(child, 0)
-                    break
+        new_item = self.find_tree_item_by_path(parent_path + [new_prod_id])
+        if new_item is not None:
+            self.tree_view.setCurrentIndex(new_item)
+            self.on_tree_item_clicked(new_item)
         else:
-            print("Parent item not found after update")
+            self.status_bar.showMessage(f"Duplicated as {new_prod_id}, but the new item was not found in the tree", 5000)
+
+
+    def duplicate_productions(self, indexes):
+        """
+        Duplicates several productions as a single operation, each one in its folder.
+        
+        Args:
+            indexes (list): The production items (QModelIndex).
+            
+        The new IDs are the original IDs followed by "_copy" (and a number if that
+        ID already exists).
+        """
+        records = []
+        used = set()
+        for index in indexes:
+            prod_id, parent_path = index.data(Qt.UserRole)
+            if prod_id not in self.data["productions"]:
+                continue
+            new_prod_id = f"{prod_id}_copy"
+            n = 2
+            while self.production_exists(new_prod_id) or new_prod_id in used:
+                new_prod_id = f"{prod_id}_copy{n}"
+                n += 1
+            used.add(new_prod_id)
+            new_prod = deepcopy(self.data["productions"][prod_id])
+            records.append(dict(op="add", path=parent_path, name=new_prod_id, node=None,
+                                productions={new_prod_id: new_prod}))
+
+        added = self.apply_changes(records, f"Duplicate {len(records)} publications")
+
+        selection = self.tree_view.selectionModel()
+        selection.clearSelection()
+        for record in added:
+            new_item = self.find_tree_item_by_path(record["path"] + [record["name"]])
+            if new_item is not None:
+                selection.select(new_item, QItemSelectionModel.Select | QItemSelectionModel.Rows)
+
+
+    def move_items_to_folder(self, indexes):
+        """
+        Moves several items to a folder chosen in a dialog, as a single operation.
+        
+        Args:
+            indexes (list): The selected items (QModelIndex).
+        """
+        folders = {"/".join(path): path for path in self.production_index.folders()}
+        name, ok = QInputDialog.getItem(self, "Move", "Destination folder:", list(folders), 0, False)
+        if not ok or name not in folders:
+            return
+        target_path = folders[name]
+        if not self.ensure_loaded(target_path):
+            return
+        new_paths = self.move_items([self.get_item_path(index) for index in indexes], target_path)
+
+        selection = self.tree_view.selectionModel()
+        selection.clearSelection()
+        for path in new_paths:
+            new_item = self.find_tree_item_by_path(path)
+            if new_item is not None:
+                selection.select(new_item, QItemSelectionModel.Select | QItemSelectionModel.Rows)
 
 
     def create_new_folder(self, parent_item):
         folder_name, ok = QInputDialog.getText(self, "New tree", "Name of the new folder:")
         if ok and folder_name:
             path = self.get_item_path(parent_item)
-            current = self.data["structure"]
-            for key in path:
-                current = current[key]
-            current[folder_name] = {}
-            self.save_file()
-            
-            expanded_items = self.get_expanded_items()
-            self.update_tree()
-            self.restore_expanded_items(expanded_items)
+            record = dict(op="add", path=path, name=folder_name, node={})
+            if not self.apply_changes([record], f"New folder {folder_name}"):
+                return
             
             new_parent_item = self.find_tree_item_by_path(path)
-            if new_parent_item:
-                new_parent_item.setExpanded(True)
-                self.tree_widget.setCurrentItem(new_parent_item)
+            if new_parent_item is not None:
+                self.tree_view.setExpanded(new_parent_item, True)
+                self.tree_view.setCurrentIndex(new_parent_item)
 
 
     def add_production_to_structure_and_productions(self, parent_path, prod_id, production):
         """
-        Adds a production to both the structure and productions dictionary.
+        Adds a production to both the structure and productions dictionary, as one
+        undo step, and shows it in the tree.
         
         Args:
             parent_path (list): The path to the parent folder.
             prod_id (str): The ID of the new production.
             production (dict): The production data to add.
+            
+        Returns:
+            bool: True if the production was added.
         """
-        current = self.data["structure"]
-        for key in parent_path:
-            current = current[key]
-        
-        current[prod_id] = None
-        self.data["productions"][prod_id] = production
+        record = dict(op="add", path=parent_path, name=prod_id, node=None,
+                      productions={prod_id: production})
+        return bool(self.apply_changes([record], f"New publication {prod_id}"))
 
 
     def create_new_production(self, parent_item, entry_type="article"):
@@ -404,7 +576,7 @@ class BaseContextMenu:
         Creates a new production under the specified parent item.
         
         Args:
-            parent_item (QTreeWidgetItem): The parent item under which to create the new production.
+            parent_item (QModelIndex): The parent item under which to create the new production.
             
         Shows an input dialog to get the production ID, validates it, and adds
         a new production with default metadata.
@@ -423,35 +595,30 @@ class BaseContextMenu:
         ref_entry = copy.deepcopy(bibtex_examples[entry_type])
         ref_entry = reorder_dict(ref_entry, priority_keys=["entry-type","title","year"], en_alpha=True)
 
-        self.add_production_to_structure_and_productions(   parent_path,
-                                                            prod_id,
-                                                            ref_entry)
-        
-        self.save_file()
-        
-        expanded_items = self.get_expanded_items()
-        self.update_tree()
-        self.restore_expanded_items(expanded_items)
+        if not self.add_production_to_structure_and_productions(parent_path,
+                                                                prod_id,
+                                                                ref_entry):
+            return
         
         new_parent_item = self.find_tree_item_by_path(parent_path)
-        if new_parent_item:
-            new_parent_item.setExpanded(True)
-            self.tree_widget.setCurrentItem(new_parent_item)
-            self.on_tree_item_clicked(new_parent_item, 0)
+        if new_parent_item is not None:
+            self.tree_view.setExpanded(new_parent_item, True)
+            self.tree_view.setCurrentIndex(new_parent_item)
+            self.on_tree_item_clicked(new_parent_item)
             
             
-    def rename_folder(self, item):
+    def rename_folder(self, index):
         """
         Renames a folder.
         
         Args:
-            item (QTreeWidgetItem): The folder item to rename.
+            index (QModelIndex): The folder item to rename.
             
         Shows an input dialog to get the new name, validates it, and updates
         the structure if valid.
         """
-        old_name = item.text(0).split(" (")[0]
-        path = self.get_item_path(item)
+        path = self.get_item_path(index)
+        old_name = path[-1]
         new_name, ok = QInputDialog.getText(self, "Rename folder", "New folder name:", QLineEdit.Normal, old_name)
         if ok and new_name and new_name != old_name:
             current = self.data["structure"]
@@ -461,88 +628,111 @@ class BaseContextMenu:
                 QMessageBox.warning(self, "Error", f"The folder '{new_name}' already exists at this level. Please choose another name.")
                 return
             
-            current[new_name] = current.pop(old_name)
-            self.save_file()
-            
-            expanded_items = self.get_expanded_items()
-            self.update_tree()
-            self.restore_expanded_items(expanded_items)
+            if not self.apply_changes([dict(op="rename", path=path, name=new_name)],
+                                      f"Rename folder {old_name}"):
+                return
             
             new_path = path[:-1] + [new_name]
             new_item = self.find_tree_item_by_path(new_path)
-            if new_item:
-                new_item.setExpanded(True)
-                self.tree_widget.setCurrentItem(new_item)
+            if new_item is not None:
+                self.tree_view.setExpanded(new_item, True)
+                self.tree_view.setCurrentIndex(new_item)
 
 
-    def loadfrombib_item(self, item):
+    def loadfrombib_item(self, index):
         """
-        Loads productions from a .bib file into the specified folder.
+        Loads productions from .bib files into the specified folder.
         
         Args:
-            item (QTreeWidgetItem): The folder item where productions will be added.
+            index (QModelIndex): The folder item where productions will be added.
             
-        Shows a file dialog to select a .bib file, parses it, and adds all
-        productions to the folder.
+        Shows a file dialog to select one or more .bib files. The productions of a
+        single file are added to the folder; with several files, each file goes into
+        its own subfolder. The files are parsed in background and the productions are
+        added when all of them have been read.
         """
-        data = item.data(0, Qt.UserRole)
-        item_text = item.text(0)
-        path = self.get_item_path(item)
+        path = self.get_item_path(index)
         
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open BIB File", "", "BIB Files (*.bib)")
-        if file_name:
-            
-            dicts = bibtex_to_dicts(file_name)
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Open BIB Files", "", "BIB Files (*.bib)")
+        if len(file_names) == 1:
+            self.start_bib_import(path, file_names[0])
+        elif file_names:
+            self.start_bulk_bib_import(path, bib_file_folders(file_names))
 
-            for prod_id, production in dicts.items():
-                self.add_production_to_structure_and_productions(   path,
-                                                                    prod_id,
-                                                                    copy.deepcopy(production))
 
-        self.save_file()
+    def loadfrombibdir_item(self, index):
+        """
+        Loads the .bib files of a directory (and of its subdirectories) into the
+        specified folder, each file into a subfolder named after it.
         
-        expanded_items = self.get_expanded_items()
-        self.update_tree()
-        self.restore_expanded_items(expanded_items)
+        Args:
+            index (QModelIndex): The folder item where the subfolders will be added.
+        """
+        path = self.get_item_path(index)
         
+        directory = QFileDialog.getExistingDirectory(self, "Open folder of BIB files")
+        if not directory:
+            return
+        files = find_bib_files(directory)
+        if not files:
+            QMessageBox.information(self, "Import", "There are no *.bib files in this folder.")
+            return
+        self.start_bulk_bib_import(path, files)
         
         
-    def saveasbib_item(self, item):
+    def syncfrombib_item(self, index):
+        """
+        Synchronizes the specified folder with a .bib file.
+        
+        Args:
+            index (QModelIndex): The folder item kept as a mirror of the file.
+            
+        Shows a file dialog to select the .bib file, starting at the file of the last
+        sync of the folder. Only the entries added, changed or removed in the file
+        since the last sync are applied to the folder.
+        """
+        path = self.get_item_path(index)
+        state = sync_state(self.data, path)
+        
+        file_name, _ = QFileDialog.getOpenFileName(self, "Sync from BIB File",
+                                                   state["file"] if state else "", "BIB Files (*.bib)")
+        if file_name:
+            self.start_bib_sync(path, file_name)
+
+
+    def saveasbib_item(self, index):
         """
         Saves productions from an item (folder or single production) to a .bib file.
         
         Args:
-            item (QTreeWidgetItem): The item to save (either a production or folder).
+            index (QModelIndex): The item to save (either a production or folder).
             
         For folders, saves all productions in the folder and subfolders.
         For single productions, saves just that production.
         Shows a file dialog to select the save location.
         """
-        data = item.data(0, Qt.UserRole)
-        item_text = item.text(0).split(" (")[0]
-        path = self.get_item_path(item)
+        self.saveasbib_items([index])
+
+
+    def saveasbib_items(self, indexes):
+        """
+        Saves the productions of several items (folders or single productions) to one .bib file.
         
-        id_list = []
-        if data:  # It's a production (leaf node)
-            prod_id, parent_path = data
-            
-            id_list = [prod_id]
-            
-        else: # It's a folder
-            current = self.data["structure"]
-                        
-            parent = current
-            for key in path:
-                parent = current
-                current = current[key]
+        Args:
+            indexes (list): The items to save (QModelIndex).
             
-            id_list = self.collect_production_ids(current)
+        Each production is saved once, even if it is in more than one of the items.
+        """
+        id_list = []
+        for index in indexes:
+            data = index.data(Qt.UserRole)
+            if data:  # It's a production (leaf node)
+                id_list.append(data[0])
+            else: # It's a folder
+                id_list.extend(self.collect_production_ids(self.get_item_path(index)))
+        id_list = list(dict.fromkeys(id_list))
         
         if len(id_list)>0:
-            print("prod_id:", id_list)
-            
-            output = id_list_to_bibtex_string(self.data["productions"],id_list)          
-                
             # Open save dialog
             options = QFileDialog.Options()
             options |= QFileDialog.DontUseNativeDialog
@@ -559,18 +749,14 @@ class BaseContextMenu:
                 if not file_path.lower().endswith(".bib"):
                     file_path += ".bib"
 
-                try:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(output)
-                    QMessageBox.information(self, "Success", f"File save in:\n{file_path}")
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"It was not possible to save the file:\n{str(e)}")
+                # Gravado em segundo plano, num arquivo temporário renomeado no fim
+                self.start_bib_export(id_list, file_path)
 
             
         else:
             confirm = QMessageBox.question(
                 self, "Warning",
-                f"No productions found in '{item.text(0)}'",
+                f"No productions found in '{indexes[0].data() if len(indexes) == 1 else 'the selected items'}'",
                 QMessageBox.Yes
             )
 
@@ -1,5 +1,5 @@
-from PyQt5.QtGui     import QIcon
-from academic_publication_manager.modules.resources import resource_path
+from PyQt5.QtGui     import QKeySequence
+from academic_publication_manager.modules.icons import get_icon
 
 class BaseMenuBar:
     def init_menubar(self):
@@ -8,22 +8,40 @@ class BaseMenuBar:
         ##
         file_menu = menubar.addMenu("Arquive")
 
-        open_action = file_menu.addAction(QIcon(resource_path('icons', 'open_file.png')), "Open tree from json")
+        open_action = file_menu.addAction(get_icon('open_file.png'), "Open tree from json, compressed json, sqlite or sharded manifest")
         open_action.triggered.connect(self.open_file)
         
-        save_action = file_menu.addAction(QIcon(resource_path('icons', 'save.png')), "Save tree in json")
+        save_action = file_menu.addAction(get_icon('save.png'), "Save tree")
         save_action.triggered.connect(self.save_file)
         
-        new_tree_action = file_menu.addAction(QIcon(resource_path('icons', 'new_file.png')), "New tree")
+        save_as_action = file_menu.addAction(get_icon('save.png'), "Save tree as (json, compressed json, sqlite or sharded)")
+        save_as_action.triggered.connect(self.save_file_as)
+        
+        new_tree_action = file_menu.addAction(get_icon('new_file.png'), "New tree")
         new_tree_action.triggered.connect(self.new_tree)
 
+        ##
+        edit_menu = menubar.addMenu("Edit")
+
+        self.undo_action = edit_menu.addAction(get_icon('edit_file.png'), "Undo")
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        edit_menu.aboutToShow.connect(self.update_undo_action)
+
         ##
         gabout_menu = menubar.addMenu("About")
         
-        about_program_action = gabout_menu.addAction(QIcon(resource_path('icons', 'status_help.png')), "About program")
+        about_program_action = gabout_menu.addAction(get_icon('status_help.png'), "About program")
         about_program_action.triggered.connect(self.about_func)
 
 
+    def update_undo_action(self):
+        label = self.undo_stack.label()
+        self.undo_action.setText(f"Undo {label}" if label else "Undo")
+
+    def undo(self):
+        raise NotImplementedError("Você precisa implementar undo() na classe principal.")
+
     def about_func(self):
         raise NotImplementedError("Você precisa implementar about_func() na classe principal.")
 
@@ -36,3 +54,5 @@ class BaseMenuBar:
     def save_file(self):
         raise NotImplementedError("Você precisa implementar save_file() na classe principal.")
 
+    def save_file_as(self):
+        raise NotImplementedError("Você precisa implementar save_file_as() na classe principal.")
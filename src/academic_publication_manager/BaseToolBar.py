@@ -1,13 +1,31 @@
-import json
+import os
 
-from PyQt5.QtWidgets import QToolButton, QMessageBox, QFileDialog, QWidget, QSizePolicy
-from PyQt5.QtGui     import QIcon, QDesktopServices
+from PyQt5.QtWidgets import QToolButton, QMessageBox, QFileDialog, QWidget, QSizePolicy, QLabel, QProgressBar, QPushButton
+from PyQt5.QtGui     import QDesktopServices
 from PyQt5.QtCore    import Qt, QUrl
 
-from academic_publication_manager.modules.resources import resource_path
+from academic_publication_manager.modules.icons     import get_icon
 from academic_publication_manager.modules.wabout    import show_about_window
+from academic_publication_manager.modules.treefile  import snapshot_tree
+from academic_publication_manager.modules.storage   import storage_for_path, add_tree_extension
+from academic_publication_manager.modules.storage   import OPEN_FILE_FILTER, SAVE_FILE_FILTER
+from academic_publication_manager.modules.savescheduler import SaveScheduler
+from academic_publication_manager.modules.treeloader    import TreeLoader
+from academic_publication_manager.modules.bibimport     import BibImporter, BulkBibImporter, import_changes
+from academic_publication_manager.modules.bibexport     import BibExporter
+from academic_publication_manager.modules.bibsync       import sync_changes
+from academic_publication_manager.modules.lazystore     import LazyProductions
+from academic_publication_manager.modules.journal       import apply_change, get_folder, copy_folder
+from academic_publication_manager.modules.undo          import inverse_changes
 import academic_publication_manager.about as about
 
+SAVE_STATE_MESSAGES = {
+    "pending": "Unsaved changes",
+    "saving": "Saving...",
+    "saved": "All changes saved",
+    "error": "Save failed"
+}
+
 class BaseToolBar():
     def init_toolbar(self):
         toolbar = self.addToolBar("Main Toolbar")
@@ -17,7 +35,7 @@ class BaseToolBar():
         new_tree_btn.setText("New tree")
         new_tree_btn.setToolTip("Clean the current window and define a new <b>data tree</b>")
         new_tree_btn.clicked.connect(self.new_tree)
-        new_tree_btn.setIcon(QIcon(resource_path('icons', 'new_file.png')))
+        new_tree_btn.setIcon(get_icon('new_file.png'))
         new_tree_btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         toolbar.addWidget(new_tree_btn)
 
@@ -26,7 +44,7 @@ class BaseToolBar():
         open_btn.setText("Open tree")
         open_btn.setToolTip("Open in the current window a <b>data tree</b> from a <b>JSON</b> file")
         open_btn.clicked.connect(self.open_file)
-        open_btn.setIcon(QIcon(resource_path('icons', 'open_file.png')))
+        open_btn.setIcon(get_icon('open_file.png'))
         open_btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         toolbar.addWidget(open_btn)
 
@@ -35,7 +53,7 @@ class BaseToolBar():
         save_btn.setText("Save tree")
         save_btn.setToolTip("Save the current <b>data tree</b> in a <b>JSON</b> file")
         save_btn.clicked.connect(self.save_file)
-        save_btn.setIcon(QIcon(resource_path('icons', 'download.png')))
+        save_btn.setIcon(get_icon('download.png'))
         save_btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         toolbar.addWidget(save_btn)
 
@@ -49,7 +67,7 @@ class BaseToolBar():
         coffee_btn.setText("Coffee")
         coffee_btn.setToolTip("Buy me a coffee (TrucomanX)")
         coffee_btn.clicked.connect(self.coffee_func)
-        coffee_btn.setIcon(QIcon(resource_path('icons', 'emote-love.png')))
+        coffee_btn.setIcon(get_icon('emote-love.png'))
         coffee_btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         toolbar.addWidget(coffee_btn)        
 
@@ -58,10 +76,94 @@ class BaseToolBar():
         about_btn.setText("About")
         about_btn.setToolTip("About the program")
         about_btn.clicked.connect(self.about_func)
-        about_btn.setIcon(QIcon(resource_path('icons', 'status_help.png')))
+        about_btn.setIcon(get_icon('status_help.png'))
         about_btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         toolbar.addWidget(about_btn)
 
+    def init_save_scheduler(self):
+        """
+        Creates the background save scheduler and its indicator in the status bar.
+        """
+        self.compact_requested = False
+        self.save_scheduler = SaveScheduler(self.build_save_job, parent=self)
+        self.save_scheduler.state_changed.connect(self.show_save_state)
+        self.save_scheduler.save_failed.connect(self.on_save_failed)
+
+        self.save_state_label = QLabel()
+        self.status_bar.addPermanentWidget(self.save_state_label)
+
+    def init_loading_indicator(self):
+        """
+        Creates the progress bar and cancel button shown in the status bar while a tree file is loading.
+        """
+        self.tree_loader = None
+
+        self.loading_progress = QProgressBar()
+        self.loading_progress.setRange(0, 100)
+        self.loading_progress.setMaximumWidth(200)
+        self.loading_progress.setFormat("Loading %p%")
+        self.status_bar.addPermanentWidget(self.loading_progress)
+
+        self.loading_cancel_btn = QPushButton("Cancel")
+        self.loading_cancel_btn.setToolTip("Cancel the loading of the <b>data tree</b>")
+        self.loading_cancel_btn.clicked.connect(self.cancel_loading)
+        self.status_bar.addPermanentWidget(self.loading_cancel_btn)
+
+        self.loading_progress.hide()
+        self.loading_cancel_btn.hide()
+
+    def init_import_indicator(self):
+        """
+        Creates the progress bar and cancel button shown in the status bar while a .bib file is imported.
+        """
+        self.bib_importer = None
+
+        self.import_progress = QProgressBar()
+        self.import_progress.setRange(0, 100)
+        self.import_progress.setMaximumWidth(200)
+        self.import_progress.setFormat("Importing %p%")
+        self.status_bar.addPermanentWidget(self.import_progress)
+
+        self.import_cancel_btn = QPushButton("Cancel")
+        self.import_cancel_btn.setToolTip("Cancel the import of the <b>.bib</b> files")
+        self.import_cancel_btn.clicked.connect(self.cancel_bib_import)
+        self.status_bar.addPermanentWidget(self.import_cancel_btn)
+
+        self.import_progress.hide()
+        self.import_cancel_btn.hide()
+
+    def init_export_jobs(self):
+        """
+        Prepares the list of background exports. Each running export shows its own
+        progress bar and cancel button in the status bar.
+        """
+        # Exportação -> (barra de progresso, botão de cancelar)
+        self.export_jobs = {}
+
+    def is_loading(self):
+        """
+        Checks if a tree file is being loaded. The tree must not be modified while loading.
+
+        Returns:
+            bool: True if a tree file is being loaded.
+        """
+        if self.tree_loader is not None:
+            self.status_bar.showMessage("Wait until the data tree is loaded", 3000)
+            return True
+        return False
+
+    def show_save_state(self, state):
+        message = SAVE_STATE_MESSAGES.get(state, "")
+        stats = self.storage.last_write_stats if self.storage is not None else None
+        if state == "saved" and stats is not None:
+            message += f" ({stats})"
+        self.save_state_label.setText(message)
+
+    def on_save_failed(self, message):
+        # O próximo salvamento reescreve o arquivo completo
+        self.compact_requested = True
+        QMessageBox.critical(self, "Error", f"It was not possible to save the file:\n{message}")
+
     def coffee_func(self):
         self.status_bar.showMessage("Buy me a coffee in https://ko-fi.com/trucomanx")
         QDesktopServices.openUrl(QUrl("https://ko-fi.com/trucomanx"))
@@ -88,41 +190,585 @@ class BaseToolBar():
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
+            self.cancel_loading()
+            self.cancel_bib_import()
+            self.save_scheduler.flush()
+            if self.storage is not None:
+                self.storage.close_session()
             self.data = {"structure": {"Root":{}}, "productions": {}}
             self.current_prod_id = None
             self.current_file = None
+            self.storage = None
+            self.pending_changes = []
             self.metadata_panel.setEnabled(False)
             self.save_metadata_btn.setEnabled(False)
-            self.tree_widget.clear()
-            self.table_widget.setRowCount(0)
+            self.table_model.clear()
                         
             self.update_tree()
 
     def open_file(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open JSON File", "", "JSON Files (*.Publications.json)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open tree File", "", OPEN_FILE_FILTER)
         if file_name:
-            with open(file_name, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            self.current_file = file_name
-            self.clean_structure(self.data["structure"])
+            self.save_scheduler.flush()
+            self.start_loading(file_name)
+
+    def start_loading(self, file_name):
+        """
+        Starts loading a tree file in background.
+
+        The folder structure is shown as soon as it is parsed; the productions are filled in
+        as they arrive. The previous tree is kept until the loading finishes, so it can be
+        restored if the loading is canceled or fails.
+
+        Args:
+            file_name (str): The tree file to load.
+        """
+        if self.tree_loader is not None:
+            self.cancel_loading()
+        self.cancel_bib_import()
+
+        self.previous_state = (self.data, self.current_file, self.storage)
+        self.data = {"structure": {}, "productions": {}}
+        self.current_file = None
+        self.storage = None
+        self.pending_changes = []
+        self.table_model.clear()
+        self.metadata_panel.setEnabled(False)
+        self.save_metadata_btn.setEnabled(False)
+        self.current_prod_id = None
+        self.update_tree()
+
+        self.tree_loader = TreeLoader(storage_for_path(file_name), self)
+        self.tree_loader.section_loaded.connect(self.on_section_loaded)
+        self.tree_loader.productions_loaded.connect(self.on_productions_loaded)
+        self.tree_loader.progress.connect(self.loading_progress.setValue)
+        self.tree_loader.failed.connect(self.on_loading_failed)
+        self.tree_loader.finished.connect(lambda loader=self.tree_loader: self.on_loading_finished(loader))
+        self.loading_failed = False
+        self.loading_canceled = False
+
+        self.loading_progress.setValue(0)
+        self.loading_progress.show()
+        self.loading_cancel_btn.show()
+        self.tree_loader.start()
+
+    def on_section_loaded(self, key, value):
+        if self.sender() is not self.tree_loader:
+            return
+        self.data[key] = value
+        if key == "structure":
+            # A árvore de pastas fica disponível antes das produções
             self.update_tree()
-            self.table_widget.setRowCount(0)
+
+    def on_productions_loaded(self, batch):
+        if self.sender() is not self.tree_loader:
+            return
+        self.data["productions"].update(batch)
+
+    def on_loading_failed(self, message):
+        self.loading_failed = True
+        QMessageBox.critical(self, "Error", f"It was not possible to open the file:\n{message}")
+
+    def on_loading_finished(self, loader):
+        if loader is not self.tree_loader:
+            return
+        self.tree_loader = None
+        self.loading_progress.hide()
+        self.loading_cancel_btn.hide()
+
+        if self.loading_failed or self.loading_canceled:
+            self.data, self.current_file, self.storage = self.previous_state
+            self.previous_state = None
+            self.update_tree()
+            return
+        previous_storage = self.previous_state[2]
+        self.previous_state = None
+        if previous_storage is not None:
+            previous_storage.close_session()
+
+        self.data.setdefault("structure", {})
+        self.data.setdefault("productions", {})
+        self.storage = loader.storage
+        self.current_file = self.storage.path
+        self.storage.finish_load(self.data)
+        self.storage.open_session()
+        self.clean_structure(self.data["structure"])
+
+        expanded_items = self.get_expanded_items()
+        self.update_tree()
+        self.restore_expanded_items(expanded_items)
+
+        if self.storage.last_load_stats is not None:
+            self.status_bar.showMessage(f"Opened {self.current_file}: {self.storage.last_load_stats}")
+        if self.storage.unclean_shutdown:
+            QMessageBox.warning(
+                self, "Recovery",
+                f"The file was not closed properly the last time it was open.\n"
+                f"{self.storage.recovered_changes} change(s) were recovered from the write-ahead log."
+            )
+
+    def cancel_loading(self):
+        """
+        Cancels the loading of a tree file and restores the previous tree.
+        """
+        loader = self.tree_loader
+        if loader is None:
+            return
+        self.loading_canceled = True
+        loader.requestInterruption()
+        loader.wait()
+        self.on_loading_finished(loader)
+        self.status_bar.showMessage("Loading canceled", 3000)
+
+    def start_bib_import(self, path, file_name):
+        """
+        Starts importing the productions of a .bib file into a folder in background.
+
+        The entries are parsed on a worker thread and kept apart from the tree until the
+        whole file has been read; then they are added as one change (one save and one
+        undo step). A canceled or failed import adds nothing.
+
+        Args:
+            path (list): The folder that receives the productions.
+            file_name (str): The .bib file.
+        """
+        importer = BibImporter(file_name, self)
+        importer.entries_loaded.connect(self.on_bib_entries_loaded)
+        importer.failed.connect(self.on_bib_import_failed)
+        self.begin_bib_import(importer, path, [([], {})])
+
+    def start_bib_sync(self, path, file_name):
+        """
+        Starts synchronizing a folder with a .bib file in background.
+
+        The file is parsed like an import; then only the entries added, changed or
+        removed since the last sync from the file are applied (see bibsync.sync_changes()),
+        as one change, and a summary is shown.
+
+        Args:
+            path (list): The folder kept as a mirror of the file.
+            file_name (str): The .bib file.
+        """
+        importer = BibImporter(file_name, self)
+        importer.entries_loaded.connect(self.on_bib_entries_loaded)
+        importer.failed.connect(self.on_bib_import_failed)
+        self.begin_bib_import(importer, path, [([], {})], sync_file=file_name)
+
+    def start_bulk_bib_import(self, path, files):
+        """
+        Starts importing several .bib files into a folder, each file into its own
+        subfolder. The files are parsed in parallel by a pool of processes.
+
+        The productions are added when all the files have been parsed, as one change
+        (one save and one undo step). Files that cannot be parsed are skipped and
+        reported; a canceled import adds nothing.
+
+        Args:
+            path (list): The folder that receives the subfolders.
+            files (list): (subfolder path, file name) of each file, see
+                bibimport.find_bib_files() and bibimport.bib_file_folders().
+        """
+        importer = BulkBibImporter(files, parent=self)
+        importer.file_loaded.connect(self.on_bib_file_loaded)
+        importer.failed.connect(self.on_bib_file_failed)
+        self.begin_bib_import(importer, path, [])
+
+    def begin_bib_import(self, importer, path, results, sync_file=None):
+        """
+        Shows the progress of an importer in the status bar and starts it.
+
+        Args:
+            importer (QThread): A BibImporter or BulkBibImporter, not started.
+            path (list): The folder that receives the productions.
+            results (list): Initial (subfolder path, productions) list, filled by the importer.
+            sync_file (str, optional): The .bib file, if the folder is synchronized with it
+                instead of receiving all its entries.
+        """
+        if self.is_loading():
+            return
+        if self.bib_importer is not None:
+            self.status_bar.showMessage("Wait until the current import finishes", 3000)
+            return
+
+        self.bib_import_path = list(path)
+        self.bib_import_results = results
+        self.bib_import_errors = []
+        self.bib_import_canceled = False
+        self.bib_import_sync = sync_file
+
+        self.bib_importer = importer
+        importer.progress.connect(self.import_progress.setValue)
+        importer.finished.connect(lambda: self.on_bib_import_finished(importer))
+
+        self.import_progress.setValue(0)
+        self.import_progress.show()
+        self.import_cancel_btn.show()
+        importer.start()
+
+    def on_bib_entries_loaded(self, batch):
+        if self.sender() is not self.bib_importer:
+            return
+        entries = self.bib_import_results[0][1]
+        entries.update(batch)
+        self.status_bar.showMessage(f"Importing: {len(entries)} entries read")
+
+    def on_bib_file_loaded(self, subpath, productions):
+        if self.sender() is not self.bib_importer:
+            return
+        self.bib_import_results.append((subpath, productions))
+        self.status_bar.showMessage(f"Importing: {len(self.bib_import_results)} of "
+                                    f"{len(self.bib_importer.files)} files read")
+
+    def on_bib_import_failed(self, message):
+        if self.sender() is not self.bib_importer:
+            return
+        self.bib_import_errors.append(message)
+        QMessageBox.critical(self, "Error", f"It was not possible to import the file:\n{message}")
+
+    def on_bib_file_failed(self, file_name, message):
+        if self.sender() is not self.bib_importer:
+            return
+        self.bib_import_errors.append(f"{file_name}: {message}")
+
+    def on_bib_import_finished(self, importer):
+        if importer is not self.bib_importer:
+            return
+        self.bib_importer = None
+        self.import_progress.hide()
+        self.import_cancel_btn.hide()
+
+        results = self.bib_import_results
+        self.bib_import_results = []
+        self.status_bar.clearMessage()
+        if self.bib_import_canceled:
+            return
+        if isinstance(importer, BibImporter):
+            if self.bib_import_errors:
+                return
+        elif self.bib_import_errors:
+            QMessageBox.warning(self, "Import", "These files could not be imported:\n"
+                                + "\n".join(self.bib_import_errors))
+
+        path = self.bib_import_path
+        count = len({prod_id for _, productions in results for prod_id in productions})
+        if not self.ensure_loaded(path):
+            return
+        try:
+            folder = get_folder(self.data["structure"], path)
+        except (KeyError, TypeError):
+            self.status_bar.showMessage("The import folder no longer exists", 3000)
+            return
+        if self.bib_import_sync is not None:
+            self.finish_bib_sync(path, self.bib_import_sync, results[0][1])
+            return
+        records = import_changes(folder, path, results)
+        applied = self.apply_changes(records, f"Import {count} publication(s)")
+        if applied:
+            self.status_bar.showMessage(f"Imported {count} publication(s) into {'/'.join(path)}", 5000)
+
+    def finish_bib_sync(self, path, file_name, entries):
+        """
+        Applies the differences between a parsed .bib file and the folder synchronized
+        with it, and shows a summary.
+
+        Args:
+            path (list): The folder.
+            file_name (str): The .bib file.
+            entries (dict): The productions parsed from the file.
+        """
+        records, summary = sync_changes(self.data, self.production_index, path, file_name, entries)
+        self.apply_changes(records, f"Sync {'/'.join(path)}")
+
+        if self.current_prod_id and self.current_prod_id[0] in summary["changed"]:
+            self.load_metadata(self.current_prod_id)
+        message = (f"Added: {len(summary['added'])}\n"
+                   f"Linked from other folders: {len(summary['linked'])}\n"
+                   f"Changed: {len(summary['changed'])}\n"
+                   f"Removed: {len(summary['removed'])}\n"
+                   f"Unchanged: {summary['unchanged']}")
+        if summary["skipped"]:
+            message += f"\nSkipped (a subfolder has the same name): {', '.join(summary['skipped'])}"
+        if summary["conflicts"]:
+            message += (f"\nNot synchronized (a different publication with the same ID is in "
+                        f"another folder): {', '.join(summary['conflicts'])}")
+        QMessageBox.information(self, "Sync", f"{'/'.join(path)} synchronized with {file_name}\n\n{message}")
+
+    def cancel_bib_import(self):
+        """
+        Cancels the import of .bib files; nothing of it is added to the tree.
+        """
+        importer = self.bib_importer
+        if importer is None:
+            return
+        self.bib_import_canceled = True
+        importer.requestInterruption()
+        importer.wait()
+        self.on_bib_import_finished(importer)
+        self.status_bar.showMessage("Import canceled", 3000)
+
+    def start_bib_export(self, id_list, file_path):
+        """
+        Starts writing productions to a .bib file in background.
+
+        The export works on a copy of the productions taken now, so the tree can be
+        edited meanwhile, and several exports can run at the same time. The file is
+        written under a temporary name and renamed when complete.
+
+        Args:
+            id_list (list): The IDs of the productions to write.
+            file_path (str): The destination file.
+        """
+        exporter = BibExporter(self.data["productions"].copy(), id_list, file_path, self)
+
+        progress = QProgressBar()
+        progress.setRange(0, 100)
+        progress.setMaximumWidth(200)
+        progress.setFormat(os.path.basename(file_path) + " %p%")
+        self.status_bar.addPermanentWidget(progress)
+
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setToolTip(f"Cancel the export to <b>{file_path}</b>")
+        cancel_btn.clicked.connect(lambda: self.cancel_bib_export(exporter))
+        self.status_bar.addPermanentWidget(cancel_btn)
+
+        self.export_jobs[exporter] = (progress, cancel_btn)
+        exporter.progress.connect(progress.setValue)
+        exporter.failed.connect(lambda message: QMessageBox.critical(
+            self, "Error", f"It was not possible to save the file:\n{message}"))
+        exporter.finished.connect(lambda: self.on_bib_export_finished(exporter))
+        exporter.start()
+        self.status_bar.showMessage(f"Exporting {exporter.count} entries to {file_path}", 3000)
+
+    def on_bib_export_finished(self, exporter):
+        widgets = self.export_jobs.pop(exporter, None)
+        if widgets is None:
+            return
+        for widget in widgets:
+            self.status_bar.removeWidget(widget)
+            widget.deleteLater()
+        if exporter.completed:
+            self.status_bar.showMessage(f"Saved {exporter.count} entries in {exporter.file_path}", 5000)
+        elif exporter.isInterruptionRequested():
+            self.status_bar.showMessage(f"Export to {exporter.file_path} canceled", 3000)
+        exporter.deleteLater()
+
+    def cancel_bib_export(self, exporter):
+        """
+        Cancels a background export. The destination file is left as it was.
+
+        Args:
+            exporter (BibExporter): The export.
+        """
+        exporter.requestInterruption()
+
+    def wait_bib_exports(self):
+        """
+        Waits for the running exports to finish writing their files.
+        """
+        for exporter in list(self.export_jobs):
+            exporter.wait()
+            self.on_bib_export_finished(exporter)
+
+    def record_change(self, op, **fields):
+        """
+        Records a change of the data tree, to be written in the journal by the next save_file().
+        Called by apply_changes() for each change it applies.
+
+        Args:
+            op (str): Operation ("add", "remove", "move", "rename", "update-field" or "sync").
+            **fields: Fields of the record, see journal.apply_change().
+        """
+        record = dict(op=op, **fields)
+        if isinstance(record.get("node"), dict):
+            # O nó é o da árvore (ou o de um passo de desfazer), que pode mudar antes da gravação
+            record["node"] = copy_folder(record["node"])
+        self.pending_changes.append(record)
+        self.production_index.apply(record)
+        if self.storage is not None:
+            self.storage.note_change(self.data, record, self.production_index)
+
+    def apply_changes(self, records, label=None):
+        """
+        Applies change records to the data tree as a single transaction: one save for
+        all of them, only the affected rows of the tree updated, and one undo step.
+
+        Records that no longer match the tree are skipped.
+
+        Args:
+            records (list): The changes, see journal.apply_change().
+            label (str, optional): Description of the action for the undo step. None
+                does not add an undo step (used to undo).
+
+        Returns:
+            list: The records applied.
+        """
+        applied = []
+        undo = []
+        for record in records:
+            try:
+                inverse = inverse_changes(self.data, record)
+                apply_change(self.data, record)
+            except (KeyError, TypeError, AttributeError):
+                continue
+            # Desfeitas na ordem inversa
+            undo[:0] = inverse
+            self.record_change(**record)
+            applied.append(record)
+        if not applied:
+            return applied
+        if label is not None:
+            self.undo_stack.push(label, undo)
+
+        self.save_file()
+        for record in applied:
+            self.show_change(record)
+        if self.current_prod_id and self.get_production_path(self.current_prod_id[0]) is None:
+            self.current_prod_id = None
             self.metadata_panel.setEnabled(False)
             self.save_metadata_btn.setEnabled(False)
-            self.current_prod_id = None
+        return applied
+
+    def show_change(self, record):
+        """
+        Updates the rows of the tree affected by a change record.
+
+        Args:
+            record (dict): A change already applied to the data tree.
+        """
+        op = record["op"]
+        if op == "add":
+            self.tree_model.insert_node(record["path"], record["name"], record["node"])
+        elif op == "remove":
+            self.tree_model.remove_node(record["path"])
+        elif op == "move":
+            self.tree_model.move_node(record["src"], record["dst"])
+        elif op == "rename":
+            self.tree_model.rename_node(record["path"], record["name"])
+        elif op == "update-field":
+            for folder in self.production_index.folders_of(record["id"]):
+                self.tree_model.refresh_node(folder + [record["id"]])
+
+    def undo(self):
+        """
+        Undoes the last action applied with apply_changes().
+        """
+        if self.is_loading():
+            return
+        step = self.undo_stack.pop()
+        if step is None:
+            self.status_bar.showMessage("Nothing to undo", 3000)
+            return
+        label, records = step
+        self.apply_changes(records)
+        self.table_model.clear()
+        self.status_bar.showMessage(f"Undone: {label}", 3000)
+
+    def ensure_loaded(self, path=None, recursive=True):
+        """
+        Reads the parts of the tree that the storage backend left on disk (the shards of
+        a sharded tree) needed to show or change a folder, and shows them in the tree.
+
+        Args:
+            path (list, optional): The folder. None reads the whole tree.
+            recursive (bool): If False, only what is needed to show the children of the folder.
+
+        Returns:
+            bool: False if the content could not be read.
+        """
+        if self.storage is None or self.tree_loader is not None:
+            return True
+        try:
+            loaded_paths = self.storage.ensure_loaded(self.data, path, recursive)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"It was not possible to read the folder:\n{e}")
+            return False
+
+        for loaded_path in loaded_paths:
+            folder = self.data["structure"]
+            for key in loaded_path:
+                folder = folder[key]
+            self.production_index.reload_folder(loaded_path, folder)
+            self.tree_model.reload_children(loaded_path)
+        return True
 
     def save_file(self):
-        if self.current_file:
-            with open(self.current_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-        else:
-            file_name, _ = QFileDialog.getSaveFileName(self, "Save JSON File", "", "JSON Files (*.Publications.json)")
-                
-            if file_name:
-                if not file_name.endswith(".Publications.json"):
-                    file_name += ".Publications.json"
-                    
-                self.current_file = file_name
-                with open(self.current_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+        """
+        Requests a save of the data tree.
+
+        The write is debounced and done in background by the save scheduler. Only the
+        pending changes are given to the storage backend, unless the backend prefers a
+        full write (for example when the JSON journal is full) or the save was explicitly
+        requested with nothing pending, in which case the whole tree is rewritten.
+        """
+        if self.is_loading():
+            return
+        if not self.current_file:
+            self.save_file_as()
+            return
+        elif not self.pending_changes:
+            self.compact_requested = True
+        # As mudanças vão para o write-ahead log sem esperar o debounce
+        self.save_scheduler.mark_dirty(self.storage.incremental_saves and not self.compact_requested)
+
+    def save_file_as(self):
+        """
+        Saves the whole data tree in a new file and continues working on it.
+
+        The format is chosen by the extension, so this also converts a tree between
+        the JSON, the compressed JSON, the SQLite and the sharded formats.
+        """
+        if self.is_loading():
+            return
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, "Save tree File", "", SAVE_FILE_FILTER)
+        if not file_name:
+            return
+        file_name = add_tree_extension(file_name, selected_filter)
+
+        self.save_scheduler.flush()
+        if not self.ensure_loaded():
+            return
+        if self.storage is not None:
+            self.storage.close_session()
+        self.current_file = file_name
+        self.storage = storage_for_path(file_name)
+        self.storage.prepare_tree(self.data)
+        self.storage.open_session()
+        if isinstance(self.data["productions"], LazyProductions) and not self.storage.lazy_productions:
+            # O novo arquivo não pode servir de origem para a leitura sob demanda
+            self.data["productions"] = dict(self.data["productions"])
+        self.compact_requested = True
+        self.save_scheduler.mark_dirty()
+
+    def build_save_job(self):
+        """
+        Takes a snapshot of what must be saved and returns the job that writes it.
 
+        Called by the save scheduler on the GUI thread; the returned job runs on the worker thread.
+
+        Returns:
+            callable: The write job, or None if there is nothing to write.
+        """
+        if not self.current_file:
+            return None
+        storage = self.storage
+        pending = self.pending_changes
+        self.pending_changes = []
+
+        if self.compact_requested or storage.needs_full_write(len(pending)):
+            self.compact_requested = False
+            snapshot = snapshot_tree(self.data)
+            return lambda: storage.write_tree(snapshot)
+
+        return lambda: storage.apply_changes(pending)
+
+    def compact_tree_file(self):
+        """
+        Compacts the journal into the tree file and waits for all pending writes.
+        """
+        if self.current_file:
+            if self.storage.needs_compaction(len(self.pending_changes)):
+                self.compact_requested = True
+                self.save_scheduler.mark_dirty()
+            elif self.pending_changes:
+                self.save_scheduler.mark_dirty()
+        self.save_scheduler.flush()
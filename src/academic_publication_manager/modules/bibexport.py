@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from academic_publication_manager.modules.to_bibtex import write_bibtex
+from academic_publication_manager.modules.treefile  import commit_temp_file
+
+# Entradas gravadas entre duas verificações de cancelamento e de progresso
+EXPORT_BATCH = 1000
+
+
+class BibExporter(QThread):
+    """
+    Writes productions to a .bib file on a worker thread.
+
+    The entries are written to a temporary file next to the destination, which is
+    renamed over it only when every entry has been written; a canceled or failed
+    export removes the temporary file and leaves the destination as it was. Use
+    requestInterruption() to cancel.
+
+    The productions must be a copy made with productions.copy(), which shares the
+    records, so the tree can be edited while the export runs.
+
+    Signals:
+        progress (int): Percentage of the entries that have been written.
+        failed (str): Error message, if the file could not be written.
+
+    Attributes:
+        file_path (str): The destination.
+        count (int): Number of entries to write.
+        completed (bool): True once the destination has been written.
+    """
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, productions, id_list, file_path, parent=None):
+        super().__init__(parent)
+        self.productions = productions
+        self.id_list = id_list
+        self.file_path = file_path
+        self.count = len(id_list)
+        self.completed = False
+
+    def run(self):
+        path = os.path.abspath(self.file_path)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                            dir=os.path.dirname(path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for start in range(0, self.count, EXPORT_BATCH):
+                    if self.isInterruptionRequested():
+                        break
+                    write_bibtex(f, self.productions, self.id_list[start:start + EXPORT_BATCH])
+                    self.progress.emit(int(100 * min(start + EXPORT_BATCH, self.count) / self.count))
+            if self.isInterruptionRequested():
+                os.remove(tmp_path)
+                return
+            commit_temp_file(tmp_path, path)
+            self.completed = True
+        except Exception as e:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.failed.emit(str(e))
@@ -0,0 +1,232 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from academic_publication_manager.modules.to_bibtex  import iter_bibtex_entries, bibtex_to_dicts
+from academic_publication_manager.modules.treeloader import BATCH_INTERVAL
+from academic_publication_manager.modules.shards     import is_unloaded_shard
+
+# Processos usados para ler vários arquivos .bib (None: um por CPU)
+IMPORT_PROCESSES = None
+# Intervalo (s) entre as verificações de cancelamento enquanto os processos trabalham
+POLL_INTERVAL = 0.1
+
+
+def find_bib_files(directory):
+    """
+    Finds the .bib files of a directory and of its subdirectories.
+
+    Args:
+        directory (str): The directory.
+
+    Returns:
+        list: (subfolder path, file name) of each file, sorted. The subfolder path is
+        made of the subdirectories and the file name without extension, so the tree
+        keeps the layout of the directory.
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        relative = os.path.relpath(root, directory)
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        for name in sorted(names):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() == ".bib":
+                files.append((parts + [stem], os.path.join(root, name)))
+    return files
+
+
+def bib_file_folders(file_names):
+    """
+    Gives each of several .bib files its own subfolder, named after the file.
+
+    Args:
+        file_names (list): The files.
+
+    Returns:
+        list: (subfolder path, file name) of each file. Files with the same name get
+        the subfolders "name", "name (2)", ...
+    """
+    files = []
+    used = set()
+    for file_name in file_names:
+        stem = os.path.splitext(os.path.basename(file_name))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem} ({n})"
+        used.add(name)
+        files.append(([name], file_name))
+    return files
+
+
+def import_changes(folder, path, results):
+    """
+    Builds the change records that add imported productions to a folder.
+
+    A new subfolder is added with one record, with all its content; productions and
+    subfolders that go into an existing folder are merged into it. A subfolder whose
+    name is taken by a production gets the name "name (2)", ...
+
+    Args:
+        folder (dict): The content of the folder that receives the import.
+        path (list): Its path.
+        results (list): (subfolder path, productions) of each imported file, the
+            subfolder path relative to the folder ([] for the folder itself).
+
+    Returns:
+        list: The records, see journal.apply_change().
+    """
+    tree = {}
+    productions = {}
+    for subpath, file_productions in results:
+        node = tree
+        for name in subpath:
+            if not isinstance(node.get(name), dict):
+                node[name] = {}
+            node = node[name]
+        for prod_id in file_productions:
+            if prod_id not in node:
+                node[prod_id] = None
+        productions.update(file_productions)
+
+    records = []
+    stack = [(folder, list(path), tree)]
+    while stack:
+        current, current_path, new = stack.pop()
+        for name, value in new.items():
+            if value is None:
+                if isinstance(current.get(name), dict):
+                    # Uma pasta com o mesmo nome não é substituída por uma produção
+                    continue
+                records.append(dict(op="add", path=current_path, name=name, node=None,
+                                    productions={name: productions[name]}))
+                continue
+            existing = current.get(name)
+            if isinstance(existing, dict) and not is_unloaded_shard(existing):
+                stack.append((existing, current_path + [name], value))
+                continue
+            new_name, n = name, 1
+            while new_name in current or new_name in new and new_name != name:
+                n += 1
+                new_name = f"{name} ({n})"
+            records.append(dict(op="add", path=current_path, name=new_name, node=value,
+                                productions={prod_id: productions[prod_id]
+                                             for prod_id in _subtree_productions(value)}))
+    return records
+
+
+def _subtree_productions(folder):
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        for name, value in current.items():
+            if value is None:
+                yield name
+            else:
+                stack.append(value)
+
+
+class BibImporter(QThread):
+    """
+    Parses a .bib file on a worker thread, a block of entries at a time.
+
+    The productions are delivered in batches; nothing is added to the tree by the
+    importer, so the receiver decides when to apply them (all at once when the
+    importer finishes without errors). Use requestInterruption() to cancel.
+
+    Signals:
+        entries_loaded (dict): A batch of productions (production ID -> production).
+        progress (int): Percentage of the file that has been read.
+        failed (str): Error message, if the file could not be parsed.
+    """
+    entries_loaded = pyqtSignal(object)
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_name, parent=None):
+        super().__init__(parent)
+        self.file_name = file_name
+
+    def run(self):
+        try:
+            size = max(os.path.getsize(self.file_name), 1)
+            batch = {}
+            last_emit = time.monotonic()
+            with open(self.file_name, "rb") as f:
+                for prod_id, production, bytes_read in iter_bibtex_entries(f):
+                    if self.isInterruptionRequested():
+                        return
+                    batch[prod_id] = production
+                    now = time.monotonic()
+                    if now - last_emit >= BATCH_INTERVAL:
+                        self.entries_loaded.emit(batch)
+                        self.progress.emit(int(100 * bytes_read / size))
+                        batch = {}
+                        last_emit = now
+            if batch:
+                self.entries_loaded.emit(batch)
+            self.progress.emit(100)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class BulkBibImporter(QThread):
+    """
+    Parses several .bib files at the same time in a pool of processes.
+
+    Each file is parsed with to_bibtex.bibtex_to_dicts() in a worker process and its
+    productions are delivered as soon as it is done. Nothing is added to the tree by
+    the importer. Use requestInterruption() to cancel: the files not started yet are
+    skipped and the results of the running ones are discarded.
+
+    Signals:
+        file_loaded (list, dict): The subfolder path of a file and its productions.
+        progress (int): Percentage of the bytes of the files that have been parsed.
+        failed (str, str): A file that could not be parsed and the error message.
+    """
+    file_loaded = pyqtSignal(object, object)
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, files, processes=IMPORT_PROCESSES, parent=None):
+        """
+        Args:
+            files (list): (subfolder path, file name) of each file.
+            processes (int, optional): Number of worker processes, None for one per CPU.
+        """
+        super().__init__(parent)
+        self.files = files
+        self.processes = processes
+
+    def run(self):
+        sizes = {file_name: max(os.path.getsize(file_name), 1) if os.path.exists(file_name) else 1
+                 for _, file_name in self.files}
+        total = sum(sizes.values())
+        done_bytes = 0
+        # "spawn": o processo da interface tem várias threads e não deve ser copiado com fork
+        executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        futures = {executor.submit(bibtex_to_dicts, file_name): (subpath, file_name)
+                   for subpath, file_name in self.files}
+        pending = set(futures)
+        try:
+            while pending:
+                if self.isInterruptionRequested():
+                    return
+                done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    subpath, file_name = futures[future]
+                    try:
+                        self.file_loaded.emit(subpath, future.result())
+                    except Exception as e:
+                        self.failed.emit(file_name, str(e))
+                    done_bytes += sizes[file_name]
+                if done:
+                    self.progress.emit(int(100 * done_bytes / total))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
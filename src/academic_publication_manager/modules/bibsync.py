@@ -0,0 +1,141 @@
+import json
+import hashlib
+
+from academic_publication_manager.modules.journal import sync_key
+
+
+def entry_hash(production):
+    """
+    Content hash of a production: the same fields and values give the same hash,
+    whatever their order.
+
+    Args:
+        production (Mapping): The production fields.
+
+    Returns:
+        str: The SHA-1 of the fields, in hexadecimal.
+    """
+    text = json.dumps(dict(production.items()), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def sync_state(data, path):
+    """
+    Args:
+        data (dict): The data tree.
+        path (list): A folder.
+
+    Returns:
+        dict: {"file": the .bib file, "hashes": production ID -> hash of the entry
+        when it was last synchronized}, or None if the folder was never synchronized.
+    """
+    return data.get("sync", {}).get(sync_key(path))
+
+
+def sync_changes(data, index, path, file_name, entries):
+    """
+    Compares the entries of a .bib file with the productions synchronized from it
+    into a folder, and builds the changes that bring the folder up to date.
+
+    Only the entries whose hash differs from the one stored at the last sync are
+    touched; their fields are updated one by one (fields missing from the file
+    are emptied). Entries that left the file are removed from the folder, and from
+    the productions if the folder was the only one that had them. Productions of the
+    folder that never came from the file are kept.
+
+    An entry whose ID is already a production of another folder is linked into the
+    folder, and the production is not replaced by the entry: it is updated from the
+    file only if it was synchronized from it before, and an entry that differs from a
+    production never synchronized with the file is reported as a conflict and left
+    out of the folder.
+
+    Args:
+        data (dict): The data tree.
+        index (ProductionIndex): The index of the folder structure.
+        path (list): The folder, already loaded.
+        file_name (str): The .bib file.
+        entries (dict): Production ID -> production, as parsed from the file.
+
+    Returns:
+        tuple: (records, summary). The records are in the format of
+        journal.apply_change(), the last one a "sync" record with the new hashes.
+        The summary has the lists "added", "linked", "changed", "removed", "skipped"
+        and "conflicts" of production IDs and the number "unchanged".
+    """
+    state = sync_state(data, path) or {}
+    old_hashes = state.get("hashes", {})
+    productions = data["productions"]
+    folder = data["structure"]
+    for name in path:
+        folder = folder[name]
+
+    records = []
+    hashes = {}
+    summary = {"added": [], "linked": [], "changed": [], "removed": [], "skipped": [],
+               "conflicts": [], "unchanged": 0}
+    for prod_id, production in entries.items():
+        digest = entry_hash(production)
+        if prod_id not in folder and prod_id not in productions:
+            records.append(dict(op="add", path=list(path), name=prod_id, node=None,
+                                productions={prod_id: production}))
+            summary["added"].append(prod_id)
+            hashes[prod_id] = digest
+            continue
+        if prod_id in folder and folder[prod_id] is not None:
+            # O nome pertence a uma subpasta
+            summary["skipped"].append(prod_id)
+            continue
+
+        current = productions.get(prod_id, {})
+        synced = prod_id in old_hashes
+        if not synced and entry_hash(current) != digest and prod_id not in folder:
+            # Produção de outra pasta, nunca sincronizada: as edições locais não são sobrescritas
+            summary["conflicts"].append(prod_id)
+            continue
+        if prod_id not in folder:
+            records.append(dict(op="add", path=list(path), name=prod_id, node=None))
+            summary["linked"].append(prod_id)
+        if old_hashes.get(prod_id) == digest or entry_hash(current) == digest:
+            if prod_id in folder:
+                summary["unchanged"] += 1
+        else:
+            records.extend(field_changes(prod_id, current, production))
+            summary["changed"].append(prod_id)
+        hashes[prod_id] = digest
+
+    for prod_id in old_hashes:
+        if prod_id in entries:
+            continue
+        if prod_id in folder and folder[prod_id] is None:
+            only_here = index.folders_of(prod_id) == [list(path)]
+            records.append(dict(op="remove", path=list(path) + [prod_id],
+                                productions=[prod_id] if only_here else []))
+            summary["removed"].append(prod_id)
+        hashes[prod_id] = None
+
+    if hashes or state.get("file") != file_name:
+        records.append(dict(op="sync", path=list(path), file=file_name, hashes=hashes))
+    return records, summary
+
+
+def field_changes(prod_id, current, production):
+    """
+    Builds the records that turn a production into another one, field by field.
+
+    Args:
+        prod_id (str): The production ID.
+        current (Mapping): The production as it is.
+        production (Mapping): The production as it must be; fields missing from it
+            are emptied.
+
+    Returns:
+        list: "update-field" records, see journal.apply_change().
+    """
+    records = []
+    for key, value in production.items():
+        if current.get(key) != value:
+            records.append(dict(op="update-field", id=prod_id, key=key, value=value))
+    for key in current:
+        if key not in production and current[key] != "":
+            records.append(dict(op="update-field", id=prod_id, key=key, value=""))
+    return records
@@ -0,0 +1,135 @@
+import bz2
+import gzip
+import lzma
+import hashlib
+
+# Extensão (acrescentada ao nome do arquivo JSON) -> codec
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".xz": "xz",
+    ".bz2": "bz2"
+}
+
+# Níveis escolhidos para que o salvamento em segundo plano continue rápido
+COMPRESSION_LEVELS = {
+    "gzip": 6,
+    "xz": 3,
+    "bz2": 9
+}
+
+
+def codec_for_path(path):
+    """
+    Returns the compression codec of a file, chosen by its extension.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        str: "gzip", "xz" or "bz2", or None if the file is not compressed.
+    """
+    for extension, codec in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+def open_reader(f, codec):
+    """
+    Opens a stream that decompresses a binary file while it is read.
+
+    Args:
+        f (file): Binary file (or any object with a read() method) with the compressed data.
+        codec (str): The codec, see COMPRESSION_EXTENSIONS.
+
+    Returns:
+        file: Binary file object with the decompressed content.
+    """
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if codec == "xz":
+        return lzma.LZMAFile(f, mode='rb')
+    if codec == "bz2":
+        return bz2.BZ2File(f, mode='rb')
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def open_writer(f, codec):
+    """
+    Opens a stream that compresses everything written to it into a binary file.
+
+    The stream must be closed to write the end of the compressed data; closing it
+    does not close f.
+
+    Args:
+        f (file): Binary file (or any object with a write() method) that receives the compressed data.
+        codec (str): The codec, see COMPRESSION_EXTENSIONS.
+
+    Returns:
+        file: Binary file object that accepts the uncompressed content.
+    """
+    level = COMPRESSION_LEVELS[codec]
+    if codec == "gzip":
+        # mtime fixo: o mesmo conteúdo gera sempre o mesmo arquivo
+        return gzip.GzipFile(fileobj=f, mode='wb', compresslevel=level, mtime=0)
+    if codec == "xz":
+        return lzma.LZMAFile(f, mode='wb', preset=level)
+    if codec == "bz2":
+        return bz2.BZ2File(f, mode='wb', compresslevel=level)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+class HashingWriter:
+    """
+    Wraps a binary file and computes the sha256 and the size of everything written through it.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def digest(self):
+        return self.sha256.digest()
+
+
+class TransferStats:
+    """
+    Size and duration of a read or a write of a tree file.
+
+    Attributes:
+        raw_bytes (int): Size of the JSON content.
+        stored_bytes (int): Size of the file on disk.
+        seconds (float): Duration of the transfer.
+    """
+
+    def __init__(self, raw_bytes, stored_bytes, seconds):
+        self.raw_bytes = raw_bytes
+        self.stored_bytes = stored_bytes
+        self.seconds = seconds
+
+    @property
+    def ratio(self):
+        """
+        float: Size of the JSON content divided by the size of the file.
+        """
+        return self.raw_bytes / max(self.stored_bytes, 1)
+
+    @property
+    def throughput(self):
+        """
+        float: JSON content processed per second, in MB/s.
+        """
+        return self.raw_bytes / 1e6 / max(self.seconds, 1e-9)
+
+    def __str__(self):
+        return (f"{self.stored_bytes / 1e6:.1f} MB on disk, "
+                f"ratio {self.ratio:.1f}:1, {self.throughput:.1f} MB/s")
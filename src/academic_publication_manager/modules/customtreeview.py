@@ -1,153 +1,118 @@
 #!/usr/bin/python3
 
-from PyQt5.QtWidgets import QTreeWidget
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QBrush, QColor
+from PyQt5.QtWidgets import QTreeView, QAbstractItemView
+from PyQt5.QtCore import Qt, QModelIndex, QPersistentModelIndex, QTimer, QItemSelectionModel
 
-from copy import deepcopy
+from academic_publication_manager.modules.treemodel import TREE_MIME_TYPE
 
 
-class CustomTreeWidget(QTreeWidget):
+class CustomTreeView(QTreeView):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.main_window = parent  # Referência à BibManager
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
-        self.setDragDropMode(QTreeWidget.DragDrop)
+        self.setDragDropMode(QAbstractItemView.DragDrop)
         self.setDefaultDropAction(Qt.MoveAction)
-        self.setSelectionMode(QTreeWidget.SingleSelection)
-        self._highlighted_item = None  # Rastrear o item destacado
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.expanded.connect(self.fetch_in_batches)
+
+    def fetch_in_batches(self, index):
+        """
+        Creates the remaining rows of an expanded folder, one batch per event loop
+        iteration, so a very large folder does not block the window.
+
+        Args:
+            index (QModelIndex): The expanded folder.
+        """
+        folder = QPersistentModelIndex(index)
+
+        def fetch_next():
+            index = QModelIndex(folder)
+            if index.isValid() and self.isExpanded(index) and self.model().canFetchMore(index):
+                self.model().fetchMore(index)
+                QTimer.singleShot(0, fetch_next)
+
+        QTimer.singleShot(0, fetch_next)
 
     def dragEnterEvent(self, event):
-        if event.mimeData().hasFormat("application/x-qabstractitemmodeldatalist"):
+        if event.mimeData().hasFormat(TREE_MIME_TYPE):
             event.acceptProposedAction()
         else:
             event.ignore()
 
     def dragMoveEvent(self, event):
-        item = self.itemAt(event.pos())
-        # Limpar destaque do item anterior
-        if self._highlighted_item:
-            self._highlighted_item.setBackground(0, QBrush())  # Fundo transparente
-            self._highlighted_item = None
-
-        if item and item.data(0, Qt.UserRole):  # Não permitir soltar em produção
+        super().dragMoveEvent(event)  # Atualiza o indicador de posição
+        index = self.indexAt(event.pos())
+        if index.isValid() and index.data(Qt.UserRole):  # Não permitir soltar em produção
+            self.model().set_highlighted(None)
             event.ignore()
         else:
-            # Destacar o item de destino válido
-            target_item = item if item else self.invisibleRootItem()
-            if target_item != self.invisibleRootItem():  # Não destacar a raiz diretamente
-                self._highlighted_item = target_item
-                self._highlighted_item.setBackground(0, QBrush(QColor("#FFFF99")))  # Amarelo claro
+            # Destacar o item de destino válido (a raiz não é destacada)
+            self.model().set_highlighted(index if index.isValid() else None)
             event.acceptProposedAction()
 
     def dragLeaveEvent(self, event):
         # Limpar destaque quando o arrasto sai da árvore
-        if self._highlighted_item:
-            self._highlighted_item.setBackground(0, QBrush())  # Fundo transparente
-            self._highlighted_item = None
-        event.accept()
+        self.model().set_highlighted(None)
+        super().dragLeaveEvent(event)
 
     def dropEvent(self, event):
-        source_item = self.currentItem()
+        source_index = self.currentIndex()
         drop_pos = self.dropIndicatorPosition()
-        target_item = self.itemAt(event.pos())
+        target_index = self.indexAt(event.pos())
+        model = self.model()
 
         # Limpar destaque ao soltar
-        if self._highlighted_item:
-            self._highlighted_item.setBackground(0, QBrush())  # Fundo transparente
-            self._highlighted_item = None
+        model.set_highlighted(None)
 
-        if not source_item:
+        if not source_index.isValid() or self.main_window.is_loading():
             event.ignore()
             return
 
-        # Determinar o item pai de destino
-        if target_item:
-            if drop_pos in (QTreeWidget.AboveItem, QTreeWidget.BelowItem):
-                parent_item = target_item.parent() or self.invisibleRootItem()
+        # Determinar a pasta de destino
+        if target_index.isValid():
+            if drop_pos in (QAbstractItemView.AboveItem, QAbstractItemView.BelowItem):
+                parent_index = target_index.parent()
             else:  # OnItem
-                if target_item.data(0, Qt.UserRole):  # Não permitir soltar em produção
+                if target_index.data(Qt.UserRole):  # Não permitir soltar em produção
                     event.ignore()
                     return
-                parent_item = target_item
+                parent_index = target_index
         else:
-            parent_item = self.invisibleRootItem()
+            parent_index = QModelIndex()
 
-        # Obter os caminhos do item origem e destino
-        source_path = self.main_window.get_item_path(source_item)
-        target_path = self.main_window.get_item_path(parent_item)
+        # Os itens arrastados são os selecionados (o item atual, se não houver seleção)
+        source_indexes = [index for index in self.selectedIndexes() if index.column() == 0]
+        if source_index not in source_indexes:
+            source_indexes = [source_index]
 
-        # Verificar se o movimento é válido
-        if source_path == target_path or source_path in [target_path + [source_path[-1]]]:
-            event.ignore()
-            return
+        # Obter os caminhos dos itens e do destino (o último nome de uma produção é o ID)
+        source_paths = [self.main_window.get_item_path(index) for index in source_indexes]
+        target_path = self.main_window.get_item_path(parent_index)
 
-        # Determinar se o item é uma pasta ou produção
-        source_name = source_path[-1]
-        is_production = bool(source_item.data(0, Qt.UserRole))
-
-        # Para produções, extrair o ID real
-        if is_production:
-            source_name = self.main_window.extract_id_from_text(source_item.text(0))
-
-        # Obter a estrutura do item origem
-        current = self.main_window.data["structure"]
-        for key in source_path[:-1]:
-            if key not in current:
-                event.ignore()
-                return
-            current = current[key]
-        if source_name not in current:
+        # Pastas de uma árvore particionada são lidas antes de serem movidas
+        if not all(self.main_window.ensure_loaded(path) for path in source_paths + [target_path]):
             event.ignore()
             return
-        source_data = deepcopy(current[source_name])  # Fazer cópia profunda
-
-        # Verificar se o destino é válido
-        current = self.main_window.data["structure"]
-        for key in target_path:
-            if key not in current:
-                event.ignore()
-                return
-            current = current[key]
-        if not isinstance(current, dict):
+
+        # As entradas são religadas na estrutura, sem cópia; só as linhas movidas mudam
+        new_paths = self.main_window.move_items(source_paths, target_path)
+        if not new_paths:
             event.ignore()
             return
 
-        # Adicionar o item no destino
-        if is_production:
-            if source_name not in self.main_window.data["productions"]:
-                event.ignore()
-                return
-            current[source_name] = None
-        else:
-            current[source_name] = source_data
-
-        # Remover o item da origem
-        current = self.main_window.data["structure"]
-        for key in source_path[:-1]:
-            current = current[key]
-        current.pop(source_name)  # Usar source_name (ID para produções, nome para pastas)
-
-        # Salvar o arquivo
-        self.main_window.save_file()
-
-        # Preservar o estado expandido da árvore
-        expanded_items = self.main_window.get_expanded_items()
-
-        # Atualizar a árvore com atraso
-        def update_tree_later():
-            self.main_window.update_tree()
-            self.main_window.restore_expanded_items(expanded_items)
-            new_item = self.main_window.find_tree_item_by_path(target_path + [source_name])
-            if new_item:
-                self.setCurrentItem(new_item)
-                # Expandir a pasta destino para mostrar a produção movida
-                parent_item = new_item.parent() or self.tree_widget.invisibleRootItem()
-                parent_item.setExpanded(True)
-            else:
-                print("Moved item not found after update")
-        QTimer.singleShot(100, update_tree_later)
+        selection = self.selectionModel()
+        selection.clearSelection()
+        for path in new_paths:
+            new_index = model.index_for_path(path)
+            if new_index is not None:
+                selection.select(new_index, QItemSelectionModel.Select)
+        new_index = model.index_for_path(new_paths[0])
+        if new_index is not None:
+            selection.setCurrentIndex(new_index, QItemSelectionModel.NoUpdate)
+            # Expandir a pasta destino para mostrar os itens movidos
+            if new_index.parent().isValid():
+                self.expand(new_index.parent())
 
         event.acceptProposedAction()
-
@@ -0,0 +1,64 @@
+import os
+import warnings
+
+from PyQt5.QtGui import QIcon, QPixmap
+
+from academic_publication_manager.modules.resources import resource_path
+
+# Nome do arquivo -> imagem já decodificada, compartilhada por toda a aplicação
+_PIXMAPS = {}
+_ICONS = {}
+
+
+def get_pixmap(name):
+    """
+    Returns the shared pixmap of an image of the icons directory, decoding the file
+    only the first time. Needs a QApplication.
+
+    Args:
+        name (str): File name, for example 'folder.png'.
+
+    Returns:
+        QPixmap: The image. A file that does not exist or can not be decoded gives a
+        null pixmap, with a warning, and is not cached.
+    """
+    pixmap = _PIXMAPS.get(name)
+    if pixmap is None:
+        pixmap = QPixmap(resource_path('icons', name))
+        if pixmap.isNull():
+            warnings.warn(f"Icon not found or not readable: {name}")
+            return pixmap
+        _PIXMAPS[name] = pixmap
+    return pixmap
+
+
+def get_icon(name):
+    """
+    Returns the shared icon of an image of the icons directory. Use it instead of
+    ``QIcon(resource_path('icons', name))``, which decodes the file again for every
+    new icon.
+
+    Args:
+        name (str): File name, for example 'folder.png'.
+
+    Returns:
+        QIcon: The icon, or an empty icon (not cached) if the image is missing.
+    """
+    icon = _ICONS.get(name)
+    if icon is None:
+        pixmap = get_pixmap(name)
+        if pixmap.isNull():
+            return QIcon()
+        icon = _ICONS[name] = QIcon(pixmap)
+    return icon
+
+
+def preload_icons():
+    """
+    Decodes every PNG of the icons directory, so the tree, menus and toolbars never
+    read an icon file while the program is in use. Needs a QApplication.
+    """
+    directory = resource_path('icons')
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.png'):
+            get_icon(name)
@@ -0,0 +1,288 @@
+import sys
+from copy import deepcopy
+from collections.abc import MutableMapping, ItemsView, ValuesView
+
+# Só textos curtos são compartilhados: campos vazios, meses, tipos, revistas, editoras...
+# Títulos e resumos raramente se repetem e só aumentariam a tabela durante a carga
+INTERN_MAX_LENGTH = 96
+
+
+class Schema:
+    """
+    Ordered tuple of field names shared by every Record with the same fields.
+
+    Schemas are unique per field tuple (see schema_for()), so records built from
+    productions of the same entry type share one schema and one copy of the names.
+
+    Attributes:
+        keys (tuple): The field names, in order.
+        index (dict): Field name -> position in keys.
+    """
+    __slots__ = ("keys", "index", "_added")
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self._added = {}
+
+    def added(self, key):
+        """
+        Args:
+            key (str): A field name that is not in the schema.
+
+        Returns:
+            Schema: The schema with key appended.
+        """
+        schema = self._added.get(key)
+        if schema is None:
+            schema = self._added[key] = schema_for(self.keys + (sys.intern(key),))
+        return schema
+
+    def removed(self, key):
+        """
+        Args:
+            key (str): A field name of the schema.
+
+        Returns:
+            Schema: The schema without key.
+        """
+        return schema_for(tuple(k for k in self.keys if k != key))
+
+
+# Tupla de campos -> Schema; o número de combinações de campos é pequeno
+_SCHEMAS = {}
+
+
+def schema_for(keys):
+    """
+    Returns the shared schema of a tuple of field names.
+
+    Args:
+        keys (tuple): The field names, in order.
+
+    Returns:
+        Schema: The schema.
+    """
+    schema = _SCHEMAS.get(keys)
+    if schema is None:
+        keys = tuple(sys.intern(key) for key in keys)
+        schema = _SCHEMAS.setdefault(keys, Schema(keys))
+    return schema
+
+
+def _rebuild_record(keys, values):
+    return Record.from_values(schema_for(keys), values)
+
+
+class _RecordItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        record = self._mapping
+        return zip(record._schema.keys, record._values)
+
+
+class _RecordValues(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self._mapping._values)
+
+
+class Record(MutableMapping):
+    """
+    Compact field mapping of a production.
+
+    The field names live in a Schema shared by all the records with the same fields,
+    and the values in a tuple, so a record costs a small fraction of a dict with the
+    same content. Records behave like dicts for reading, comparison, copying and
+    pickling; setting or deleting a field replaces the values tuple, so copies made
+    with copy() never see each other's changes.
+    """
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, fields=(), **kwargs):
+        fields = dict(fields, **kwargs)
+        self._schema = schema_for(tuple(fields))
+        self._values = tuple(fields.values())
+
+    @classmethod
+    def from_values(cls, schema, values):
+        """
+        Builds a record without copying or checking its content.
+
+        Args:
+            schema (Schema): The field names.
+            values (tuple): One value per field name, in the same order.
+
+        Returns:
+            Record: The record.
+        """
+        record = cls.__new__(cls)
+        record._schema = schema
+        record._values = values
+        return record
+
+    @property
+    def schema(self):
+        return self._schema
+
+    def __getitem__(self, key):
+        return self._values[self._schema.index[key]]
+
+    def get(self, key, default=None):
+        i = self._schema.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._schema.index
+
+    def __iter__(self):
+        return iter(self._schema.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __setitem__(self, key, value):
+        i = self._schema.index.get(key)
+        if i is None:
+            self._schema = self._schema.added(key)
+            self._values = self._values + (value,)
+        else:
+            self._values = self._values[:i] + (value,) + self._values[i + 1:]
+
+    def __delitem__(self, key):
+        i = self._schema.index[key]
+        self._schema = self._schema.removed(key)
+        self._values = self._values[:i] + self._values[i + 1:]
+
+    def items(self):
+        return _RecordItems(self)
+
+    def values(self):
+        return _RecordValues(self)
+
+    def copy(self):
+        # A tupla de valores é imutável e pode ser compartilhada
+        return Record.from_values(self._schema, self._values)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return Record.from_values(self._schema, deepcopy(self._values, memo))
+
+    def __reduce__(self):
+        return _rebuild_record, (self._schema.keys, self._values)
+
+    def __repr__(self):
+        return f"Record({dict(self.items())!r})"
+
+
+class Interner:
+    """
+    Shares the repeated field names and short values of the productions read by one
+    load or import.
+
+    The value table is only needed while reading; drop the interner afterwards so
+    the table is freed.
+    """
+
+    def __init__(self, max_length=INTERN_MAX_LENGTH):
+        self.max_length = max_length
+        self._values = {}
+
+    def value(self, value):
+        """
+        Args:
+            value: A field value.
+
+        Returns:
+            The shared copy of value if it is a short string, otherwise value itself.
+        """
+        if type(value) is str and len(value) <= self.max_length:
+            return self._values.setdefault(value, value)
+        return value
+
+    def compact(self, production):
+        """
+        Converts a production to a Record with shared field names and values.
+
+        Args:
+            production (Mapping): The production fields.
+
+        Returns:
+            Record: The compact production.
+        """
+        if isinstance(production, Record):
+            schema, values = production._schema, production._values
+        else:
+            keys = tuple(production)
+            schema = _SCHEMAS.get(keys) or schema_for(keys)
+            values = production.values()
+        # Chamado para cada produção da carga: sem chamadas de método por valor
+        shared, max_length = self._values.setdefault, self.max_length
+        record = Record.__new__(Record)
+        record._schema = schema
+        record._values = tuple([shared(v, v) if type(v) is str and len(v) <= max_length else v
+                                for v in values])
+        return record
+
+
+def compact_productions(productions, interner=None):
+    """
+    Replaces the productions of a dict by compact Records, in place.
+
+    Args:
+        productions (dict): Production ID -> fields.
+        interner (Interner, optional): Interner to share, a new one by default.
+
+    Returns:
+        dict: productions.
+    """
+    interner = interner or Interner()
+    for prod_id, production in productions.items():
+        productions[prod_id] = interner.compact(production)
+    return productions
+
+
+def pack_productions(productions):
+    """
+    Converts productions to plain tuples that marshal can store, keeping the field
+    name tuples of the records shared.
+
+    Args:
+        productions (Mapping): Production ID -> fields (Records or dicts).
+
+    Returns:
+        dict: Production ID -> (field names, values).
+    """
+    packed = {}
+    for prod_id, production in productions.items():
+        if isinstance(production, Record):
+            packed[prod_id] = (production._schema.keys, production._values)
+        else:
+            packed[prod_id] = (tuple(production), tuple(production.values()))
+    return packed
+
+
+def unpack_productions(packed):
+    """
+    Inverse of pack_productions().
+
+    Args:
+        packed (dict): Production ID -> (field names, values).
+
+    Returns:
+        dict: Production ID -> Record.
+    """
+    return {prod_id: Record.from_values(schema_for(keys), values)
+            for prod_id, (keys, values) in packed.items()}
+
+
+def json_default(value):
+    """
+    ``default`` hook for json.dump() that writes Records as JSON objects.
+    """
+    if isinstance(value, Record):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,443 @@
+import os
+import json
+import zlib
+import socket
+
+from academic_publication_manager.modules.treefile  import fsync_directory
+from academic_publication_manager.modules.interning import json_default
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_VERSION = 2
+SESSION_SUFFIX = ".session"
+
+
+def journal_path(tree_path):
+    """
+    Returns the path of the change journal that belongs to a tree file.
+
+    Args:
+        tree_path (str): Path of the *.Publications.json file.
+
+    Returns:
+        str: Path of the journal file, stored next to the tree file.
+    """
+    return tree_path + JOURNAL_SUFFIX
+
+
+def get_folder(structure, path):
+    """
+    Walks the folder structure following a path.
+
+    Args:
+        structure (dict): The root folder structure.
+        path (list): List of folder names from the root.
+
+    Returns:
+        dict: The folder found at the end of the path.
+    """
+    current = structure
+    for key in path:
+        current = current[key]
+    return current
+
+
+def copy_folder(folder):
+    """
+    Copies a folder of the structure with its subfolders, as plain dicts.
+
+    Args:
+        folder (dict): The folder.
+
+    Returns:
+        dict: The copy; the productions are only names, so nothing else is shared.
+    """
+    return {key: copy_folder(value) if isinstance(value, dict) else value
+            for key, value in folder.items()}
+
+
+def sync_key(path):
+    """
+    Returns the key of a folder in the "sync" section of a data tree.
+
+    Args:
+        path (list): The folder path.
+
+    Returns:
+        str: The folder names as a JSON list, so names that contain "/" do not collide.
+    """
+    return json.dumps(list(path), ensure_ascii=False)
+
+
+def sync_path(key):
+    """
+    Returns the folder path of a key of the "sync" section.
+
+    Args:
+        key (str): A key made by sync_key().
+
+    Returns:
+        list: The folder path.
+    """
+    return json.loads(key)
+
+
+def move_sync_state(sync, path, new_path=None):
+    """
+    Moves the sync state of a folder and of its subfolders to a new path, or drops it.
+
+    The state of a folder replaced at the new path is dropped too.
+
+    Args:
+        sync (dict): The "sync" section of a data tree (sync key -> state).
+        path (list): The folder.
+        new_path (list, optional): The new path of the folder; None drops the state.
+
+    Returns:
+        dict: A new section, or the same one if no state was moved or dropped.
+    """
+    path = list(path)
+    if new_path is not None:
+        new_path = list(new_path)
+        if new_path == path:
+            return sync
+    result = {}
+    changed = False
+    for key, state in sync.items():
+        folder = sync_path(key)
+        if new_path is not None and folder[:len(new_path)] == new_path:
+            changed = True
+        elif folder[:len(path)] == path:
+            changed = True
+            if new_path is not None:
+                result[sync_key(new_path + folder[len(path):])] = state
+        else:
+            result[key] = state
+    return result if changed else sync
+
+
+def apply_change(data, record):
+    """
+    Applies one journal record to the data tree.
+
+    Supported records:
+        - ``{"op": "add", "path": [...], "name": str, "node": None|dict, "productions": {...}}``
+        - ``{"op": "remove", "path": [...], "productions": [...]}``
+        - ``{"op": "move", "src": [...], "dst": [...]}``
+        - ``{"op": "rename", "path": [...], "name": str, "production": bool}``
+        - ``{"op": "update-field", "id": str, "key": str, "value": str}``
+        - ``{"op": "sync", "path": [...], "file": str|None, "hashes": {id: str|None}}``
+
+    Adding, removing, moving or renaming a folder also moves or drops the sync state
+    of the folder and of its subfolders.
+
+    Args:
+        data (dict): Tree with the keys "structure" and "productions".
+        record (dict): The change to apply.
+    """
+    op = record["op"]
+    structure = data["structure"]
+    productions = data["productions"]
+
+    if op == "add":
+        folder = get_folder(structure, record["path"])
+        folder[record["name"]] = record["node"]
+        productions.update(record.get("productions", {}))
+        if record["node"] is not None:
+            _move_sync(data, list(record["path"]) + [record["name"]])
+
+    elif op == "remove":
+        path = record["path"]
+        parent = get_folder(structure, path[:-1])
+        if parent.pop(path[-1], None) is not None:
+            _move_sync(data, path)
+        for prod_id in record.get("productions", []):
+            productions.pop(prod_id, None)
+
+    elif op == "move":
+        src = record["src"]
+        source = get_folder(structure, src[:-1])
+        target = get_folder(structure, record["dst"])
+        target[src[-1]] = source.pop(src[-1])
+        if target[src[-1]] is not None:
+            _move_sync(data, src, list(record["dst"]) + src[-1:])
+
+    elif op == "rename":
+        path = record["path"]
+        parent = get_folder(structure, path[:-1])
+        parent[record["name"]] = parent.pop(path[-1])
+        if record.get("production") and path[-1] in productions:
+            productions[record["name"]] = productions.pop(path[-1])
+        if parent[record["name"]] is not None:
+            _move_sync(data, path, path[:-1] + [record["name"]])
+
+    elif op == "update-field":
+        # Copy-on-write: o registro pode ser compartilhado com um snapshot
+        production = productions.get(record["id"], {}).copy()
+        production[record["key"]] = record["value"]
+        productions[record["id"]] = production
+
+    elif op == "sync":
+        # Copy-on-write: a seção pode ser compartilhada com um snapshot
+        sync = dict(data.get("sync", {}))
+        key = sync_key(record["path"])
+        hashes = dict(sync.get(key, {}).get("hashes", {}))
+        for prod_id, digest in record["hashes"].items():
+            if digest is None:
+                hashes.pop(prod_id, None)
+            else:
+                hashes[prod_id] = digest
+        if record["file"] is None and not hashes:
+            sync.pop(key, None)
+        else:
+            sync[key] = {"file": record["file"], "hashes": hashes}
+        data["sync"] = sync
+
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+def _move_sync(data, path, new_path=None):
+    # O estado de sincronização acompanha a pasta (copy-on-write, como a seção "sync")
+    if data.get("sync"):
+        data["sync"] = move_sync_state(data["sync"], path, new_path)
+
+
+class ChangeJournal:
+    """
+    Write-ahead log of the changes made to a tree file since its last full write.
+
+    The first line is a header with the sha256 of the tree file the records apply to;
+    every other line is one record (see :func:`apply_change`) prefixed with a sequence
+    number and a CRC-32, so recording an edit costs the size of the edit and not the
+    size of the library. Each append is flushed to disk with fsync.
+
+    When the journal is read, it stops at the first torn or corrupted line, and a
+    journal whose header does not match the tree file (the tree was rewritten but the
+    crash happened before the journal was cleared) is ignored. The journal is
+    compacted into the tree file by rewriting the whole file and clearing the journal.
+
+    Attributes:
+        base (str): sha256 (hex) of the tree file the new records apply to.
+        count (int): Number of valid records in the journal.
+    """
+
+    def __init__(self, tree_path):
+        self.path = journal_path(tree_path)
+        self.base = None
+        self.count = 0
+        # Tamanho da parte válida do arquivo; o resto é descartado antes do próximo append
+        self._valid_size = None
+
+    def read(self):
+        """
+        Reads all valid records stored in the journal.
+
+        Returns:
+            list: The records, in the order they were appended.
+        """
+        records = []
+        self.count = 0
+        self._valid_size = 0
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'rb') as f:
+            content = f.read()
+
+        lines = content.splitlines(keepends=True)
+        if not lines:
+            return records
+        header = self._parse_json(lines[0])
+        if (not lines[0].endswith(b"\n") or not isinstance(header, dict)
+                or header.get("journal") != JOURNAL_VERSION or header.get("base") != self.base):
+            # Journal corrompido ou de outra versão do arquivo: nada a aplicar, e ele é descartado no próximo append
+            return records
+
+        offset = len(lines[0])
+        for line in lines[1:]:
+            record = self._parse_record(line, len(records) + 1) if line.endswith(b"\n") else None
+            if record is None:
+                break
+            records.append(record)
+            offset += len(line)
+        self._valid_size = offset
+        self.count = len(records)
+        return records
+
+    def _parse_json(self, line):
+        try:
+            return json.loads(line.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def _parse_record(self, line, seq):
+        try:
+            seq_text, crc_text, payload = line.rstrip(b"\n").split(b" ", 2)
+            if int(seq_text) != seq or int(crc_text, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def replay(self, data):
+        """
+        Applies all journal records to a freshly loaded data tree.
+
+        Records that no longer match the tree are skipped.
+
+        Args:
+            data (dict): Tree loaded from the tree file.
+
+        Returns:
+            int: Number of records applied.
+        """
+        applied = 0
+        for record in self.read():
+            try:
+                apply_change(data, record)
+                applied += 1
+            except (KeyError, TypeError, AttributeError):
+                pass
+        return applied
+
+    def append(self, records):
+        """
+        Appends records to the end of the journal and flushes them to disk.
+
+        Args:
+            records (list): Records to append.
+        """
+        if not records:
+            return
+        if self._valid_size is None:
+            self.read()
+
+        chunks = []
+        for seq, record in enumerate(records, self.count + 1):
+            payload = json.dumps(record, ensure_ascii=False, default=json_default).encode('utf-8')
+            chunks.append(b"%d %08x " % (seq, zlib.crc32(payload)) + payload + b"\n")
+
+        new_file = self._valid_size == 0
+        with open(self.path, 'r+b' if os.path.exists(self.path) else 'wb') as f:
+            # Descarta uma linha incompleta ou um journal de outra versão do arquivo
+            f.truncate(self._valid_size)
+            f.seek(self._valid_size)
+            if new_file:
+                header = {"journal": JOURNAL_VERSION, "base": self.base}
+                f.write(json.dumps(header).encode('utf-8') + b"\n")
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+            self._valid_size = f.tell()
+        if new_file:
+            fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self.count += len(records)
+
+    def clear(self, base=None):
+        """
+        Removes the journal, usually after its content was compacted into the tree file.
+
+        Args:
+            base (str, optional): sha256 (hex) of the tree file the next records apply to.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if base is not None:
+            self.base = base
+        self.count = 0
+        self._valid_size = 0
+
+
+class SessionMarker:
+    """
+    File that exists next to a tree file while it is open, to detect unclean shutdowns.
+
+    The marker is created when a window starts working on the tree file and removed
+    when the window closes it. A marker left by a process that is no longer running
+    means the program crashed or was killed while the file was open.
+    """
+
+    def __init__(self, tree_path):
+        self.path = tree_path + SESSION_SUFFIX
+
+    def is_stale(self):
+        """
+        Returns:
+            bool: True if a marker was left by a process that is no longer running.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            return True
+        if owner.get("host") != socket.gethostname():
+            # Não é possível verificar um processo de outra máquina
+            return False
+        return not _process_alive(owner.get("pid"))
+
+    def create(self):
+        """
+        Creates the marker of the current process. Errors are ignored.
+        """
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({"pid": os.getpid(), "host": socket.gethostname()}, f)
+        except OSError:
+            pass
+
+    def remove(self):
+        """
+        Removes the marker if it belongs to the current process.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+            if owner.get("pid") == os.getpid() and owner.get("host") == socket.gethostname():
+                os.remove(self.path)
+        except (OSError, ValueError):
+            pass
+
+
+def _process_alive(pid):
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # No Windows, os.kill() encerra o processo em vez de testá-lo
+        return _windows_process_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _windows_process_alive(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Sem permissão para abrir: o processo existe, mas é de outro usuário
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
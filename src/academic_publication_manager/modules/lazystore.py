@@ -0,0 +1,258 @@
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from academic_publication_manager.modules.interning import pack_productions, unpack_productions
+
+# Campos mantidos em memória para cada produção (árvore e tabela)
+SUMMARY_FIELDS = ("entry-type", "title", "year")
+
+# Número máximo de produções materializadas mantidas em memória
+MAX_MATERIALIZED = 256
+
+
+def make_summary(production):
+    """
+    Extracts the fields of a production that are kept in memory by a lazy store.
+
+    Args:
+        production (dict): The full production.
+
+    Returns:
+        dict: Only the summary fields present in the production.
+    """
+    return {key: production[key] for key in SUMMARY_FIELDS if key in production}
+
+
+def get_summary(productions, prod_id, default=None):
+    """
+    Returns the summary fields (title, year, entry type) of a production without
+    loading all its fields when the productions are stored lazily.
+
+    Args:
+        productions (Mapping): The productions dict or a LazyProductions store.
+        prod_id (str): The production ID.
+        default: Value returned when the production does not exist.
+
+    Returns:
+        Mapping: An object with at least the summary fields of the production.
+    """
+    if isinstance(productions, LazyProductions):
+        return productions.summary(prod_id, default)
+    return productions.get(prod_id, default)
+
+
+class Ref:
+    """
+    Position of the JSON text of a production inside the tree file.
+
+    Refs are shared between a store and its snapshots and are updated in place when
+    the tree file is rewritten, so every holder sees the new position.
+    """
+    __slots__ = ("offset", "length")
+
+    def __init__(self, offset, length):
+        self.offset = offset
+        self.length = length
+
+
+class _Source:
+    """
+    The file the refs point into, shared by a store and its snapshots.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+
+
+class LazyProductions(MutableMapping):
+    """
+    Productions dict that keeps only an offset index into the tree file.
+
+    The summary fields of every production stay in memory (see SUMMARY_FIELDS); the
+    full field dict is read from the file when the production is accessed and kept
+    in a bounded LRU. Productions created or replaced after loading are kept in
+    memory until the next full write of the tree file.
+
+    The returned dicts must not be modified in place: assign a new dict instead.
+    """
+
+    def __init__(self, path, max_materialized=MAX_MATERIALIZED):
+        self._source = _Source(path)
+        self._entries = {}
+        self._summaries = {}
+        self._materialized = OrderedDict()
+        self.max_materialized = max_materialized
+        self.origin = None
+
+    @property
+    def path(self):
+        return self._source.path
+
+    @property
+    def lock(self):
+        return self._source.lock
+
+    def add_ref(self, prod_id, offset, length, summary):
+        """
+        Registers a production stored in the tree file.
+
+        Args:
+            prod_id (str): The production ID.
+            offset (int): Byte offset of the JSON value of the production.
+            length (int): Length in bytes of the JSON value.
+            summary (dict): Summary fields of the production.
+        """
+        self._entries[prod_id] = Ref(offset, length)
+        self._summaries[prod_id] = summary
+
+    def __getitem__(self, prod_id):
+        entry = self._entries[prod_id]
+        if not isinstance(entry, Ref):
+            return entry
+        production = self._materialized.get(prod_id)
+        if production is not None:
+            self._materialized.move_to_end(prod_id)
+            return production
+
+        with self.lock:
+            with open(self.path, 'rb') as f:
+                f.seek(entry.offset)
+                production = json.loads(f.read(entry.length).decode('utf-8'))
+        self._materialized[prod_id] = production
+        if len(self._materialized) > self.max_materialized:
+            self._materialized.popitem(last=False)
+        return production
+
+    def __setitem__(self, prod_id, production):
+        # O lock impede que rebind() troque a produção nova por uma ref para a antiga
+        with self.lock:
+            self._entries[prod_id] = production
+            self._summaries.pop(prod_id, None)
+            self._materialized.pop(prod_id, None)
+
+    def __delitem__(self, prod_id):
+        with self.lock:
+            del self._entries[prod_id]
+            self._summaries.pop(prod_id, None)
+            self._materialized.pop(prod_id, None)
+
+    def __contains__(self, prod_id):
+        return prod_id in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def summary(self, prod_id, default=None):
+        """
+        Returns the summary fields of a production without reading the tree file.
+
+        Args:
+            prod_id (str): The production ID.
+            default: Value returned when the production does not exist.
+
+        Returns:
+            Mapping: The summary, or the full production if it is in memory.
+        """
+        entry = self._entries.get(prod_id)
+        if entry is None:
+            return default
+        if isinstance(entry, Ref):
+            return self._summaries[prod_id]
+        return entry
+
+    def copy(self):
+        """
+        Returns a snapshot of the store that shares the refs and the source file.
+
+        Returns:
+            LazyProductions: The snapshot.
+        """
+        snapshot = LazyProductions.__new__(LazyProductions)
+        snapshot._source = self._source
+        snapshot._entries = dict(self._entries)
+        snapshot._summaries = dict(self._summaries)
+        snapshot._materialized = OrderedDict()
+        snapshot.max_materialized = self.max_materialized
+        snapshot.origin = self
+        return snapshot
+
+    def iter_raw(self):
+        """
+        Iterates over the productions, giving the JSON text of those still stored in the file.
+
+        Yields:
+            tuple: ``(prod_id, raw, production)`` where raw is the JSON text (bytes) of the
+            production in the tree file, or None for the productions kept in memory.
+        """
+        with open(self.path, 'rb') as f:
+            for prod_id, entry in self._entries.items():
+                if isinstance(entry, Ref):
+                    f.seek(entry.offset)
+                    yield prod_id, f.read(entry.length), None
+                else:
+                    yield prod_id, None, entry
+
+    def rebind(self, snapshot, path, spans):
+        """
+        Points the store to a tree file that was just written from one of its snapshots.
+
+        Must be called with the lock held, right after the file was replaced. The
+        store is modified with the same lock held, so a production assigned while the
+        store is rebound is not replaced by a ref to the one written.
+
+        Args:
+            snapshot (LazyProductions): The snapshot that was written.
+            path (str): The written tree file.
+            spans (dict): Production ID -> (offset, length) in the written file.
+        """
+        self._source.path = path
+        for prod_id, (offset, length) in spans.items():
+            written = snapshot._entries[prod_id]
+            if isinstance(written, Ref):
+                written.offset = offset
+                written.length = length
+            elif self._entries.get(prod_id) is written:
+                # A produção editada volta a ser lida do arquivo
+                self._entries[prod_id] = Ref(offset, length)
+                self._summaries[prod_id] = make_summary(written)
+
+    def index_state(self):
+        """
+        Returns the offset index and the summaries, for the snapshot cache.
+
+        Only valid when every production is stored in the file.
+
+        Returns:
+            dict: ``{"spans": {id: (offset, length)}, "summaries": {id: packed summary}}``, or None
+            (see interning.pack_productions()).
+        """
+        spans = {}
+        for prod_id, entry in self._entries.items():
+            if not isinstance(entry, Ref):
+                return None
+            spans[prod_id] = (entry.offset, entry.length)
+        return {"spans": spans, "summaries": pack_productions(self._summaries)}
+
+    @classmethod
+    def from_index_state(cls, path, state):
+        """
+        Rebuilds a store from the state returned by index_state().
+
+        Args:
+            path (str): The tree file.
+            state (dict): The saved state.
+
+        Returns:
+            LazyProductions: The store.
+        """
+        store = cls(path)
+        summaries = unpack_productions(state["summaries"])
+        for prod_id, (offset, length) in state["spans"].items():
+            store.add_ref(prod_id, offset, length, summaries[prod_id])
+        return store
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import QWidget, QFormLayout, QLabel, QLineEdit, QTextEdit
+
+# Campos longos, editados em várias linhas
+MULTILINE_FIELDS = ("author", "title", "note")
+READ_ONLY_FIELDS = ("entry-type",)
+
+# Número máximo de formulários guardados (um por conjunto de campos)
+FORM_POOL_SIZE = 16
+
+
+class MetadataForm(QWidget):
+    """
+    Editor of the fields of a production.
+
+    The labels and editors are created once for a tuple of field names; showing
+    another production with the same fields only assigns the new values.
+
+    Attributes:
+        keys (tuple): The field names, in order.
+        fields (dict): Field name -> editor (QLineEdit or QTextEdit).
+    """
+
+    def __init__(self, keys, parent=None):
+        super().__init__(parent)
+        self.keys = keys
+        self.fields = {}
+        layout = QFormLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        for key in keys:
+            label = QLabel("<b>" + key + ":</b>")
+            if key in MULTILINE_FIELDS:
+                edit = QTextEdit()
+            else:
+                edit = QLineEdit()
+            if key in READ_ONLY_FIELDS:
+                edit.setReadOnly(True)
+            layout.addRow(label, edit)
+            self.fields[key] = edit
+
+    def set_values(self, prod):
+        """
+        Shows the values of a production with the fields of the form.
+
+        Args:
+            prod (Mapping): The production fields.
+        """
+        for key, edit in self.fields.items():
+            value = str(prod.get(key, ""))
+            if isinstance(edit, QTextEdit):
+                edit.setPlainText(value)
+            else:
+                edit.setText(value)
+                edit.setCursorPosition(0)
+
+
+class MetadataFormPool:
+    """
+    Forms of the metadata panel, one per set of fields (in practice, one per entry
+    type), kept hidden in the panel layout and reused.
+
+    Only the current form is visible. When the pool is full, the form used least
+    recently is destroyed.
+    """
+
+    def __init__(self, layout, size=FORM_POOL_SIZE):
+        self.layout = layout
+        self.size = size
+        self.forms = OrderedDict()
+        self.current = None
+
+    def show(self, prod):
+        """
+        Shows a production in the form of its fields, creating the form if needed.
+
+        Args:
+            prod (Mapping): The production fields.
+
+        Returns:
+            MetadataForm: The visible form.
+        """
+        keys = tuple(prod)
+        form = self.forms.get(keys)
+        if form is None:
+            form = self.forms[keys] = MetadataForm(keys)
+            form.hide()
+            self.layout.addWidget(form)
+            while len(self.forms) > self.size:
+                _, old = self.forms.popitem(last=False)
+                self.layout.removeWidget(old)
+                old.deleteLater()
+        self.forms.move_to_end(keys)
+
+        form.set_values(prod)
+        if form is not self.current:
+            if self.current is not None and self.current in self.forms.values():
+                self.current.hide()
+            form.show()
+            self.current = form
+        return form
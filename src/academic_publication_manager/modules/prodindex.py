@@ -0,0 +1,238 @@
+from academic_publication_manager.modules.shards import is_unloaded_shard
+
+
+class ProductionIndex:
+    """
+    Reverse index of the folder structure: the folders of every production ID, and
+    the productions and subfolders of every folder.
+
+    The index is rebuilt when the data tree is replaced (rebuild()) and then kept up
+    to date with the change records of the tree (apply(), the same records written
+    in the journal), so finding the folder of a production or the productions of a
+    folder does not walk the structure.
+
+    Folders are identified by the tuple of their names from the root. The content of
+    an unloaded shard is indexed when it is read (see reload_folder()).
+    """
+
+    def __init__(self):
+        # ID -> pastas que contêm a produção (dict usado como conjunto ordenado)
+        self._folders = {}
+        # Pasta -> produções diretamente dentro dela
+        self._members = {}
+        # Pasta -> nomes das subpastas
+        self._subfolders = {}
+
+    def rebuild(self, structure):
+        """
+        Indexes a whole folder structure, discarding the previous content.
+
+        Args:
+            structure (dict): The folder structure.
+        """
+        self._folders = {}
+        self._members = {}
+        self._subfolders = {}
+        self._add_folder((), structure)
+
+    # Consultas
+
+    def folder_of(self, prod_id):
+        """
+        Args:
+            prod_id (str): A production ID.
+
+        Returns:
+            list: The path of the (first) folder that contains the production, or
+            None if it is not in the structure.
+        """
+        folders = self._folders.get(prod_id)
+        return list(next(iter(folders))) if folders else None
+
+    def folders_of(self, prod_id):
+        """
+        Args:
+            prod_id (str): A production ID.
+
+        Returns:
+            list: The paths of all the folders that contain the production.
+        """
+        return [list(folder) for folder in self._folders.get(prod_id, ())]
+
+    def contains(self, path, prod_id):
+        """
+        Args:
+            path (list): A folder.
+            prod_id (str): A production ID.
+
+        Returns:
+            bool: True if the production is in the folder or in one of its subfolders.
+        """
+        path = tuple(path)
+        return any(folder[:len(path)] == path for folder in self._folders.get(prod_id, ()))
+
+    def folders(self):
+        """
+        Returns:
+            list: The paths of all the indexed folders (not the root), sorted.
+        """
+        return sorted(list(folder) for folder in self._members if folder)
+
+    def productions_in(self, path, recursive=True):
+        """
+        Args:
+            path (list): A folder.
+            recursive (bool): If True, includes the productions of the subfolders.
+
+        Returns:
+            list: (production ID, folder path) for each production of the folder.
+        """
+        result = []
+        stack = [tuple(path)]
+        while stack:
+            folder = stack.pop()
+            if folder not in self._members:
+                continue
+            folder_path = list(folder)
+            result.extend((prod_id, folder_path) for prod_id in self._members[folder])
+            if recursive:
+                stack.extend(folder + (name,) for name in reversed(self._subfolders[folder]))
+        return result
+
+    # Atualização
+
+    def _add_folder(self, path, folder):
+        self._members.setdefault(path, {})
+        self._subfolders.setdefault(path, {})
+        if path and path[:-1] in self._subfolders:
+            self._subfolders[path[:-1]][path[-1]] = None
+        if is_unloaded_shard(folder):
+            return
+        stack = [(path, folder)]
+        while stack:
+            current_path, current = stack.pop()
+            for key, value in current.items():
+                if not key:
+                    continue
+                if value is None:
+                    self._add_production(current_path, key)
+                elif isinstance(value, dict):
+                    child = current_path + (key,)
+                    self._members.setdefault(child, {})
+                    self._subfolders.setdefault(child, {})
+                    self._subfolders[current_path][key] = None
+                    if not is_unloaded_shard(value):
+                        stack.append((child, value))
+
+    def _add_production(self, path, prod_id):
+        self._members.setdefault(path, {})[prod_id] = None
+        self._folders.setdefault(prod_id, {})[path] = None
+
+    def _remove_production(self, path, prod_id):
+        self._members.get(path, {}).pop(prod_id, None)
+        folders = self._folders.get(prod_id)
+        if folders is not None:
+            folders.pop(path, None)
+            if not folders:
+                del self._folders[prod_id]
+
+    def _subtree(self, path):
+        # A pasta e todas as subpastas indexadas
+        stack = [path]
+        while stack:
+            folder = stack.pop()
+            if folder in self._subfolders:
+                yield folder
+                stack.extend(folder + (name,) for name in self._subfolders[folder])
+
+    def _remove_folder(self, path):
+        for folder in list(self._subtree(path)):
+            for prod_id in list(self._members[folder]):
+                self._remove_production(folder, prod_id)
+            del self._members[folder]
+            del self._subfolders[folder]
+        if path and path[:-1] in self._subfolders:
+            self._subfolders[path[:-1]].pop(path[-1], None)
+
+    def _move_folder(self, path, new_path):
+        # As produções da pasta e das subpastas trocam de caminho
+        start = len(path)
+        for folder in list(self._subtree(path)):
+            new_folder = new_path + folder[start:]
+            members = self._members.pop(folder)
+            self._members[new_folder] = members
+            self._subfolders[new_folder] = self._subfolders.pop(folder)
+            for prod_id in members:
+                folders = self._folders[prod_id]
+                del folders[folder]
+                folders[new_folder] = None
+        if path[:-1] in self._subfolders:
+            self._subfolders[path[:-1]].pop(path[-1], None)
+        if new_path[:-1] in self._subfolders:
+            self._subfolders[new_path[:-1]][new_path[-1]] = None
+
+    def remove(self, path):
+        """
+        Removes a production or folder (with its content) from the index.
+
+        Args:
+            path (list): The removed entry.
+        """
+        path = tuple(path)
+        if not path:
+            return
+        if path in self._members:
+            self._remove_folder(path)
+        else:
+            self._remove_production(path[:-1], path[-1])
+
+    def _relocate(self, path, new_path):
+        if path == new_path:
+            return
+        if new_path in self._members or new_path[-1] in self._members.get(new_path[:-1], {}):
+            # A entrada de mesmo nome no destino foi substituída
+            self.remove(new_path)
+        if path in self._members:
+            self._move_folder(path, new_path)
+        elif path[-1] in self._members.get(path[:-1], {}):
+            self._remove_production(path[:-1], path[-1])
+            self._add_production(new_path[:-1], new_path[-1])
+
+    def reload_folder(self, path, folder):
+        """
+        Indexes again the content of a folder that was replaced (for example, a shard
+        read from disk).
+
+        Args:
+            path (list): The folder.
+            folder (dict): Its new content.
+        """
+        path = tuple(path)
+        self._remove_folder(path)
+        self._add_folder(path, folder)
+
+    def apply(self, record):
+        """
+        Updates the index with a change of the data tree.
+
+        Args:
+            record (dict): The change, in the format of journal.apply_change().
+        """
+        op = record["op"]
+        if op == "add":
+            path = tuple(record["path"])
+            name = record["name"]
+            if path + (name,) in self._members or name in self._members.get(path, {}):
+                self.remove(path + (name,))
+            if record["node"] is None:
+                self._add_production(path, name)
+            elif isinstance(record["node"], dict):
+                self._add_folder(path + (name,), record["node"])
+        elif op == "remove":
+            self.remove(record["path"])
+        elif op == "move":
+            src = tuple(record["src"])
+            self._relocate(src, tuple(record["dst"]) + src[-1:])
+        elif op == "rename":
+            path = tuple(record["path"])
+            self._relocate(path, path[:-1] + (record["name"],))
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# Tempo de espera (ms) para agrupar várias edições seguidas em uma única escrita
+SAVE_DELAY_MS = 500
+
+
+class SaveScheduler(QObject):
+    """
+    Coalesces save requests and runs the writes on a worker thread.
+
+    mark_dirty() (re)starts a debounce timer. When the timer expires, ``job_factory``
+    is called on the GUI thread; it must take an immutable snapshot of what has to be
+    written and return a callable (or None). The callable runs on a single worker
+    thread, so the writes happen in the same order they were requested.
+
+    Signals:
+        state_changed (str): "pending", "saving", "saved" or "error".
+        save_failed (str): Error message of a failed write.
+    """
+    state_changed = pyqtSignal(str)
+    save_failed = pyqtSignal(str)
+    _job_finished = pyqtSignal(object)
+
+    def __init__(self, job_factory, delay_ms=SAVE_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.job_factory = job_factory
+        self.dirty = False
+        self._running = 0
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        self.delay_ms = delay_ms
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._submit)
+
+        self._job_finished.connect(self._on_job_finished)
+
+    def mark_dirty(self, immediate=False):
+        """
+        Marks the document as modified and (re)starts the debounce timer.
+
+        Args:
+            immediate (bool): If True, the save is submitted as soon as the control returns
+                to the event loop, without waiting for the debounce delay.
+        """
+        self.dirty = True
+        if immediate:
+            self._timer.start(0)
+        else:
+            self._timer.start(self.delay_ms)
+        self.state_changed.emit("pending")
+
+    def flush(self):
+        """
+        Submits the pending save immediately and waits until every write has finished.
+        """
+        self._timer.stop()
+        if self.dirty:
+            self._submit()
+        for future in self._futures:
+            future.exception()
+        self._futures = []
+
+    def shutdown(self):
+        """
+        Flushes the pending writes and stops the worker thread.
+        """
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def _submit(self):
+        self.dirty = False
+        job = self.job_factory()
+        if job is None:
+            if not self._running:
+                self.state_changed.emit("saved")
+            return
+
+        def run():
+            try:
+                job()
+                self._job_finished.emit(None)
+            except Exception as e:
+                self._job_finished.emit(e)
+
+        self._running += 1
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(self._executor.submit(run))
+        self.state_changed.emit("saving")
+
+    def _on_job_finished(self, error):
+        self._running -= 1
+        if error is not None:
+            self.state_changed.emit("error")
+            self.save_failed.emit(str(error))
+        elif self.dirty:
+            self.state_changed.emit("pending")
+        elif not self._running:
+            self.state_changed.emit("saved")
@@ -0,0 +1,150 @@
+import uuid
+
+# Profundidade das pastas que viram shards: os grupos dentro das pastas do primeiro nível
+# (normalmente "Root"), já que quase toda árvore tem uma única pasta no primeiro nível
+SHARD_DEPTH = 2
+
+
+class ShardFolder(dict):
+    """
+    Folder of the data tree that is stored in its own shard file.
+
+    A shard that was not loaded yet is an empty folder with loaded set to False, so
+    the code that walks the structure simply sees an empty folder.
+
+    Attributes:
+        shard_id (str): Name of the shard file, without extension.
+        loaded (bool): False while the content of the shard is only on disk.
+        dirty (bool): True if the shard changed since it was last written.
+    """
+
+    def __init__(self, children=(), shard_id=None, loaded=True, dirty=False):
+        super().__init__(children)
+        self.shard_id = shard_id or new_shard_id()
+        self.loaded = loaded
+        self.dirty = dirty
+
+    def snapshot(self, children):
+        """
+        Copies the folder for a save snapshot and clears its dirty flag.
+
+        Args:
+            children (dict): The already copied children of the folder.
+
+        Returns:
+            ShardFolder: The copy.
+        """
+        copy = ShardFolder(children, self.shard_id, self.loaded, self.dirty)
+        self.dirty = False
+        return copy
+
+
+def new_shard_id():
+    """
+    Returns:
+        str: A new unique shard file name.
+    """
+    return uuid.uuid4().hex
+
+
+def is_unloaded_shard(value):
+    """
+    Args:
+        value: A value of the structure.
+
+    Returns:
+        bool: True if value is a shard whose content was not loaded yet.
+    """
+    return isinstance(value, ShardFolder) and not value.loaded
+
+
+def iter_shard_folders(structure, depth=SHARD_DEPTH, path=None):
+    """
+    Iterates over the folders of the structure at the shard depth.
+
+    Args:
+        structure (dict): The folder structure.
+        depth (int): Depth of the shard folders.
+        path (list, optional): Path of structure.
+
+    Yields:
+        tuple: ``(parent, name, path, folder)`` of every folder at the given depth.
+    """
+    path = path or []
+    for name, value in structure.items():
+        if not isinstance(value, dict):
+            continue
+        if len(path) + 1 == depth:
+            yield structure, name, path + [name], value
+        else:
+            yield from iter_shard_folders(value, depth, path + [name])
+
+
+def adopt_shard_folders(structure):
+    """
+    Turns the plain folders at the shard depth (new or moved folders) into ShardFolders.
+
+    The new shards are marked as dirty, so they are written by the next save.
+
+    Args:
+        structure (dict): The folder structure, modified in place.
+    """
+    for parent, name, path, folder in list(iter_shard_folders(structure)):
+        if not isinstance(folder, ShardFolder):
+            parent[name] = ShardFolder(folder, dirty=True)
+
+
+def shard_on_path(structure, path):
+    """
+    Finds the shard folder that contains a path.
+
+    Args:
+        structure (dict): The folder structure.
+        path (list): A path of the structure.
+
+    Returns:
+        ShardFolder: The shard, or None if path is above the shard depth or does not exist.
+    """
+    if len(path) < SHARD_DEPTH:
+        return None
+    current = structure
+    for key in path[:SHARD_DEPTH]:
+        if not isinstance(current, dict) or key not in current:
+            return None
+        current = current[key]
+    return current if isinstance(current, ShardFolder) else None
+
+
+def production_ids(structure):
+    """
+    Args:
+        structure (dict): A folder.
+
+    Returns:
+        list: The IDs of the productions inside the folder and its subfolders.
+    """
+    ids = []
+    for key, value in structure.items():
+        if isinstance(value, dict):
+            ids.extend(production_ids(value))
+        else:
+            ids.append(key)
+    return ids
+
+
+def contains_production(structure, prod_id):
+    """
+    Args:
+        structure (dict): A folder.
+        prod_id (str): A production ID.
+
+    Returns:
+        bool: True if the production is inside the folder or one of its subfolders.
+    """
+    for key, value in structure.items():
+        if isinstance(value, dict):
+            if contains_production(value, prod_id):
+                return True
+        elif key == prod_id:
+            return True
+    return False
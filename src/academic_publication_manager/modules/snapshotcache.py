@@ -0,0 +1,136 @@
+import os
+import struct
+import marshal
+import hashlib
+
+CACHE_SUFFIX = ".cache"
+CACHE_MAGIC = b"APMCACHE"
+CACHE_VERSION = 3
+
+# versão do cache, versão do marshal, tamanho e mtime do JSON, sha256 do JSON, sha256 do conteúdo
+_HEADER = struct.Struct("<HHQQ32s32s")
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def cache_path(tree_path):
+    """
+    Returns the path of the snapshot cache that belongs to a tree file.
+
+    Args:
+        tree_path (str): Path of the *.Publications.json file.
+
+    Returns:
+        str: Path of the cache file, stored next to the tree file.
+    """
+    return tree_path + CACHE_SUFFIX
+
+
+class HashingReader:
+    """
+    Wraps a binary file and computes the sha256 of everything read through it.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        chunk = self.f.read(size)
+        self.sha256.update(chunk)
+        return chunk
+
+    def tell(self):
+        return self.f.tell()
+
+    def digest(self):
+        return self.sha256.digest()
+
+
+def file_digest(path):
+    """
+    Computes the sha256 of a file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        bytes: The digest.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.digest()
+
+
+def load_snapshot_cache(tree_path):
+    """
+    Reads the payload of the snapshot cache, if the cache is still valid.
+
+    The cache is valid when the size, the modification time and the sha256 of the tree
+    file are the ones recorded in it, and its own content is intact.
+
+    Args:
+        tree_path (str): Path of the tree file.
+
+    Returns:
+        tuple: (the payload given to write_snapshot_cache(), sha256 of the tree file),
+        or None if there is no valid cache.
+    """
+    path = cache_path(tree_path)
+    try:
+        st = os.stat(tree_path)
+        with open(path, 'rb') as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            version, marshal_version, size, mtime_ns, json_digest, payload_digest = _HEADER.unpack(header)
+            if (version, marshal_version) != (CACHE_VERSION, marshal.version):
+                return None
+            if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+                return None
+            payload = f.read()
+    except OSError:
+        return None
+
+    if hashlib.sha256(payload).digest() != payload_digest:
+        return None
+    if file_digest(tree_path) != json_digest:
+        return None
+    try:
+        data = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+    return (data, json_digest) if isinstance(data, dict) else None
+
+
+def write_snapshot_cache(tree_path, payload, json_digest):
+    """
+    Writes the snapshot cache of a tree file.
+
+    Errors are ignored: the cache is only an optimization.
+
+    Args:
+        tree_path (str): Path of the tree file, already written.
+        payload (dict): What the tree file contains, in a form that marshal can store.
+        json_digest (bytes): sha256 of the tree file.
+    """
+    path = cache_path(tree_path)
+    tmp_path = path + ".tmp"
+    try:
+        st = os.stat(tree_path)
+        payload = marshal.dumps(payload, marshal.version)
+        header = _HEADER.pack(CACHE_VERSION, marshal.version, st.st_size, st.st_mtime_ns,
+                              json_digest, hashlib.sha256(payload).digest())
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
@@ -0,0 +1,968 @@
+import os
+import json
+import time
+import sqlite3
+
+from academic_publication_manager.modules.journal    import ChangeJournal, SessionMarker, get_folder, apply_change, move_sync_state
+from academic_publication_manager.modules.treefile   import atomic_write_json, write_temp_tree, commit_temp_file
+from academic_publication_manager.modules.lazystore  import LazyProductions, make_summary
+from academic_publication_manager.modules.interning  import Interner, pack_productions, unpack_productions
+from academic_publication_manager.modules.compression import open_reader, TransferStats
+from academic_publication_manager.modules.treeloader import iter_tree_file
+from academic_publication_manager.modules.snapshotcache import HashingReader
+from academic_publication_manager.modules.snapshotcache import load_snapshot_cache, write_snapshot_cache
+from academic_publication_manager.modules.shards import SHARD_DEPTH, ShardFolder, new_shard_id, is_unloaded_shard
+from academic_publication_manager.modules.shards import iter_shard_folders, adopt_shard_folders, shard_on_path
+from academic_publication_manager.modules.shards import contains_production, production_ids
+
+JSON_EXTENSION = ".Publications.json"
+SQLITE_EXTENSION = ".Publications.sqlite"
+SHARDED_EXTENSION = ".Publications.manifest.json"
+
+# Diretório dos shards: library.Publications.manifest.json -> library.Publications.shards/
+SHARDS_DIRECTORY_SUFFIX = ".Publications.shards"
+SHARDED_FORMAT = "sharded-tree"
+SHARDED_FORMAT_VERSION = 1
+
+# Number of journal records after which the journal is compacted into the tree file
+JOURNAL_COMPACT_LIMIT = 500
+
+# Keep a binary snapshot cache (*.Publications.json.cache) next to the JSON files
+SNAPSHOT_CACHE_ENABLED = True
+
+# JSON files from this size on are opened in lazy mode: only an offset index and the
+# summary fields of the productions are kept in memory (see lazystore)
+LAZY_LOAD_MIN_SIZE = 16 << 20
+
+SQLITE_SCHEMA_VERSION = 1
+
+# Pasta invisível que contém as pastas do primeiro nível de "structure"
+ROOT_FOLDER_ID = 0
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS folders (
+    id        INTEGER PRIMARY KEY,
+    parent_id INTEGER NOT NULL,
+    name      TEXT NOT NULL,
+    position  INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS folders_parent ON folders(parent_id, name);
+CREATE TABLE IF NOT EXISTS productions (
+    id         TEXT PRIMARY KEY,
+    entry_type TEXT,
+    year       TEXT,
+    title      TEXT,
+    position   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS productions_year       ON productions(year);
+CREATE INDEX IF NOT EXISTS productions_entry_type ON productions(entry_type);
+CREATE INDEX IF NOT EXISTS productions_position   ON productions(position);
+CREATE TABLE IF NOT EXISTS fields (
+    production_id TEXT NOT NULL,
+    key           TEXT NOT NULL,
+    value         TEXT,
+    position      INTEGER NOT NULL,
+    PRIMARY KEY (production_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS membership (
+    folder_id     INTEGER NOT NULL,
+    production_id TEXT NOT NULL,
+    position      INTEGER NOT NULL,
+    PRIMARY KEY (folder_id, production_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS membership_production ON membership(production_id);
+"""
+
+# Campos copiados na tabela productions para permitir consultas indexadas
+INDEXED_FIELDS = {"entry-type": "entry_type", "year": "year", "title": "title"}
+
+
+class StorageBackend:
+    """
+    Base class of the storage backends of a data tree.
+
+    A backend reads a whole tree (``{"structure": ..., "productions": ...}``), applies
+    journal records (see journal.apply_change) incrementally and writes full snapshots.
+    The write methods are called from the save worker thread, one at a time.
+    """
+    extension = None
+    # True if a LazyProductions store can keep reading the productions from the stored file
+    lazy_productions = False
+    # True if apply_changes() costs the size of the changes, so they are saved right away
+    # instead of being debounced
+    incremental_saves = False
+
+    def __init__(self, path):
+        self.path = path
+        # TransferStats of the last read and write, for the backends that report them
+        self.last_load_stats = None
+        self.last_write_stats = None
+        self.session = SessionMarker(path)
+        # Set by finish_load(): the file was not closed properly the last time it was open
+        self.unclean_shutdown = False
+        # Set by finish_load(): changes recovered from a write-ahead log
+        self.recovered_changes = 0
+
+    def iter_load(self):
+        """
+        Reads the tree, see treeloader.iter_tree_file() for the yielded events.
+        """
+        raise NotImplementedError("You need to implement iter_load() in the storage backend.")
+
+    def load_progress(self):
+        """
+        Returns:
+            float: Fraction of the tree already read by iter_load(), between 0 and 1.
+        """
+        return 0.0
+
+    def finish_load(self, data):
+        """
+        Called once the whole tree has been read, before it is shown.
+
+        Args:
+            data (dict): The tree read by iter_load().
+        """
+        self.unclean_shutdown = self.session.is_stale()
+
+    def open_session(self):
+        """
+        Marks the file as open by this process, see journal.SessionMarker.
+        """
+        self.session.create()
+
+    def close_session(self):
+        """
+        Marks the file as closed properly. Call it after the last write.
+        """
+        self.session.remove()
+
+    def prepare_tree(self, data):
+        """
+        Called on the GUI thread when the backend starts storing a tree that was not read
+        from it (save as).
+
+        Args:
+            data (dict): The data tree.
+        """
+        pass
+
+    def note_change(self, data, record, index=None):
+        """
+        Called on the GUI thread for every change record, right after the change was made.
+
+        Args:
+            data (dict): The data tree.
+            record (dict): The change, see journal.apply_change().
+            index (ProductionIndex, optional): The index of the folder structure, already
+                updated with the change.
+        """
+        pass
+
+    def ensure_loaded(self, data, path=None, recursive=True):
+        """
+        Reads the parts of the tree that are still only on disk, for the backends that
+        load a tree partially. Called on the GUI thread.
+
+        Args:
+            data (dict): The data tree, completed in place.
+            path (list, optional): Only what is needed to show this folder. None loads the whole tree.
+            recursive (bool): If True, also everything inside the folder.
+
+        Returns:
+            list: The paths of the folders whose content was read.
+        """
+        return []
+
+    def load(self):
+        """
+        Reads the whole tree.
+
+        Returns:
+            dict: The data tree.
+        """
+        data = {"structure": {}, "productions": {}}
+        for kind, key, value in self.iter_load():
+            if kind == "section":
+                data[key] = value
+            elif kind == "production":
+                data["productions"][key] = value
+        self.finish_load(data)
+        return data
+
+    def needs_compaction(self, pending):
+        """
+        Checks if the stored tree should be rewritten completely before closing it.
+
+        Args:
+            pending (int): Number of records not saved yet.
+
+        Returns:
+            bool: True if a full write is needed.
+        """
+        return False
+
+    def needs_full_write(self, pending):
+        """
+        Checks if the pending changes should be saved with a full write instead of apply_changes().
+
+        Args:
+            pending (int): Number of pending records.
+
+        Returns:
+            bool: True if a full write is preferable.
+        """
+        return False
+
+    def apply_changes(self, records):
+        """
+        Saves a list of journal records.
+
+        Args:
+            records (list): Records created by record_change().
+        """
+        raise NotImplementedError("You need to implement apply_changes() in the storage backend.")
+
+    def write_tree(self, data):
+        """
+        Replaces the stored tree with a snapshot.
+
+        Args:
+            data (dict): The snapshot to write.
+        """
+        raise NotImplementedError("You need to implement write_tree() in the storage backend.")
+
+
+class JsonStorage(StorageBackend):
+    """
+    Stores the tree in a *.Publications.json file plus a change journal next to it.
+
+    When use_cache is True, a binary snapshot cache of the JSON file is kept next to it
+    (see snapshotcache), so reopening an unchanged file does not parse the JSON again.
+    Files of at least lazy_min_size bytes are loaded into a LazyProductions store, which
+    reads the fields of a production from the file only when it is accessed.
+    """
+    extension = JSON_EXTENSION
+    lazy_productions = True
+    incremental_saves = True
+    codec = None
+
+    def __init__(self, path, use_cache=SNAPSHOT_CACHE_ENABLED, lazy_min_size=LAZY_LOAD_MIN_SIZE):
+        super().__init__(path)
+        self.journal = ChangeJournal(path)
+        self.use_cache = use_cache
+        self.lazy_min_size = lazy_min_size
+        self._load_file = None
+        self._load_size = 1
+        self._cached_progress = None
+
+    def iter_load(self):
+        cached = load_snapshot_cache(self.path) if self.use_cache else None
+        payload = None
+        if cached is not None:
+            payload, digest = cached
+            self.journal.base = digest.hex()
+        if payload is not None and payload.get("format") == "full":
+            yield from self._iter_cached(payload)
+            return
+        if payload is not None and payload.get("format") == "lazy":
+            for key, value in payload["sections"].items():
+                yield ("section", key, value)
+            yield ("section", "productions", LazyProductions.from_index_state(self.path, payload["index"]))
+            return
+
+        self._load_size = max(os.path.getsize(self.path), 1)
+        lazy = self.lazy_productions and self._load_size >= self.lazy_min_size
+        data = {}
+        productions = LazyProductions(self.path) if lazy else {}
+        # Campos e valores repetidos são compartilhados entre as produções
+        interner = Interner()
+        start_time = time.monotonic()
+        with open(self.path, 'rb') as f:
+            # O hash é calculado sobre o arquivo em disco, antes da descompressão
+            reader = HashingReader(f)
+            stream = open_reader(reader, self.codec) if self.codec else reader
+            self._load_file = reader
+            try:
+                for event in iter_tree_file(stream, with_spans=lazy):
+                    kind, key, value = event[:3]
+                    if kind == "section":
+                        data[key] = value
+                        yield (kind, key, value)
+                    elif lazy:
+                        start, end = event[3]
+                        productions.add_ref(key, start, end - start, interner.compact(make_summary(value)))
+                        yield ("progress", None, None)
+                    else:
+                        value = interner.compact(value)
+                        productions[key] = value
+                        yield (kind, key, value)
+                # Garante que o hash cobre o arquivo inteiro
+                while stream.read(1 << 20):
+                    pass
+                while reader.read(1 << 20):
+                    pass
+            finally:
+                self._load_file = None
+        self.journal.base = reader.digest().hex()
+        if self.codec:
+            self.last_load_stats = TransferStats(stream.tell(), self._load_size, time.monotonic() - start_time)
+
+        if lazy:
+            yield ("section", "productions", productions)
+        if self.use_cache:
+            self._write_cache(data, productions, reader.digest())
+
+    def _write_cache(self, data, productions, digest):
+        if isinstance(productions, LazyProductions):
+            index = productions.index_state()
+            if index is None:
+                return
+            sections = {key: value for key, value in data.items() if key != "productions"}
+            payload = {"format": "lazy", "sections": sections, "index": index}
+        else:
+            sections = {key: value for key, value in data.items() if key != "productions"}
+            payload = {"format": "full", "sections": sections, "productions": pack_productions(productions)}
+        write_snapshot_cache(self.path, payload, digest)
+
+    def _iter_cached(self, payload):
+        for key, value in payload["sections"].items():
+            yield ("section", key, value)
+        productions = unpack_productions(payload["productions"])
+        total = max(len(productions), 1)
+        for n, (prod_id, production) in enumerate(productions.items()):
+            self._cached_progress = n / total
+            yield ("production", prod_id, production)
+        self._cached_progress = None
+
+    def load_progress(self):
+        if self._cached_progress is not None:
+            return self._cached_progress
+        if self._load_file is None:
+            return 1.0
+        return self._load_file.tell() / self._load_size
+
+    def finish_load(self, data):
+        super().finish_load(data)
+        # O journal é o write-ahead log das mudanças feitas depois da última gravação completa
+        self.recovered_changes = self.journal.replay(data)
+
+    def needs_compaction(self, pending):
+        return self.journal.count + pending > 0
+
+    def needs_full_write(self, pending):
+        return self.journal.count + pending > JOURNAL_COMPACT_LIMIT
+
+    def apply_changes(self, records):
+        # Só as mudanças são gravadas; o arquivo completo é reescrito na compactação
+        self.journal.append(records)
+
+    def write_tree(self, data):
+        productions = data.get("productions")
+        if not (self.lazy_productions and isinstance(productions, LazyProductions)):
+            start_time = time.monotonic()
+            digest, raw_size = atomic_write_json(self.path, data, codec=self.codec)
+            if self.codec:
+                self.last_write_stats = TransferStats(raw_size, os.path.getsize(self.path),
+                                                      time.monotonic() - start_time)
+            self.journal.clear(digest.hex())
+            if self.use_cache:
+                self._write_cache(data, productions, digest)
+            return
+
+        # As produções que ainda estão no arquivo são copiadas sem serem analisadas
+        spans = {}
+        tmp_path, digest, raw_size = write_temp_tree(self.path, data, spans)
+        with productions.lock:
+            commit_temp_file(tmp_path, self.path)
+            if productions.origin is not None:
+                productions.origin.rebind(productions, self.path, spans)
+        self.journal.clear(digest.hex())
+        if self.use_cache:
+            store = LazyProductions(self.path)
+            for prod_id, (offset, length) in spans.items():
+                store.add_ref(prod_id, offset, length, make_summary(productions.summary(prod_id)))
+            self._write_cache(data, store, digest)
+
+
+class CompressedJsonStorage(JsonStorage):
+    """
+    Stores the tree in a compressed JSON file (*.Publications.json.gz, .xz or .bz2).
+
+    The file is compressed and decompressed while it is streamed, with the codec given
+    by the subclass. The change journal and the snapshot cache are not compressed. The
+    productions are always kept in memory, since a compressed file can not be read at
+    arbitrary offsets. The ratio and the throughput of the last read and write are kept
+    in last_load_stats and last_write_stats.
+    """
+    lazy_productions = False
+
+
+class GzipJsonStorage(CompressedJsonStorage):
+    extension = JSON_EXTENSION + ".gz"
+    codec = "gzip"
+
+
+class XzJsonStorage(CompressedJsonStorage):
+    extension = JSON_EXTENSION + ".xz"
+    codec = "xz"
+
+
+class Bz2JsonStorage(CompressedJsonStorage):
+    extension = JSON_EXTENSION + ".bz2"
+    codec = "bz2"
+
+
+class SqliteStorage(StorageBackend):
+    """
+    Stores the tree in an SQLite database (*.Publications.sqlite).
+
+    Folders, productions, their fields and the folder membership of the productions
+    are kept in separate tables, indexed by production ID, year, entry type and parent
+    folder. Changes are applied with small transactions, so a save costs the size of
+    the change. The order of the folders, productions and fields is preserved, so
+    the conversion from and to the JSON format is lossless.
+    """
+    extension = SQLITE_EXTENSION
+    incremental_saves = True
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._load_fraction = 0.0
+
+    def connect(self):
+        """
+        Opens a connection to the database, creating the schema if needed.
+
+        Returns:
+            sqlite3.Connection: The connection; close it after use.
+        """
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SQLITE_SCHEMA)
+        conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('schema-version', ?)",
+                     (str(SQLITE_SCHEMA_VERSION),))
+        return conn
+
+    def iter_load(self):
+        self._load_fraction = 0.0
+        conn = self.connect()
+        try:
+            for key, value in conn.execute("SELECT key, value FROM meta WHERE key LIKE 'section:%'"):
+                yield ("section", key[len("section:"):], json.loads(value))
+
+            yield ("section", "structure", self._read_structure(conn))
+
+            total = max(conn.execute("SELECT COUNT(*) FROM productions").fetchone()[0], 1)
+            rows = conn.execute("""
+                SELECT p.id, f.key, f.value
+                FROM productions p LEFT JOIN fields f ON f.production_id = p.id
+                ORDER BY p.position, f.position
+            """)
+            prod_id, production, done = None, None, 0
+            interner = Interner()
+            for row_id, key, value in rows:
+                if row_id != prod_id:
+                    if production is not None:
+                        done += 1
+                        self._load_fraction = done / total
+                        yield ("production", prod_id, interner.compact(production))
+                    prod_id, production = row_id, {}
+                if key is not None:
+                    production[key] = json.loads(value)
+            if production is not None:
+                yield ("production", prod_id, interner.compact(production))
+            self._load_fraction = 1.0
+        finally:
+            conn.close()
+
+    def load_progress(self):
+        return self._load_fraction
+
+    def _read_structure(self, conn):
+        children = {}
+        for folder_id, parent_id, name, position in conn.execute(
+                "SELECT id, parent_id, name, position FROM folders"):
+            children.setdefault(parent_id, []).append((position, name, folder_id))
+        for folder_id, prod_id, position in conn.execute(
+                "SELECT folder_id, production_id, position FROM membership"):
+            children.setdefault(folder_id, []).append((position, prod_id, None))
+
+        def build(parent_id):
+            node = {}
+            for position, name, folder_id in sorted(children.get(parent_id, []), key=lambda c: c[0]):
+                node[name] = build(folder_id) if folder_id is not None else None
+            return node
+
+        return build(ROOT_FOLDER_ID)
+
+    def write_tree(self, data):
+        conn = self.connect()
+        try:
+            with conn:
+                for table in ("folders", "productions", "fields", "membership"):
+                    conn.execute(f"DELETE FROM {table}")
+                conn.execute("DELETE FROM meta WHERE key LIKE 'section:%'")
+                for key, value in data.items():
+                    if key not in ("structure", "productions"):
+                        conn.execute("INSERT INTO meta(key, value) VALUES (?, ?)",
+                                     ("section:" + key, json.dumps(value, ensure_ascii=False)))
+                self._insert_children(conn, ROOT_FOLDER_ID, data.get("structure", {}))
+                for position, (prod_id, production) in enumerate(data.get("productions", {}).items()):
+                    self._insert_production(conn, prod_id, production, position)
+        finally:
+            conn.close()
+
+    def apply_changes(self, records):
+        conn = self.connect()
+        try:
+            with conn:
+                for record in records:
+                    self._apply_record(conn, record)
+        finally:
+            conn.close()
+
+    def _apply_record(self, conn, record):
+        op = record["op"]
+
+        if op == "add":
+            folder_id = self._folder_id(conn, record["path"])
+            self._insert_node(conn, folder_id, record["name"], record["node"],
+                              self._next_position(conn, folder_id))
+            for prod_id, production in record.get("productions", {}).items():
+                self._delete_production(conn, prod_id)
+                self._insert_production(conn, prod_id, production)
+            if record["node"] is not None:
+                self._move_sync_state(conn, list(record["path"]) + [record["name"]])
+
+        elif op == "remove":
+            path = record["path"]
+            parent_id = self._folder_id(conn, path[:-1])
+            folder_id = self._child_folder_id(conn, parent_id, path[-1])
+            if folder_id is not None:
+                self._delete_folder(conn, folder_id)
+                self._move_sync_state(conn, path)
+            else:
+                conn.execute("DELETE FROM membership WHERE folder_id = ? AND production_id = ?",
+                             (parent_id, path[-1]))
+            for prod_id in record.get("productions", []):
+                self._delete_production(conn, prod_id)
+
+        elif op == "move":
+            src = record["src"]
+            source_id = self._folder_id(conn, src[:-1])
+            target_id = self._folder_id(conn, record["dst"])
+            position = self._next_position(conn, target_id)
+            folder_id = self._child_folder_id(conn, source_id, src[-1])
+            if folder_id is not None:
+                conn.execute("UPDATE folders SET parent_id = ?, position = ? WHERE id = ?",
+                             (target_id, position, folder_id))
+                self._move_sync_state(conn, src, list(record["dst"]) + src[-1:])
+            else:
+                conn.execute("""UPDATE membership SET folder_id = ?, position = ?
+                                WHERE folder_id = ? AND production_id = ?""",
+                             (target_id, position, source_id, src[-1]))
+
+        elif op == "rename":
+            path = record["path"]
+            parent_id = self._folder_id(conn, path[:-1])
+            new_name = record["name"]
+            if record.get("production"):
+                conn.execute("UPDATE membership SET production_id = ? WHERE folder_id = ? AND production_id = ?",
+                             (new_name, parent_id, path[-1]))
+                conn.execute("UPDATE productions SET id = ? WHERE id = ?", (new_name, path[-1]))
+                conn.execute("UPDATE fields SET production_id = ? WHERE production_id = ?", (new_name, path[-1]))
+            else:
+                conn.execute("UPDATE folders SET name = ? WHERE parent_id = ? AND name = ?",
+                             (new_name, parent_id, path[-1]))
+                self._move_sync_state(conn, path, path[:-1] + [new_name])
+
+        elif op == "update-field":
+            prod_id, key = record["id"], record["key"]
+            value = json.dumps(record["value"], ensure_ascii=False)
+            updated = conn.execute("UPDATE fields SET value = ? WHERE production_id = ? AND key = ?",
+                                   (value, prod_id, key)).rowcount
+            if not updated:
+                position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM fields WHERE production_id = ?",
+                                        (prod_id,)).fetchone()[0]
+                conn.execute("INSERT INTO fields(production_id, key, value, position) VALUES (?, ?, ?, ?)",
+                             (prod_id, key, value, position))
+            if key in INDEXED_FIELDS:
+                conn.execute(f"UPDATE productions SET {INDEXED_FIELDS[key]} = ? WHERE id = ?",
+                             (record["value"], prod_id))
+
+        elif op == "sync":
+            # A seção "sync" fica em meta, como as outras seções
+            row = conn.execute("SELECT value FROM meta WHERE key = 'section:sync'").fetchone()
+            section = {"structure": {}, "productions": {}, "sync": json.loads(row[0]) if row else {}}
+            apply_change(section, record)
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('section:sync', ?)",
+                         (json.dumps(section["sync"], ensure_ascii=False),))
+
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+    def _move_sync_state(self, conn, path, new_path=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'section:sync'").fetchone()
+        if row is None:
+            return
+        sync = json.loads(row[0])
+        moved = move_sync_state(sync, path, new_path)
+        if moved is not sync:
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'section:sync'",
+                         (json.dumps(moved, ensure_ascii=False),))
+
+    def _folder_id(self, conn, path):
+        folder_id = ROOT_FOLDER_ID
+        for name in path:
+            folder_id = self._child_folder_id(conn, folder_id, name)
+            if folder_id is None:
+                raise KeyError("/".join(path))
+        return folder_id
+
+    def _child_folder_id(self, conn, parent_id, name):
+        row = conn.execute("SELECT id FROM folders WHERE parent_id = ? AND name = ?",
+                           (parent_id, name)).fetchone()
+        return row[0] if row else None
+
+    def _next_position(self, conn, folder_id):
+        row = conn.execute("""
+            SELECT MAX(m) FROM (
+                SELECT MAX(position) AS m FROM folders WHERE parent_id = ?
+                UNION ALL
+                SELECT MAX(position) AS m FROM membership WHERE folder_id = ?
+            )""", (folder_id, folder_id)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def _insert_children(self, conn, parent_id, structure):
+        for position, (name, node) in enumerate(structure.items()):
+            self._insert_node(conn, parent_id, name, node, position)
+
+    def _insert_node(self, conn, parent_id, name, node, position):
+        if isinstance(node, dict):
+            folder_id = conn.execute("INSERT INTO folders(parent_id, name, position) VALUES (?, ?, ?)",
+                                     (parent_id, name, position)).lastrowid
+            self._insert_children(conn, folder_id, node)
+        else:
+            conn.execute("INSERT OR REPLACE INTO membership(folder_id, production_id, position) VALUES (?, ?, ?)",
+                         (parent_id, name, position))
+
+    def _insert_production(self, conn, prod_id, production, position=None):
+        if position is None:
+            position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM productions").fetchone()[0]
+        conn.execute("INSERT INTO productions(id, entry_type, year, title, position) VALUES (?, ?, ?, ?, ?)",
+                     (prod_id, production.get("entry-type"), production.get("year"),
+                      production.get("title"), position))
+        conn.executemany("INSERT INTO fields(production_id, key, value, position) VALUES (?, ?, ?, ?)",
+                         [(prod_id, key, json.dumps(value, ensure_ascii=False), i)
+                          for i, (key, value) in enumerate(production.items())])
+
+    def _delete_production(self, conn, prod_id):
+        conn.execute("DELETE FROM productions WHERE id = ?", (prod_id,))
+        conn.execute("DELETE FROM fields WHERE production_id = ?", (prod_id,))
+
+    def _delete_folder(self, conn, folder_id):
+        folder_ids = [row[0] for row in conn.execute("""
+            WITH RECURSIVE subtree(id) AS (
+                SELECT ?
+                UNION ALL
+                SELECT f.id FROM folders f JOIN subtree s ON f.parent_id = s.id
+            )
+            SELECT id FROM subtree""", (folder_id,))]
+        conn.executemany("DELETE FROM membership WHERE folder_id = ?", [(i,) for i in folder_ids])
+        conn.executemany("DELETE FROM folders WHERE id = ?", [(i,) for i in reversed(folder_ids)])
+
+    def find_productions(self, year=None, entry_type=None, folder_path=None):
+        """
+        Searches productions using the indexes of the database.
+
+        Args:
+            year (str, optional): Only productions of this year.
+            entry_type (str, optional): Only productions of this entry type.
+            folder_path (list, optional): Only productions directly inside this folder.
+
+        Returns:
+            list: The IDs of the productions found.
+        """
+        conditions, params = [], []
+        conn = self.connect()
+        try:
+            if year is not None:
+                conditions.append("p.year = ?")
+                params.append(year)
+            if entry_type is not None:
+                conditions.append("p.entry_type = ?")
+                params.append(entry_type)
+            if folder_path is not None:
+                conditions.append("p.id IN (SELECT production_id FROM membership WHERE folder_id = ?)")
+                params.append(self._folder_id(conn, folder_path))
+            where = "WHERE " + " AND ".join(conditions) if conditions else ""
+            return [row[0] for row in conn.execute(
+                f"SELECT p.id FROM productions p {where} ORDER BY p.position", params)]
+        finally:
+            conn.close()
+
+
+class ShardedStorage(StorageBackend):
+    """
+    Stores the tree in a manifest (*.Publications.manifest.json) plus one shard file per group.
+
+    The manifest holds the other sections, the folders above the shard depth (see
+    shards.SHARD_DEPTH), the productions filed directly in them and the location of
+    every shard. Each folder at the shard depth is stored, with its subfolders and
+    productions, in a JSON file of the *.Publications.shards directory.
+
+    Opening the tree reads only the manifest: a shard is read when its folder is
+    expanded, opened or used (see ensure_loaded()). A save rewrites the manifest and
+    only the shards changed since the last save. A changed shard is written to a new
+    file, so a save that fails before the manifest is written leaves the previous tree
+    intact. A production filed in several shards is stored in each of them; the copy
+    already in memory wins when a shard is read.
+    """
+    extension = SHARDED_EXTENSION
+
+    def __init__(self, path):
+        super().__init__(path)
+        if path.endswith(SHARDED_EXTENSION):
+            self.shard_dir = path[:-len(SHARDED_EXTENSION)] + SHARDS_DIRECTORY_SUFFIX
+        else:
+            self.shard_dir = path + SHARDS_DIRECTORY_SUFFIX
+        self._load_fraction = 0.0
+        # Depois de uma falha, ou num arquivo novo, todos os shards carregados são gravados
+        self._write_all = True
+        # shard_id -> arquivo do shard no último manifesto lido ou gravado
+        self._shard_files = {}
+
+    def shard_path(self, shard_id):
+        """
+        Args:
+            shard_id (str): The shard.
+
+        Returns:
+            str: The file of the shard.
+        """
+        return os.path.join(self.shard_dir, shard_id + ".json")
+
+    def _read_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_load(self):
+        self._load_fraction = 0.0
+        manifest = self._read_json(self.path)
+        if manifest.get("format") != SHARDED_FORMAT:
+            raise ValueError(f"{self.path} is not the manifest of a sharded tree")
+
+        structure = manifest.get("structure", {})
+        self._shard_files = {}
+        for shard_id, shard_path in manifest.get("shards", {}).items():
+            parent = get_folder(structure, shard_path[:-1])
+            parent[shard_path[-1]] = ShardFolder(shard_id=shard_id, loaded=False)
+            self._shard_files[shard_id] = shard_id
+
+        for key, value in manifest.items():
+            if key not in ("format", "version", "shards", "structure", "productions"):
+                yield ("section", key, value)
+        yield ("section", "structure", structure)
+
+        productions = manifest.get("productions", {})
+        total = max(len(productions), 1)
+        interner = Interner()
+        for n, (prod_id, production) in enumerate(productions.items()):
+            self._load_fraction = (n + 1) / total
+            yield ("production", prod_id, interner.compact(production))
+        self._load_fraction = 1.0
+        self._write_all = False
+
+    def load_progress(self):
+        return self._load_fraction
+
+    def load(self):
+        data = super().load()
+        self.ensure_loaded(data)
+        return data
+
+    def finish_load(self, data):
+        super().finish_load(data)
+        adopt_shard_folders(data["structure"])
+
+    def prepare_tree(self, data):
+        adopt_shard_folders(data["structure"])
+        self._write_all = True
+
+    def note_change(self, data, record, index=None):
+        structure = data["structure"]
+        adopt_shard_folders(structure)
+        op = record["op"]
+        if op == "sync":
+            # A seção "sync" é gravada no manifesto, reescrito a cada gravação
+            return
+        if op == "update-field":
+            if index is None:
+                for parent, name, path, folder in iter_shard_folders(structure):
+                    if isinstance(folder, ShardFolder) and contains_production(folder, record["id"]):
+                        folder.dirty = True
+                return
+            # Só os shards das pastas que contêm a produção
+            paths = index.folders_of(record["id"])
+        else:
+            paths = [record["src"], record["dst"]] if op == "move" else [record["path"]]
+        for path in paths:
+            shard = shard_on_path(structure, path)
+            if shard is not None:
+                shard.dirty = True
+
+    def ensure_loaded(self, data, path=None, recursive=True):
+        path = path or []
+        loaded = []
+        for parent, name, shard_path, folder in list(iter_shard_folders(data["structure"])):
+            if not is_unloaded_shard(folder):
+                continue
+            # O shard contém o caminho ou está dentro dele
+            if path[:len(shard_path)] == shard_path or (recursive and shard_path[:len(path)] == path):
+                content = self._read_json(self.shard_path(self._shard_files.get(folder.shard_id, folder.shard_id)))
+                parent[name] = ShardFolder(content.get("structure", {}), folder.shard_id)
+                productions = data["productions"]
+                interner = Interner()
+                for prod_id, production in content.get("productions", {}).items():
+                    if prod_id not in productions:
+                        productions[prod_id] = interner.compact(production)
+                loaded.append(shard_path)
+        return loaded
+
+    def needs_full_write(self, pending):
+        # write_tree() grava só os shards modificados
+        return True
+
+    def write_tree(self, data):
+        try:
+            self._write_shards(data)
+        except BaseException:
+            self._write_all = True
+            raise
+        self._write_all = False
+
+    def _write_shards(self, data):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        productions = data.get("productions", {})
+        skeleton, shard_folders, loose = {}, [], []
+        self._split_structure(data.get("structure", {}), [], skeleton, shard_folders, loose)
+
+        # Os shards são gravados antes do manifesto, que nunca aponta para um shard ausente.
+        # Um shard modificado vai para um arquivo novo: o manifesto antigo continua válido
+        # até o novo ser gravado
+        shards, shard_files, seen = {}, {}, set()
+        for shard_path, folder in shard_folders:
+            shard_id = folder.shard_id if isinstance(folder, ShardFolder) else new_shard_id()
+            copied = shard_id in seen
+            if copied:
+                shard_id = new_shard_id()
+            seen.add(shard_id)
+            file_id = self._shard_files.get(shard_id, shard_id)
+            if not (is_unloaded_shard(folder) and not copied):
+                if (self._write_all or copied or not isinstance(folder, ShardFolder) or folder.dirty
+                        or not os.path.exists(self.shard_path(file_id))):
+                    file_id = new_shard_id()
+                    atomic_write_json(self.shard_path(file_id), {
+                        "structure": folder,
+                        "productions": {prod_id: productions[prod_id] for prod_id in production_ids(folder)
+                                        if prod_id in productions}
+                    })
+            shards[file_id] = shard_path
+            shard_files[shard_id] = file_id
+
+        manifest = {key: value for key, value in data.items() if key not in ("structure", "productions")}
+        manifest["format"] = SHARDED_FORMAT
+        manifest["version"] = SHARDED_FORMAT_VERSION
+        manifest["structure"] = skeleton
+        manifest["productions"] = {prod_id: productions[prod_id] for prod_id in loose if prod_id in productions}
+        manifest["shards"] = shards
+        atomic_write_json(self.path, manifest)
+        self._shard_files = shard_files
+
+        for file_name in os.listdir(self.shard_dir):
+            shard_id, extension = os.path.splitext(file_name)
+            if extension == ".json" and shard_id not in shards:
+                os.remove(os.path.join(self.shard_dir, file_name))
+
+    def _split_structure(self, structure, path, skeleton, shard_folders, loose):
+        # Separa as pastas acima dos shards, os shards e as produções fora dos shards
+        for name, value in structure.items():
+            if not isinstance(value, dict):
+                skeleton[name] = value
+                loose.append(name)
+            elif len(path) + 1 == SHARD_DEPTH:
+                skeleton[name] = {}
+                shard_folders.append((path + [name], value))
+            else:
+                skeleton[name] = {}
+                self._split_structure(value, path + [name], skeleton[name], shard_folders, loose)
+
+
+# Os formatos comprimidos e o manifesto vêm antes do JSON simples, cuja extensão é um prefixo das deles
+STORAGE_BACKENDS = [SqliteStorage, ShardedStorage, GzipJsonStorage, XzJsonStorage, Bz2JsonStorage, JsonStorage]
+
+OPEN_FILE_FILTER = ("Tree Files (*.Publications.json *.Publications.json.gz *.Publications.json.xz "
+                    "*.Publications.json.bz2 *.Publications.sqlite *.Publications.manifest.json);;"
+                    "JSON Files (*.Publications.json);;"
+                    "Compressed JSON Files (*.Publications.json.gz *.Publications.json.xz *.Publications.json.bz2);;"
+                    "SQLite Files (*.Publications.sqlite);;"
+                    "Sharded Trees (*.Publications.manifest.json)")
+SAVE_FILE_FILTER = ("JSON Files (*.Publications.json);;"
+                    "Gzip Compressed JSON Files (*.Publications.json.gz);;"
+                    "XZ Compressed JSON Files (*.Publications.json.xz);;"
+                    "Bzip2 Compressed JSON Files (*.Publications.json.bz2);;"
+                    "SQLite Files (*.Publications.sqlite);;"
+                    "Sharded Trees (*.Publications.manifest.json)")
+
+
+def storage_for_path(path):
+    """
+    Chooses the storage backend of a tree file by its extension.
+
+    Args:
+        path (str): The tree file.
+
+    Returns:
+        StorageBackend: The backend for the file (JSON when the extension is unknown).
+    """
+    for backend in STORAGE_BACKENDS:
+        if path.endswith(backend.extension):
+            return backend(path)
+    return JsonStorage(path)
+
+
+def add_tree_extension(file_name, selected_filter=""):
+    """
+    Adds the extension of a tree file to a file name chosen in a save dialog, if missing.
+
+    Args:
+        file_name (str): The chosen file name.
+        selected_filter (str): The filter selected in the dialog.
+
+    Returns:
+        str: The file name with a known tree file extension.
+    """
+    for backend in STORAGE_BACKENDS:
+        if file_name.endswith(backend.extension):
+            return file_name
+    for backend in STORAGE_BACKENDS:
+        if backend.extension in selected_filter:
+            return file_name + backend.extension
+    return file_name + JSON_EXTENSION
+
+
+def convert_tree_file(source_path, target_path):
+    """
+    Converts a tree file between storage formats, for example from
+    *.Publications.json to *.Publications.sqlite and back.
+
+    Args:
+        source_path (str): The file to read.
+        target_path (str): The file to write; its extension chooses the format.
+    """
+    data = storage_for_path(source_path).load()
+    storage_for_path(target_path).write_tree(data)
@@ -0,0 +1,179 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from academic_publication_manager.modules.lazystore import get_summary
+
+COLUMNS = ["Title", "Year", "ID"]
+TITLE_COL, YEAR_COL, ID_COL = range(len(COLUMNS))
+
+# Linhas medidas para ajustar a largura das colunas (além das visíveis)
+SIZE_SAMPLE_ROWS = 100
+
+# Espera após a última tecla antes de filtrar a tabela
+FILTER_DELAY_MS = 200
+
+
+class ProductionTableModel(QAbstractTableModel):
+    """
+    Table model of a list of productions (title, year and ID).
+
+    The model only keeps the (production ID, folder path) of each row; the title and
+    year are read from the productions when a view asks for them, so setting a list
+    of any size costs the same for Qt. The rows are sorted by the model itself (see
+    sort(), called by a view with sorting enabled), with one Python sort instead of
+    a comparison per pair.
+
+    The model also filters its rows (set_filter()) against a lowercase search key
+    per production, computed once per list; a query that contains the previous one
+    only checks the rows that matched the previous one.
+
+    Attributes:
+        rows (list): (production ID, folder path) of the rows shown, in order.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.productions = {}
+        self._order = []
+        self._sorted = []
+        self.rows = []
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._filter = ""
+        self._keys = None
+
+    def set_productions(self, productions, production_ids):
+        """
+        Shows a list of productions, replacing the previous rows.
+
+        Args:
+            productions (Mapping): The productions dict or a LazyProductions store.
+            production_ids (list): (production ID, folder path) of each row.
+        """
+        self.beginResetModel()
+        self.productions = productions
+        self._order = list(production_ids)
+        self._keys = None
+        self._sorted = self._sorted_rows()
+        self.rows = self._filtered(self._sorted)
+        self.endResetModel()
+
+    def clear(self):
+        """
+        Removes every row.
+        """
+        self.set_productions(self.productions, [])
+
+    def set_filter(self, text):
+        """
+        Shows only the rows whose title, year or ID contains a text (case-insensitive).
+
+        Args:
+            text (str): The text, empty to show every row.
+        """
+        text = text.lower()
+        if text == self._filter:
+            return
+        # Uma consulta que contém a anterior só pode casar com linhas que já casaram
+        candidates = self.rows if self._filter in text else self._sorted
+        self._filter = text
+        self.beginResetModel()
+        self.rows = self._filtered(candidates)
+        self.endResetModel()
+
+    def _search_keys(self):
+        if self._keys is None:
+            keys = self._keys = {}
+            for prod_id, _ in self._order:
+                prod = get_summary(self.productions, prod_id, {}) or {}
+                keys[prod_id] = "\n".join((str(prod.get("title", "")), str(prod.get("year", "")),
+                                           prod_id)).lower()
+        return self._keys
+
+    def _filtered(self, rows):
+        if not self._filter:
+            return list(rows)
+        text, keys = self._filter, self._search_keys()
+        return [item for item in rows if text in keys[item[0]]]
+
+    def production_at(self, row):
+        """
+        Args:
+            row (int): A row of the model.
+
+        Returns:
+            tuple: (production ID, folder path) of the row.
+        """
+        return self.rows[row]
+
+    def text(self, row, column):
+        """
+        Args:
+            row (int): A row of the model.
+            column (int): TITLE_COL, YEAR_COL or ID_COL.
+
+        Returns:
+            str: The text of the cell.
+        """
+        prod_id = self.rows[row][0]
+        if column == ID_COL:
+            return prod_id
+        prod = get_summary(self.productions, prod_id, {}) or {}
+        return prod.get("title" if column == TITLE_COL else "year", "")
+
+    def _sorted_rows(self):
+        if self._sort_column < 0:
+            return list(self._order)
+        column = self._sort_column
+        if column == ID_COL:
+            key = lambda item: item[0]
+        else:
+            field = "title" if column == TITLE_COL else "year"
+            key = lambda item: str((get_summary(self.productions, item[0], {}) or {}).get(field, ""))
+        return sorted(self._order, key=key, reverse=self._sort_order == Qt.DescendingOrder)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.text(index.row(), index.column())
+        if role == Qt.UserRole:
+            return self.rows[index.row()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        old_rows = self.rows
+        self._sorted = self._sorted_rows()
+        self.rows = self._filtered(self._sorted)
+        # As linhas selecionadas acompanham a produção
+        new_row = {id(item): row for row, item in enumerate(self.rows)}
+        old = self.persistentIndexList()
+        new = [self.index(new_row[id(old_rows[index.row()])], index.column()) for index in old]
+        self.changePersistentIndexList(old, new)
+        self.layoutChanged.emit()
+
+
+def fit_columns(view, sample_rows=SIZE_SAMPLE_ROWS):
+    """
+    Resizes the columns of a table view to their content, measuring only the visible
+    rows and a sample of the others instead of every cell.
+
+    Args:
+        view (QTableView): The table.
+        sample_rows (int): Number of rows measured besides the visible ones.
+    """
+    view.horizontalHeader().setResizeContentsPrecision(sample_rows)
+    view.resizeColumnsToContents()
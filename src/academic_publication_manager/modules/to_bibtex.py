@@ -1,6 +1,18 @@
-import bibtexparser
+import io
+import re
+import codecs
+
+from bibtexparser.bparser import BibTexParser
 
 from academic_publication_manager.modules.production import bibtex_examples
+from academic_publication_manager.modules.interning  import Interner
+
+# Tamanho dos blocos lidos de um arquivo .bib
+BIB_CHUNK_SIZE = 1 << 18
+# Indentação dos campos nos arquivos .bib gravados
+BIBTEX_INDENT = "  "
+
+_BIB_DELIMITERS = re.compile(r'[{}@]')
 
 
 def reorder_dict(d, priority_keys=None, en_alpha=False):
@@ -32,26 +44,156 @@ def reorder_dict(d, priority_keys=None, en_alpha=False):
 
     return {k: d[k] for k in ordered_keys}
     
+def normalize_entry(entry, interner):
+    """
+    Converts an entry parsed by bibtexparser to a production: the type in "entry-type",
+    the title and year first, the other fields in alphabetical order and the standard
+    fields of the type present (empty if missing).
+
+    Args:
+        entry (dict): The parsed entry, with "ID" and "ENTRYTYPE" (it is modified).
+        interner (Interner): Shares the repeated values between productions.
+
+    Returns:
+        tuple: (production ID, production).
+    """
+    key = entry.pop("ID")
+    entry["entry-type"] = entry.pop("ENTRYTYPE")
+
+    entry = reorder_dict(entry, priority_keys=["entry-type","title","year"], en_alpha=True)
+
+    for bibkey in bibtex_examples.get(entry["entry-type"], ()):
+        entry.setdefault(bibkey, "")
+
+    return key, interner.compact(entry)
+
+
+def iter_bibtex_blocks(f, chunk_size=BIB_CHUNK_SIZE):
+    """
+    Reads a .bib file in blocks of complete entries, so it can be parsed a block at a
+    time instead of all at once.
+
+    A block ends just before an "@" outside of any braces, which starts the next entry.
+
+    Args:
+        f (file): The .bib file opened in binary mode.
+        chunk_size (int): Number of bytes read at a time.
+
+    Yields:
+        tuple: (text of the block, bytes read from the file so far).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    depth = 0
+    scanned = 0
+    bytes_read = 0
+    while True:
+        chunk = f.read(chunk_size)
+        bytes_read += len(chunk)
+        eof = not chunk
+        buf += decoder.decode(chunk, final=eof)
+        # Início da última entrada que pode estar incompleta
+        boundary = 0
+        for match in _BIB_DELIMITERS.finditer(buf, scanned):
+            char = match.group()
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth = max(depth - 1, 0)
+            elif depth == 0:
+                boundary = match.start()
+        scanned = len(buf)
+        if eof:
+            if buf.strip():
+                yield buf, bytes_read
+            return
+        if boundary > 0:
+            yield buf[:boundary], bytes_read
+            buf = buf[boundary:]
+            scanned -= boundary
+
+
+def iter_bibtex_entries(f, chunk_size=BIB_CHUNK_SIZE):
+    """
+    Parses a .bib file one block at a time, yielding each entry as a production.
+
+    Only one block of the file and its entries are in memory at a time; the @string
+    macros defined in a block are known by the following ones.
+
+    Args:
+        f (file): The .bib file opened in binary mode.
+        chunk_size (int): Number of bytes read at a time.
+
+    Yields:
+        tuple: (production ID, production, bytes read from the file so far).
+    """
+    parser = BibTexParser()
+    parser.expect_multiple_parse = True
+    database = parser.bib_database
+    # Os campos vazios, meses, tipos e revistas repetidos são compartilhados
+    interner = Interner()
+    for text, bytes_read in iter_bibtex_blocks(f, chunk_size):
+        parser.parse(text)
+        entries = database.entries
+        database.entries = []
+        database.comments = []
+        database.preambles = []
+        for entry in entries:
+            key, production = normalize_entry(entry, interner)
+            yield key, production, bytes_read
+
+
 def bibtex_to_dicts(filepath: str) -> dict:
-    with open(filepath, encoding="utf-8") as bibtex_file:
-        bib_database = bibtexparser.load(bibtex_file)
-
-    data = {}
-    for entry in bib_database.entries:
-        key = entry.pop("ID")
-        entry["entry-type"] = entry.pop("ENTRYTYPE")
-        
-        entry = reorder_dict(entry, priority_keys=["entry-type","title","year"], en_alpha=True)
-        
-        for bibkey in bibtex_examples[entry["entry-type"]]:
-            entry.setdefault(bibkey, "")
-        
-        data[key] = entry
-    
-    return data
+    with open(filepath, "rb") as bibtex_file:
+        return {key: production for key, production, _ in iter_bibtex_entries(bibtex_file)}
 
 
 
+def format_bibtex_entry(prod_id, entry, indent=BIBTEX_INDENT):
+    """
+    Formats a production as a BibTeX entry, in the format of bibtexparser's
+    BibTexWriter: the fields in alphabetical order, one per line, values in braces.
+
+    The production is only read, never copied or modified.
+
+    Args:
+        prod_id (str): The production ID, used as the citation key.
+        entry (Mapping): The production fields, with "entry-type".
+        indent (str): Indentation of the fields.
+
+    Returns:
+        str: The entry, ending with a newline.
+    """
+    parts = ["@", entry["entry-type"], "{", prod_id]
+    for field in sorted(entry):
+        if field == "entry-type":
+            continue
+        parts.extend((",\n", indent, field, " = {", entry[field], "}"))
+    parts.append("\n}\n")
+    return "".join(parts)
+
+
+def write_bibtex(f, productions, id_list):
+    """
+    Writes productions to a file in BibTeX format, one entry at a time, so the
+    output is never held in memory as a whole.
+
+    Args:
+        f (file): File opened in text mode.
+        productions (Mapping): The productions dict or a LazyProductions store.
+        id_list (list): The IDs of the productions to write, in order.
+
+    Returns:
+        int: The number of entries written.
+    """
+    count = 0
+    for prod_id in id_list:
+        f.write(format_bibtex_entry(prod_id, productions[prod_id]))
+        f.write("\n\n")
+        count += 1
+    return count
+
+
 def dict_entry_to_bibstring(entry: dict, key: str) -> str:
     """
     Converte apenas uma entrada do dicionário (works.json) para uma string em formato BibTeX.
@@ -63,22 +205,9 @@ def dict_entry_to_bibstring(entry: dict, key: str) -> str:
     Returns:
         str: String em formato BibTeX da entrada escolhida.
     """
-
-    entry["ID"] = key
-    entry["ENTRYTYPE"] = entry.pop("entry-type")
-
-    bib_db = bibtexparser.bibdatabase.BibDatabase()
-    bib_db.entries = [entry]
-
-    writer = bibtexparser.bwriter.BibTexWriter()
-    writer.indent = "  "  # dois espaços
-    writer.order_entries_by = ("ID",)  # opcional
-
-    return writer.write(bib_db)
+    return format_bibtex_entry(key, entry)
 
 def id_list_to_bibtex_string(entry: dict, id_list: list) -> str:
-    out = ""
-    for ID_name in id_list:
-        res = dict_entry_to_bibstring(entry[ID_name], citekey = ID_name)
-        out += res + "\n\n"
-    return out
+    out = io.StringIO()
+    write_bibtex(out, entry, id_list)
+    return out.getvalue()
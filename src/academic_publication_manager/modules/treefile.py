@@ -0,0 +1,190 @@
+import os
+import json
+import tempfile
+
+from academic_publication_manager.modules.lazystore   import LazyProductions
+from academic_publication_manager.modules.compression import HashingWriter, open_writer
+from academic_publication_manager.modules.shards      import ShardFolder
+from academic_publication_manager.modules.interning   import json_default
+
+
+def snapshot_tree(data):
+    """
+    Takes a snapshot of the data tree that can be serialized while the tree keeps being edited.
+
+    The folder structure is copied (only folders are dicts, so this is cheap; shard folders
+    keep their type and hand their dirty flag to the copy) and the productions dict is
+    shallow copied. The production records themselves are shared,
+    so they must be replaced instead of modified in place (copy-on-write).
+
+    Args:
+        data (dict): Tree with the keys "structure" and "productions".
+
+    Returns:
+        dict: The snapshot, with the same format as data.
+    """
+    def copy_structure(structure):
+        children = {key: copy_structure(value) if isinstance(value, dict) else value
+                     for key, value in structure.items()}
+        if isinstance(structure, ShardFolder):
+            return structure.snapshot(children)
+        return children
+
+    snapshot = dict(data)
+    snapshot["structure"] = copy_structure(data["structure"])
+    productions = data["productions"]
+    if isinstance(productions, LazyProductions):
+        snapshot["productions"] = productions.copy()
+    else:
+        snapshot["productions"] = dict(productions)
+    return snapshot
+
+
+def _dumps(value, level):
+    # Mesmo formato de json.dump(indent=2) para um valor aninhado no nível dado
+    return json.dumps(value, indent=2, ensure_ascii=False, default=json_default).replace("\n", "\n" + "  " * level)
+
+
+def iter_tree_json(data, spans=None):
+    """
+    Serializes a data tree in the layout of ``json.dump(data, indent=2, ensure_ascii=False)``.
+
+    Productions of a LazyProductions store that are still in the tree file are copied
+    as they are, without being parsed.
+
+    Args:
+        data (dict): Tree to serialize.
+        spans (dict, optional): If given, receives production ID -> (offset, length) of
+            the JSON value of every production in the output.
+
+    Yields:
+        bytes: Consecutive pieces of the file content.
+    """
+    if not data:
+        yield b"{}"
+        return
+    offset = 0
+    for i, (key, value) in enumerate(data.items()):
+        head = ("{" if i == 0 else ",") + "\n  " + json.dumps(key, ensure_ascii=False) + ": "
+        if key != "productions" or not value:
+            chunk = (head + _dumps(value, 1)).encode('utf-8')
+            offset += len(chunk)
+            yield chunk
+            continue
+
+        chunk = (head + "{").encode('utf-8')
+        offset += len(chunk)
+        yield chunk
+        if isinstance(value, LazyProductions):
+            items = value.iter_raw()
+        else:
+            items = ((prod_id, None, production) for prod_id, production in value.items())
+        for j, (prod_id, raw, production) in enumerate(items):
+            chunk = (("," if j else "") + "\n    " + json.dumps(prod_id, ensure_ascii=False) + ": ").encode('utf-8')
+            body = raw if raw is not None else _dumps(production, 2).encode('utf-8')
+            if spans is not None:
+                spans[prod_id] = (offset + len(chunk), len(body))
+            offset += len(chunk) + len(body)
+            yield chunk
+            yield body
+        chunk = b"\n  }"
+        offset += len(chunk)
+        yield chunk
+    yield b"\n}"
+
+
+def write_temp_tree(path, data, spans=None, codec=None):
+    """
+    Writes a data tree in a temporary file next to path, flushed to disk with fsync.
+
+    Args:
+        path (str): The final destination of the file.
+        data (dict): Tree to write.
+        spans (dict, optional): Receives the position of every production, see iter_tree_json().
+            The positions refer to the uncompressed content.
+        codec (str, optional): Compression codec of the file, see compression.COMPRESSION_EXTENSIONS.
+
+    Returns:
+        tuple: (path of the temporary file, sha256 of the file, size of the uncompressed content).
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    raw_size = 0
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer = HashingWriter(f)
+            out = open_writer(writer, codec) if codec else writer
+            for chunk in iter_tree_json(data, spans):
+                raw_size += len(chunk)
+                out.write(chunk)
+            if codec:
+                out.close()
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path, writer.digest(), raw_size
+
+
+def commit_temp_file(tmp_path, path):
+    """
+    Renames a temporary file over its destination, keeping the permissions of the destination.
+
+    Args:
+        tmp_path (str): The temporary file, written with write_temp_tree().
+        path (str): The destination.
+    """
+    path = os.path.abspath(path)
+    try:
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(os.path.dirname(path))
+
+
+def atomic_write_json(path, data, spans=None, codec=None):
+    """
+    Writes a data tree in a JSON file atomically.
+
+    The tree is written to a temporary file in the same directory, flushed to disk with
+    fsync and then renamed over the destination, so a crash never leaves a truncated file.
+
+    Args:
+        path (str): Destination file.
+        data (dict): Tree to write.
+        spans (dict, optional): Receives the position of every production, see iter_tree_json().
+        codec (str, optional): Compression codec of the file, see compression.COMPRESSION_EXTENSIONS.
+
+    Returns:
+        tuple: (sha256 of the written file, size of the uncompressed content).
+    """
+    tmp_path, digest, raw_size = write_temp_tree(path, data, spans, codec)
+    commit_temp_file(tmp_path, path)
+    return digest, raw_size
+
+
+def fsync_directory(directory):
+    """
+    Flushes a directory entry to disk, so a rename inside it survives a crash.
+
+    Does nothing on systems where directories can not be opened (Windows).
+
+    Args:
+        directory (str): The directory to flush.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
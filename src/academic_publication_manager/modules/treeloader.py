@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import codecs
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Tamanho dos blocos lidos do arquivo
+CHUNK_SIZE = 1 << 20
+# Intervalo mínimo (s) entre dois lotes de produções entregues à interface
+BATCH_INTERVAL = 0.05
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _StreamReader:
+    """
+    Reads JSON values one at a time from a binary file, keeping only a small window in memory.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        # Posição de referência para converter posições do texto em posições em bytes
+        self.mark_pos = 0
+        self.mark_byte = 0
+        self.last_span = None
+
+    def fill(self):
+        # Lê pelo menos o tamanho do buffer atual, para que valores grandes sejam lidos em tempo linear
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self.eof = True
+        text = self.decoder.decode(chunk, final=self.eof)
+        self.byte_offset(self.pos)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        self.mark_pos = 0
+
+    def byte_offset(self, pos):
+        # pos nunca volta para trás, então cada caractere é codificado uma única vez
+        self.mark_byte += len(self.buf[self.mark_pos:pos].encode('utf-8'))
+        self.mark_pos = pos
+        return self.mark_byte
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                break
+            self.fill()
+        return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid tree file: expected '{char}' at byte {self.bytes_read}")
+        self.pos += 1
+
+    def value(self, with_span=False):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # Um número no fim do buffer pode continuar no próximo bloco
+                if end < len(self.buf) or self.eof:
+                    if with_span:
+                        self.last_span = (self.byte_offset(self.pos), self.byte_offset(end))
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_tree_file(f, chunk_size=CHUNK_SIZE, with_spans=False):
+    """
+    Parses a tree file incrementally.
+
+    Every top-level section is yielded as soon as it has been read, in file order,
+    except "productions", which is yielded one production at a time.
+
+    Args:
+        f (file): Tree file opened in binary mode, at its beginning.
+        chunk_size (int): Number of bytes read at a time.
+        with_spans (bool): If True, the production events have a fourth item with the
+            byte span ``(start, end)`` of the production value in the file.
+
+    Yields:
+        tuple: ``("section", key, value)`` or ``("production", prod_id, production)``.
+    """
+    reader = _StreamReader(f, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == "productions" and reader.peek() == '{':
+            reader.expect('{')
+            if reader.peek() != '}':
+                while True:
+                    prod_id = reader.value()
+                    reader.expect(':')
+                    production = reader.value(with_spans)
+                    if with_spans:
+                        yield ("production", prod_id, production, reader.last_span)
+                    else:
+                        yield ("production", prod_id, production)
+                    if reader.peek() != ',':
+                        break
+                    reader.pos += 1
+            reader.expect('}')
+        else:
+            yield ("section", key, reader.value())
+        if reader.peek() != ',':
+            break
+        reader.pos += 1
+    reader.expect('}')
+
+
+class TreeLoader(QThread):
+    """
+    Loads a tree from a storage backend on a worker thread.
+
+    The sections (like "structure") are delivered as soon as they are parsed, the
+    productions are delivered in batches. Use requestInterruption() to cancel.
+
+    Signals:
+        section_loaded (str, object): A top-level section of the file and its value.
+        productions_loaded (dict): A batch of productions.
+        progress (int): Percentage of the file that has been read.
+        failed (str): Error message, if the file could not be parsed.
+    """
+    section_loaded = pyqtSignal(str, object)
+    productions_loaded = pyqtSignal(object)
+    progress = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+
+    def run(self):
+        try:
+            batch = {}
+            last_emit = time.monotonic()
+            for kind, key, value in self.storage.iter_load():
+                if self.isInterruptionRequested():
+                    return
+                if kind == "section":
+                    self.section_loaded.emit(key, value)
+                    continue
+                if kind == "progress":
+                    now = time.monotonic()
+                    if now - last_emit >= BATCH_INTERVAL:
+                        self.progress.emit(int(100 * self.storage.load_progress()))
+                        last_emit = now
+                    continue
+                batch[key] = value
+                now = time.monotonic()
+                if now - last_emit >= BATCH_INTERVAL:
+                    self.productions_loaded.emit(batch)
+                    self.progress.emit(int(100 * self.storage.load_progress()))
+                    batch = {}
+                    last_emit = now
+            if batch:
+                self.productions_loaded.emit(batch)
+            self.progress.emit(100)
+        except Exception as e:
+            self.failed.emit(str(e))
@@ -0,0 +1,700 @@
+import json
+import bisect
+import itertools
+
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QMimeData
+from PyQt5.QtGui  import QBrush, QColor
+
+from academic_publication_manager.modules.icons     import get_icon
+from academic_publication_manager.modules.lazystore import get_summary
+from academic_publication_manager.modules.shards    import is_unloaded_shard
+
+# Mesmo formato que o QTreeWidget usava, aceito pela CustomTreeView
+TREE_MIME_TYPE = "application/x-qabstractitemmodeldatalist"
+
+HIGHLIGHT_COLOR = "#FFFF99"  # Amarelo claro
+
+# Número máximo de linhas criadas por fetchMore() numa pasta grande
+FETCH_BATCH_SIZE = 500
+
+
+def is_entry(key, value):
+    """
+    Args:
+        key (str): A key of a folder dict.
+        value: Its value.
+
+    Returns:
+        bool: True if the key is shown in the tree (a production or a subfolder).
+    """
+    return bool(key) and (value is None or isinstance(value, dict))
+
+
+def count_entries(folder):
+    """
+    Args:
+        folder (dict): A folder of the structure.
+
+    Returns:
+        int: Number of productions and subfolders directly inside the folder.
+    """
+    return sum(1 for key, value in folder.items() if is_entry(key, value))
+
+
+class TreeNode:
+    """
+    Row of the tree model: a folder or a production of the structure.
+
+    Every node has an identifier that does not change while the node exists, even
+    when it is moved or renamed; the model indexes keep it as their internal id.
+
+    The children of a folder are created on demand (see StructureModel.fetchMore()):
+    pending is None until the folder is fetched for the first time, then it holds the
+    sorted names of the folder, of which the first fetch_pos already have a node.
+
+    Attributes:
+        name (str): Folder name or production ID (the key in the structure).
+        parent (TreeNode): The parent folder, None for the invisible root.
+        node_id (int): Stable identifier of the node in its model, 0 for the root.
+        key (tuple): The names from the root to the node.
+        children (list): The child nodes created so far, sorted by name.
+        is_production (bool): True for productions.
+        unloaded (bool): True for folders whose content is still on disk (sharded trees).
+        pending (list): Sorted names of the folder, or None if it was not fetched yet.
+        fetch_pos (int): Number of names of pending that already have a node.
+        size (int): Number of entries of a folder not fetched yet, None until counted.
+    """
+    __slots__ = ("name", "parent", "node_id", "key", "children", "is_production", "unloaded",
+                 "pending", "fetch_pos", "size")
+
+    def __init__(self, name, parent=None, is_production=False, unloaded=False):
+        self.name = name
+        self.parent = parent
+        self.node_id = 0
+        self.key = () if parent is None else parent.key + (name,)
+        self.children = []
+        self.is_production = is_production
+        self.unloaded = unloaded
+        self.pending = None
+        self.fetch_pos = 0
+        self.size = None
+
+    def row(self):
+        """
+        Returns:
+            int: Position of the node among the children of its parent.
+        """
+        return self.parent.insert_position(self.name)
+
+    def path(self):
+        """
+        Returns:
+            list: The names from the root to the node.
+        """
+        return list(self.key)
+
+    def child_named(self, name):
+        """
+        Args:
+            name (str): A folder name or production ID.
+
+        Returns:
+            TreeNode: The child with that name, or None if it has no node.
+        """
+        row = self.insert_position(name)
+        if row < len(self.children) and self.children[row].name == name:
+            return self.children[row]
+        return None
+
+    def insert_position(self, name):
+        """
+        Args:
+            name (str): Name of a new child.
+
+        Returns:
+            int: The row that keeps the children sorted by name.
+        """
+        low, high = 0, len(self.children)
+        while low < high:
+            middle = (low + high) // 2
+            if self.children[middle].name < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def has_unfetched(self):
+        """
+        Returns:
+            bool: True if some entries of the folder have no node yet.
+        """
+        if self.is_production or self.unloaded:
+            return False
+        if self.pending is None:
+            return self.size != 0
+        return self.fetch_pos < len(self.pending)
+
+    def in_fetched_range(self, name):
+        """
+        Args:
+            name (str): A name of the folder.
+
+        Returns:
+            bool: True if the entry with that name has (or must have) a node.
+        """
+        if self.pending is None:
+            return False
+        return self.fetch_pos >= len(self.pending) or name < self.pending[self.fetch_pos]
+
+
+def build_node(name, value, parent):
+    """
+    Creates the node of a structure entry. The content of a folder is only created
+    when the folder is fetched.
+
+    Args:
+        name (str): The key in the structure.
+        value (dict or None): The folder dict, or None for a production.
+        parent (TreeNode): The parent node.
+
+    Returns:
+        TreeNode: The node, not yet added to parent.
+    """
+    if value is None:
+        return TreeNode(name, parent, is_production=True)
+    return TreeNode(name, parent, unloaded=is_unloaded_shard(value))
+
+
+class StructureModel(QAbstractItemModel):
+    """
+    Item model of the folder structure of a data tree.
+
+    The model keeps a light node tree that mirrors ``data["structure"]``. The rows of
+    a folder are only created when a view fetches them (when the folder is expanded),
+    at most FETCH_BATCH_SIZE at a time; the folders show their number of entries.
+
+    After the tree is set with set_tree(), every change of the structure must be
+    followed by the matching call (insert_node(), remove_node(), move_node(),
+    rename_node(), refresh_node() or reload_children()), which updates only the
+    affected rows, so the views keep their expanded and selected items.
+
+    The created nodes are indexed by node ID and by path; both indexes are updated
+    with the rows, so finding the row of a path costs one dict lookup.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tree = {"structure": {}, "productions": {}}
+        self.highlighted = None
+        self._fetching = False
+        self._reset_index()
+        self.folder_icon = get_icon('folder.png')
+        self.file_icon = get_icon('file.png')
+
+    def set_tree(self, data):
+        """
+        Shows a whole data tree, rebuilding every row.
+
+        Args:
+            data (dict): The data tree, with the "structure" and "productions" keys.
+        """
+        self.beginResetModel()
+        self.tree = data
+        self._reset_index()
+        self.highlighted = None
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    # Índices de nós
+
+    def _reset_index(self):
+        self.root = TreeNode("")
+        self._next_id = itertools.count(1)
+        self._nodes = {0: self.root}
+        self._paths = {(): self.root}
+
+    def _register(self, node):
+        node.node_id = next(self._next_id)
+        self._nodes[node.node_id] = node
+        self._paths[node.key] = node
+        return node
+
+    def _subtree(self, node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield current
+            stack.extend(current.children)
+
+    def _unregister(self, node):
+        for current in self._subtree(node):
+            self._nodes.pop(current.node_id, None)
+            if self._paths.get(current.key) is current:
+                del self._paths[current.key]
+
+    def _rekey(self, node, key):
+        # A pasta movida ou renomeada leva as linhas já criadas dentro dela
+        start = len(node.key)
+        nodes = list(self._subtree(node))
+        for current in nodes:
+            if self._paths.get(current.key) is current:
+                del self._paths[current.key]
+        for current in nodes:
+            current.key = key + current.key[start:]
+            self._paths[current.key] = current
+
+    # Navegação
+
+    def node(self, index):
+        """
+        Args:
+            index (QModelIndex): An index of the model.
+
+        Returns:
+            TreeNode: The node of the index, the root for an invalid index.
+        """
+        return self._nodes[index.internalId()] if index.isValid() else self.root
+
+    def node_for_id(self, node_id):
+        """
+        Args:
+            node_id (int): A node ID of the model.
+
+        Returns:
+            TreeNode: The node, or None if it no longer exists.
+        """
+        return self._nodes.get(node_id)
+
+    def index_for_id(self, node_id):
+        """
+        Args:
+            node_id (int): A node ID of the model.
+
+        Returns:
+            QModelIndex: The index of the node, or None if it no longer exists.
+        """
+        node = self._nodes.get(node_id)
+        return None if node is None else self.index_for_node(node)
+
+    def index_for_node(self, node):
+        """
+        Args:
+            node (TreeNode): A node of the model.
+
+        Returns:
+            QModelIndex: The index of the node, invalid for the root.
+        """
+        if node is None or node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.row(), 0, node.node_id)
+
+    def node_for_path(self, path, fetch=True):
+        """
+        Args:
+            path (list): Names from the root.
+            fetch (bool): If True, creates the rows needed to reach the path.
+
+        Returns:
+            TreeNode: The node, or None if the path has no node.
+        """
+        path = tuple(path)
+        node = self._paths.get(path)
+        if node is not None or not fetch:
+            return node
+
+        # Linha ainda não criada: parte da pasta criada mais profunda
+        depth = len(path) - 1
+        while path[:depth] not in self._paths:
+            depth -= 1
+        node = self._paths[path[:depth]]
+        for name in path[depth:]:
+            child = node.child_named(name)
+            while child is None and fetch and node.has_unfetched() and not (
+                    node.pending is not None and name < node.pending[node.fetch_pos]):
+                fetched = len(node.children)
+                self.fetchMore(self.index_for_node(node))
+                if len(node.children) == fetched:
+                    break
+                child = node.child_named(name)
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def index_for_path(self, path):
+        """
+        Args:
+            path (list): Names from the root.
+
+        Returns:
+            QModelIndex: The index, or None if the path is not in the tree.
+        """
+        node = self.node_for_path(path)
+        return None if node is None else self.index_for_node(node)
+
+    def path_for_index(self, index):
+        """
+        Args:
+            index (QModelIndex): An index of the model.
+
+        Returns:
+            list: The names from the root to the index (folder names and production ID).
+        """
+        return self.node(index).path()
+
+    def folder_for_node(self, node):
+        """
+        Args:
+            node (TreeNode): A folder node.
+
+        Returns:
+            dict: The folder dict of the structure, empty if it no longer exists.
+        """
+        folder = self.tree["structure"]
+        for name in node.key:
+            folder = folder.get(name) if isinstance(folder, dict) else None
+        return folder if isinstance(folder, dict) else {}
+
+    def entry_count(self, node):
+        """
+        Args:
+            node (TreeNode): A folder node.
+
+        Returns:
+            int: Number of productions and subfolders directly inside the folder.
+        """
+        if node.pending is None:
+            if node.size is None:
+                node.size = count_entries(self.folder_for_node(node))
+            return node.size
+        return len(node.children) + len(node.pending) - node.fetch_pos
+
+    def path_items(self):
+        """
+        Returns:
+            ItemsView: (path tuple, node) for every node already created, parents
+            before children. The view must not be kept across changes of the model.
+        """
+        return self._paths.items()
+
+    def iter_nodes(self, node=None):
+        """
+        Iterates over the nodes already created below a node, parents before children.
+
+        Args:
+            node (TreeNode, optional): The first node, the root by default (not yielded).
+
+        Yields:
+            TreeNode: The nodes.
+        """
+        stack = list(reversed((node or self.root).children))
+        while stack:
+            current = stack.pop()
+            yield current
+            stack.extend(reversed(current.children))
+
+    # Interface do QAbstractItemModel
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.node(parent).children[row].node_id)
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_for_node(self.node(index).parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node.is_production:
+            return False
+        # O conteúdo de um shard não lido é lido quando a pasta é expandida
+        return node.unloaded or self.entry_count(node) > 0
+
+    def canFetchMore(self, parent):
+        return self.node(parent).has_unfetched()
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        # Os sinais de inserção podem levar uma view a pedir mais linhas durante a inserção
+        if self._fetching or not node.has_unfetched():
+            return
+        if node.pending is None:
+            folder = self.folder_for_node(node)
+            node.pending = sorted(key for key, value in folder.items() if is_entry(key, value))
+            node.fetch_pos = 0
+            node.size = None
+        else:
+            folder = self.folder_for_node(node)
+        names = node.pending[node.fetch_pos:node.fetch_pos + FETCH_BATCH_SIZE]
+        if not names:
+            return
+        first = len(node.children)
+        self._fetching = True
+        try:
+            self.beginInsertRows(parent, first, first + len(names) - 1)
+            node.children.extend(self._register(build_node(name, folder.get(name), node)) for name in names)
+            node.fetch_pos += len(names)
+            if node.fetch_pos == len(node.pending):
+                # Tudo criado: a lista de nomes não é mais necessária
+                node.pending, node.fetch_pos = [], 0
+            self.endInsertRows()
+        finally:
+            self._fetching = False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = self.node(index)
+        if role == Qt.DisplayRole:
+            if node.is_production:
+                # During loading the production may not have arrived yet
+                prod_data = get_summary(self.tree["productions"], node.name, {})
+                return f"{prod_data.get('title', node.name)} ({node.name})"
+            if node.unloaded:
+                return node.name
+            return f"{node.name} ({self.entry_count(node)})"
+        if role == Qt.DecorationRole:
+            return self.file_icon if node.is_production else self.folder_icon
+        if role == Qt.UserRole:
+            return (node.name, node.parent.path()) if node.is_production else None
+        if role == Qt.BackgroundRole and node is self.highlighted:
+            return QBrush(QColor(HIGHLIGHT_COLOR))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return "Folder structure"
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        if not self.node(index).is_production:
+            flags |= Qt.ItemIsDropEnabled
+        return flags
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [TREE_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # Os dados são movidos pela CustomTreeView; o conteúdo só identifica os itens
+        mime = QMimeData()
+        paths = [self.path_for_index(index) for index in indexes]
+        mime.setData(TREE_MIME_TYPE, json.dumps(paths).encode('utf-8'))
+        return mime
+
+    # Mudanças da estrutura
+
+    def set_highlighted(self, index):
+        """
+        Highlights the background of an item (the drop target during a drag).
+
+        Args:
+            index (QModelIndex): The item, or None to clear the highlight.
+        """
+        previous = self.highlighted
+        self.highlighted = self.node(index) if index is not None and index.isValid() else None
+        for node in (previous, self.highlighted):
+            if node is not None and node.parent is not None:
+                changed = self.index_for_node(node)
+                self.dataChanged.emit(changed, changed, [Qt.BackgroundRole])
+
+    def _entries_changed(self, node):
+        # O número de entradas aparece no texto da pasta
+        if node.pending is None:
+            node.size = None
+        if node.parent is not None:
+            index = self.index_for_node(node)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def _add_entry(self, parent, name, value):
+        if parent.in_fetched_range(name):
+            row = parent.insert_position(name)
+            self.beginInsertRows(self.index_for_node(parent), row, row)
+            parent.children.insert(row, self._register(build_node(name, value, parent)))
+            self.endInsertRows()
+        elif parent.pending is not None:
+            # Ainda sem linha: o nome entra na lista de nomes pendentes
+            bisect.insort(parent.pending, name, parent.fetch_pos)
+        self._entries_changed(parent)
+
+    def _remove_entry(self, parent, name):
+        node = parent.child_named(name)
+        if node is not None:
+            row = parent.children.index(node)
+            self.beginRemoveRows(self.index_for_node(parent), row, row)
+            del parent.children[row]
+            self._unregister(node)
+            node.parent = None
+            if self.highlighted is node:
+                self.highlighted = None
+            self.endRemoveRows()
+        elif parent.pending is not None and name in parent.pending[parent.fetch_pos:]:
+            parent.pending.remove(name)
+        self._entries_changed(parent)
+
+    def _has_entry(self, parent, name):
+        if parent.pending is None:
+            return False
+        return parent.child_named(name) is not None or name in parent.pending[parent.fetch_pos:]
+
+    def _value_at(self, path):
+        value = self.tree["structure"]
+        for name in path:
+            value = value[name]
+        return value
+
+    def insert_node(self, parent_path, name, value):
+        """
+        Shows a folder or production added to the structure.
+
+        Args:
+            parent_path (list): The folder that received the entry.
+            name (str): The folder name or production ID.
+            value (dict or None): The added folder dict, or None for a production.
+        """
+        parent = self.node_for_path(parent_path, fetch=False)
+        if parent is None or not name:
+            return
+        if self._has_entry(parent, name):
+            # A entrada foi substituída
+            self._remove_entry(parent, name)
+        self._add_entry(parent, name, value)
+
+    def remove_node(self, path):
+        """
+        Hides a folder or production removed from the structure.
+
+        Args:
+            path (list): The removed entry.
+        """
+        parent = self.node_for_path(path[:-1], fetch=False)
+        if parent is not None and path:
+            self._remove_entry(parent, path[-1])
+
+    def move_node(self, src, dst):
+        """
+        Shows an entry moved to another folder. An entry that keeps its row is moved
+        with its subfolders, so they stay expanded.
+
+        Args:
+            src (list): The path of the entry before the move.
+            dst (list): The folder that received it.
+        """
+        name = src[-1]
+        source = self.node_for_path(src[:-1], fetch=False)
+        target = self.node_for_path(dst, fetch=False)
+        if target is not None and self._has_entry(target, name):
+            # A entrada de mesmo nome no destino foi substituída
+            self._remove_entry(target, name)
+        node = source.child_named(name) if source is not None else None
+
+        if node is not None and target is not None and target.in_fetched_range(name):
+            row = source.children.index(node)
+            dest_row = target.insert_position(name)
+            if self.beginMoveRows(self.index_for_node(source), row, row, self.index_for_node(target), dest_row):
+                del source.children[row]
+                node.parent = target
+                target.children.insert(dest_row, node)
+                self._rekey(node, target.key + (name,))
+                self.endMoveRows()
+                self._entries_changed(source)
+                self._entries_changed(target)
+                return
+
+        if source is not None:
+            self._remove_entry(source, name)
+        if target is not None:
+            try:
+                value = self._value_at(dst + [name])
+            except (KeyError, TypeError):
+                # Destino dentro da própria entrada
+                return
+            self._add_entry(target, name, value)
+
+    def rename_node(self, path, name):
+        """
+        Shows a renamed folder or production, moving it to its new sorted position.
+
+        Args:
+            path (list): The path of the entry before the rename.
+            name (str): The new name.
+        """
+        parent = self.node_for_path(path[:-1], fetch=False)
+        if parent is None:
+            return
+        node = parent.child_named(path[-1])
+        if node is None or not parent.in_fetched_range(name):
+            self._remove_entry(parent, path[-1])
+            self._add_entry(parent, name, self._value_at(path[:-1] + [name]))
+            return
+
+        row = parent.children.index(node)
+        del parent.children[row]
+        new_row = parent.insert_position(name)
+        parent.children.insert(row, node)
+
+        # Posição de destino contada antes de a linha sair do lugar
+        dest_row = new_row + 1 if new_row >= row else new_row
+        if dest_row not in (row, row + 1):
+            parent_index = self.index_for_node(parent)
+            self.beginMoveRows(parent_index, row, row, parent_index, dest_row)
+            del parent.children[row]
+            parent.children.insert(new_row, node)
+            node.name = name
+            self._rekey(node, parent.key + (name,))
+            self.endMoveRows()
+        else:
+            node.name = name
+            self._rekey(node, parent.key + (name,))
+        self.refresh_node(path[:-1] + [name])
+
+    def refresh_node(self, path):
+        """
+        Redraws an entry whose text changed (for example, the title of a production).
+
+        Args:
+            path (list): The entry.
+        """
+        node = self.node_for_path(path, fetch=False)
+        if node is not None and node.parent is not None:
+            index = self.index_for_node(node)
+            self.dataChanged.emit(index, index)
+
+    def reload_children(self, path):
+        """
+        Rebuilds the rows inside a folder whose content was replaced (for example, a
+        shard read from disk).
+
+        Args:
+            path (list): The folder.
+        """
+        node = self.node_for_path(path, fetch=False)
+        if node is None or node.is_production:
+            return
+        index = self.index_for_node(node)
+        if node.children:
+            self.beginRemoveRows(index, 0, len(node.children) - 1)
+            for child in node.children:
+                self._unregister(child)
+            node.children = []
+            self.endRemoveRows()
+        node.pending = None
+        node.fetch_pos = 0
+        node.unloaded = is_unloaded_shard(self.folder_for_node(node))
+        self._entries_changed(node)
+        self.fetchMore(index)
@@ -0,0 +1,132 @@
+from academic_publication_manager.modules.journal import get_folder, sync_key, sync_path
+
+# Número máximo de passos guardados para desfazer
+UNDO_LIMIT = 50
+
+
+def inverse_changes(data, record):
+    """
+    Computes the changes that undo a change record, from the data tree as it is
+    before the record is applied.
+
+    The records are in the format of journal.apply_change(). Folders and productions
+    removed or replaced by the change are kept by reference in the returned records;
+    they are detached from the tree, so nothing changes them until they are restored.
+    The sync state dropped with a folder is restored by "sync" records.
+
+    Args:
+        data (dict): Tree with the keys "structure" and "productions".
+        record (dict): The change, not yet applied.
+
+    Returns:
+        list: The records that undo the change, in the order they must be applied.
+    """
+    op = record["op"]
+    structure = data["structure"]
+    productions = data["productions"]
+
+    if op == "add":
+        path = list(record["path"]) + [record["name"]]
+        added = [prod_id for prod_id in record.get("productions", {}) if prod_id not in productions]
+        return [dict(op="remove", path=path, productions=added)] + _restore(data, path)
+
+    if op == "remove":
+        path = list(record["path"])
+        parent = get_folder(structure, path[:-1])
+        if path[-1] not in parent:
+            return []
+        removed = {prod_id: productions[prod_id] for prod_id in record.get("productions", [])
+                   if prod_id in productions}
+        return ([dict(op="add", path=path[:-1], name=path[-1], node=parent[path[-1]], productions=removed)]
+                + _restore_sync(data, path))
+
+    if op == "move":
+        src, dst = list(record["src"]), list(record["dst"])
+        return [dict(op="move", src=dst + src[-1:], dst=src[:-1])] + _restore(data, dst + src[-1:])
+
+    if op == "rename":
+        path = list(record["path"])
+        new_path = path[:-1] + [record["name"]]
+        undo = dict(op="rename", path=new_path, name=path[-1])
+        if record.get("production"):
+            undo["production"] = True
+        return [undo] + _restore(data, new_path)
+
+    if op == "update-field":
+        production = productions.get(record["id"], {})
+        return [dict(op="update-field", id=record["id"], key=record["key"],
+                     value=production.get(record["key"], ""))]
+
+    if op == "sync":
+        state = data.get("sync", {}).get(sync_key(record["path"]), {})
+        hashes = state.get("hashes", {})
+        return [dict(op="sync", path=list(record["path"]), file=state.get("file"),
+                     hashes={prod_id: hashes.get(prod_id) for prod_id in record["hashes"]})]
+
+    raise ValueError(f"Unknown journal operation: {op}")
+
+
+def _restore(data, path):
+    # Entrada substituída pela mudança: volta depois que a mudança é desfeita
+    try:
+        parent = get_folder(data["structure"], path[:-1])
+    except (KeyError, TypeError):
+        return []
+    if not isinstance(parent, dict) or path[-1] not in parent:
+        return []
+    return ([dict(op="add", path=path[:-1], name=path[-1], node=parent[path[-1]], productions={})]
+            + _restore_sync(data, path))
+
+
+def _restore_sync(data, path):
+    # Estado de sincronização da pasta e das subpastas, descartado junto com elas
+    if not data.get("sync") or get_folder(data["structure"], path) is None:
+        return []
+    records = []
+    for key, state in data.get("sync", {}).items():
+        folder = sync_path(key)
+        if folder[:len(path)] == path:
+            records.append(dict(op="sync", path=folder, file=state["file"], hashes=dict(state["hashes"])))
+    return records
+
+
+class UndoStack:
+    """
+    Steps that can be undone, each one the changes of one user action.
+
+    Attributes:
+        steps (list): (label, records) of each step, the last one on top; the records
+            undo the action when applied in order.
+    """
+
+    def __init__(self, limit=UNDO_LIMIT):
+        self.limit = limit
+        self.steps = []
+
+    def push(self, label, records):
+        """
+        Args:
+            label (str): Description of the action, shown in the menu.
+            records (list): The records that undo the action.
+        """
+        if not records:
+            return
+        self.steps.append((label, records))
+        del self.steps[:-self.limit]
+
+    def pop(self):
+        """
+        Returns:
+            tuple: (label, records) of the last step, or None if there is none.
+        """
+        return self.steps.pop() if self.steps else None
+
+    def clear(self):
+        self.steps = []
+
+    def label(self):
+        """
+        Returns:
+            str: The label of the step undone next, or None.
+        """
+        return self.steps[-1][0] if self.steps else None
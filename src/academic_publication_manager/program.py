@@ -4,18 +4,21 @@ import uuid
 import os
 import signal
 import copy
+import multiprocessing
 
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QTreeWidgetItem,
-                             QTableWidgetItem, QLineEdit, QFormLayout, 
-                             QLabel, QTextEdit, QFileDialog, QStatusBar, 
+from PyQt5.QtWidgets import (QApplication, QMainWindow,
+                             QFileDialog, QStatusBar, 
                              QInputDialog, QMessageBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon
 
 
 import academic_publication_manager.about as about
 
 from academic_publication_manager.modules.resources import resource_path
+from academic_publication_manager.modules.icons import get_icon, preload_icons
+from academic_publication_manager.modules.prodindex import ProductionIndex
+from academic_publication_manager.modules.tablemodel import fit_columns
+from academic_publication_manager.modules.undo import UndoStack
 
 from academic_publication_manager.desktop import create_desktop_file
 from academic_publication_manager.desktop import create_desktop_directory
@@ -40,18 +43,24 @@ class BibManager(QMainWindow, BaseContextMenu, BaseToolBar, BaseMenuBar, BaseBod
         Sets up the main window, initializes data structures, and creates UI elements.
         """
         super().__init__()
+        # Os ícones são decodificados uma vez e compartilhados pela árvore, menus e barras
+        preload_icons()
         self.setWindowTitle(about.__program_name__)
         self.setGeometry(100, 100, 1200, 600)
         
         ## Icon
         # Get base directory for icons
         self.icon_path = resource_path('icons', 'logo.png')
-        self.setWindowIcon(QIcon(self.icon_path)) 
+        self.setWindowIcon(get_icon('logo.png')) 
         
         
         self.data = {"structure": {"Root":{}}, "productions": {}}
         self.current_file = None
         self.current_prod_id = None
+        self.storage = None
+        self.pending_changes = []
+        self.production_index = ProductionIndex()
+        self.undo_stack = UndoStack()
         
         self.init_menubar()
         self.init_toolbar()
@@ -60,132 +69,110 @@ class BibManager(QMainWindow, BaseContextMenu, BaseToolBar, BaseMenuBar, BaseBod
         
         self.update_tree()
         
-        self.table_widget.setRowCount(0)
+        self.table_model.clear()
         self.metadata_panel.setEnabled(False)
         self.save_metadata_btn.setEnabled(False)
         self.current_prod_id = None
 
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        self.init_save_scheduler()
+        self.init_loading_indicator()
+        self.init_import_indicator()
+        self.init_export_jobs()
+
+    def closeEvent(self, event):
+        """
+        Compacts the change journal into the tree file before closing the window.
+        """
+        self.cancel_loading()
+        self.cancel_bib_import()
+        self.wait_bib_exports()
+        self.compact_tree_file()
+        self.save_scheduler.shutdown()
+        if self.storage is not None:
+            self.storage.close_session()
+        super().closeEvent(event)
 
     def get_expanded_items(self):
         """
-        Collects all currently expanded items in the tree widget.
+        Collects all currently expanded items in the tree view.
         
         Returns:
             list: A list of paths to all expanded items, where each path is a list of strings.
         """
         expanded = []
-        def collect_expanded(item, path):
-            # Definir text apenas para itens não-raiz
-            text = None
-            if item != self.tree_widget.invisibleRootItem():
-                text = item.text(0).split(" (")[0]
-            # Verificar se o item está expandido
-            if item.isExpanded() and text:  # Só adicionar se tiver texto (exclui raiz)
-                expanded.append(path + [text])
-            # Iterar pelos filhos
-            for i in range(item.childCount()):
-                new_path = path + [text] if text else path
-                collect_expanded(item.child(i), new_path)
-        collect_expanded(self.tree_widget.invisibleRootItem(), [])
+        for path, node in self.tree_model.path_items():
+            if node.children and self.tree_view.isExpanded(self.tree_model.index_for_node(node)):
+                expanded.append(list(path))
         return expanded
 
 
     def restore_expanded_items(self, expanded_items):
         """
-        Restores the expanded state of items in the tree widget based on saved paths.
+        Restores the expanded state of items in the tree view based on saved paths.
         
         Args:
             expanded_items (list): List of paths to items that should be expanded.
         """
-        def find_and_expand(item, path):
-            if not path:
-                return
-            # Definir text apenas para itens não-raiz
-            text = None
-            if item != self.tree_widget.invisibleRootItem():
-                text = item.text(0).split(" (")[0]
-            if text and path[0] == text:
-                item.setExpanded(True)
-                next_path = path[1:]
-            else:
-                next_path = path
-            for i in range(item.childCount()):
-                find_and_expand(item.child(i), next_path)
         for path in expanded_items:
-            find_and_expand(self.tree_widget.invisibleRootItem(), path)
+            index = self.tree_model.index_for_path(path)
+            if index is not None:
+                self.tree_view.setExpanded(index, True)
 
 
-    def clean_structure(self, structure):
+    def clean_structure(self, structure, path=None):
         """
         Recursively removes empty nodes from the folder structure.
         
         Args:
             structure (dict): The folder structure to clean.
+            path (list, optional): Path of structure. Defaults to None.
+            
+        Returns:
+            list: The paths of the removed nodes.
         """
+        if path is None:
+            path = []
+        removed = []
         if not isinstance(structure, dict):
-            return
+            return removed
         keys_to_remove = []
         for key, value in structure.items():
             if value is None and key not in self.data.get("productions", {}):
                 keys_to_remove.append(key)
             elif isinstance(value, dict):
-                self.clean_structure(value)
+                removed.extend(self.clean_structure(value, path + [key]))
         for key in keys_to_remove:
             structure.pop(key, None)
+            self.production_index.remove(path + [key])
+            removed.append(path + [key])
+        return removed
 
-    def get_item_path(self, item):
+    def get_item_path(self, index):
         """
-        Gets the path to a tree widget item as a list of folder names.
+        Gets the path to a tree item as a list of folder names.
         
         Args:
-            item (QTreeWidgetItem): The item to get the path for.
+            index (QModelIndex): The item to get the path for.
             
         Returns:
-            list: The path from root to the item as a list of strings.
+            list: The path from root to the item as a list of strings; for a production
+            the last element is its ID.
         """
-        path = []
-        while item and item != self.tree_widget.invisibleRootItem():
-            text = item.text(0).split(" (")[0]
-            path.append(text)
-            item = item.parent()
-        return path[::-1]
+        return self.tree_model.path_for_index(index)
 
 
     def update_tree(self):
         """
-        Clears and repopulates the tree widget with the current folder structure.
-        """
-        self.tree_widget.clear()
-        self.populate_tree(self.data["structure"], self.tree_widget.invisibleRootItem())
+        Rebuilds the whole tree view from the current folder structure.
 
-    def populate_tree(self, structure, parent, path=None):
+        Only needed when the data tree is replaced; the changes of the structure update
+        the affected rows through the methods of StructureModel.
         """
-        Recursively populates the tree widget with items from the folder structure.
-        
-        Args:
-            structure (dict): The folder structure to display.
-            parent (QTreeWidgetItem): The parent item in the tree widget.
-            path (list, optional): Current path in the folder structure. Defaults to None.
-        """
-        if path is None:
-            path = []
-        if not isinstance(structure, dict):
-            return
-        for key, value in sorted(structure.items()):  # Ordenar para consistência
-            if not key:
-                continue
-            item = QTreeWidgetItem(parent)
-            item.setText(0, key)
-            if value is None and key in self.data.get("productions", {}):
-                prod_data = self.data["productions"][key]
-                item.setText(0, f"{prod_data.get('title', key)} ({key})")
-                item.setIcon(0, QIcon(resource_path('icons', 'file.png')))
-                item.setData(0, Qt.UserRole, (key, path))
-            elif isinstance(value, dict):
-                item.setIcon(0, QIcon(resource_path('icons', 'folder.png')))
-                self.populate_tree(value, item, path + [key])
+        self.production_index.rebuild(self.data["structure"])
+        self.undo_stack.clear()
+        self.tree_model.set_tree(self.data)
 
 
     def get_productions_in_folder(self, path):
@@ -198,38 +185,20 @@ class BibManager(QMainWindow, BaseContextMenu, BaseToolBar, BaseMenuBar, BaseBod
         Returns:
             list: List of tuples containing (production_id, path) for each production.
         """
-        productions = []
-        current = self.data["structure"]
-        for key in path:
-            current = current[key]
-        if not isinstance(current, dict):
-            return productions
-        
-        def collect_productions(structure, current_path):
-            for key, value in structure.items():
-                if value is None and key in self.data.get("productions", {}):
-                    productions.append((key, current_path))
-                elif isinstance(value, dict):
-                    collect_productions(value, current_path + [key])
-        
-        collect_productions(current, path)
-        return productions
+        self.ensure_loaded(path)
+        productions = self.data.get("productions", {})
+        return [(prod_id, prod_path) for prod_id, prod_path in self.production_index.productions_in(path)
+                if prod_id in productions]
 
     def update_table(self, production_ids):
         """
-        Updates the table widget with information about the specified productions.
+        Updates the table with information about the specified productions.
         
         Args:
             production_ids (list): List of tuples containing (production_id, path) to display.
         """
-        self.table_widget.setRowCount(len(production_ids))
-        for row, (prod_id, path) in enumerate(production_ids):
-            prod = self.data["productions"].get(prod_id, {})
-            if prod:
-                self.table_widget.setItem(row, 0, QTableWidgetItem(prod.get("title", "")))
-                self.table_widget.setItem(row, 1, QTableWidgetItem(prod.get("year", "")))
-                self.table_widget.setItem(row, 2, QTableWidgetItem(prod_id))
-        self.table_widget.resizeColumnsToContents()
+        self.table_model.set_productions(self.data["productions"], production_ids)
+        fit_columns(self.table_view)
 
     def load_metadata(self, prod_data):
         """
@@ -245,42 +214,9 @@ class BibManager(QMainWindow, BaseContextMenu, BaseToolBar, BaseMenuBar, BaseBod
         
         prod = self.data["productions"].get(prod_id, {})
         
-        form_layout = self.metadata_panel.layout()
-        
-        # apaga widgets anteriores
-        for row in reversed(range(form_layout.rowCount())):
-            label_item = form_layout.itemAt(row, QFormLayout.LabelRole)
-            field_item = form_layout.itemAt(row, QFormLayout.FieldRole)
-
-            # Se existir, pega o widget
-            label = label_item.widget() if label_item else None
-            field = field_item.widget() if field_item else None
-
-            # Apaga os widgets, mas não mexe no botão de salvar
-            for widget in (label, field):
-                if widget and widget != self.save_metadata_btn:
-                    widget.deleteLater()
-
-            # Remove a linha do layout
-            form_layout.removeRow(row)
-
-
-        #
-        self.metadata_fields = {}
-        for key, value in prod.items():
-            label = QLabel("<b>"+key + ":</b>")
-            if key in ["author","title","note"] :
-                edit = QTextEdit()
-                edit.setPlainText(str(value))
-            else:
-                edit = QLineEdit()
-                edit.setText(str(value))
-                
-            if key == 'entry-type':
-                edit.setReadOnly(True)
-                
-            form_layout.insertRow(form_layout.count() - 1, label, edit)
-            self.metadata_fields[key] = edit
+        # Os widgets do formulário são reaproveitados; só os valores mudam
+        form = self.metadata_forms.show(prod)
+        self.metadata_fields = form.fields
 
 
     def get_production_path(self, prod_id):
@@ -293,22 +229,16 @@ class BibManager(QMainWindow, BaseContextMenu, BaseToolBar, BaseMenuBar, BaseBod
         Returns:
             list: The folder path as a list of strings, or None if not found.
         """
-        def search_path(structure, current_path):
-            for key, value in structure.items():
-                if key == prod_id and value is None:
-                    return current_path
-                if isinstance(value, dict):
-                    result = search_path(value, current_path + [key])
-                    if result:
-                        return result
-            return None
-        return search_path(self.data["structure"], [])
+        return self.production_index.folder_of(prod_id)
 
 def main():
     """
     Main entry point for the application.
     Handles command line arguments and initializes the GUI.
     """
+    # Os processos da importação em paralelo não devem abrir a interface (executáveis congelados)
+    multiprocessing.freeze_support()
+
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
     create_desktop_directory()    
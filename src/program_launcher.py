@@ -24,6 +24,11 @@ python -m PyInstaller --onefile --windowed --name academic_publication_manager -
 
 '''
 
+import multiprocessing
+# Num executável do PyInstaller, os processos da importação de vários .bib rodam o
+# próprio executável: freeze_support() os desvia antes que abram outra janela
+multiprocessing.freeze_support()
+
 import os
 from PyQt5.QtCore import QLibraryInfo
 
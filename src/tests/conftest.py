@@ -0,0 +1,38 @@
+import copy
+
+import pytest
+
+from helpers import BACKENDS, Session, make_library
+
+
+@pytest.fixture
+def library():
+    return make_library()
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def open_tree(tmp_path):
+    """
+    Returns a function that opens a tree file of a backend with a new storage object.
+    """
+    def open_tree(backend, name="library"):
+        extension, factory = BACKENDS[backend]
+        return factory(str(tmp_path / (name + extension)))
+    return open_tree
+
+
+@pytest.fixture
+def stored_library(open_tree, library):
+    """
+    Returns a function that writes the library with a backend and opens it again.
+    """
+    def stored_library(backend):
+        open_tree(backend).write_tree(copy.deepcopy(library))
+        storage = open_tree(backend)
+        return Session(storage, storage.load())
+    return stored_library
@@ -0,0 +1,119 @@
+from academic_publication_manager.modules.journal   import apply_change, copy_folder, sync_key
+from academic_publication_manager.modules.prodindex import ProductionIndex
+from academic_publication_manager.modules.storage   import JsonStorage, GzipJsonStorage, XzJsonStorage
+from academic_publication_manager.modules.storage   import Bz2JsonStorage, SqliteStorage, ShardedStorage
+from academic_publication_manager.modules.treefile  import snapshot_tree
+
+# Nome do backend -> (extensão do arquivo, construtor)
+BACKENDS = {
+    "json":    (".Publications.json", lambda path: JsonStorage(path, use_cache=False)),
+    "cached":  (".Publications.json", lambda path: JsonStorage(path)),
+    "lazy":    (".Publications.json", lambda path: JsonStorage(path, lazy_min_size=0)),
+    "gzip":    (".Publications.json.gz", GzipJsonStorage),
+    "xz":      (".Publications.json.xz", XzJsonStorage),
+    "bz2":     (".Publications.json.bz2", Bz2JsonStorage),
+    "sqlite":  (".Publications.sqlite", SqliteStorage),
+    "sharded": (".Publications.manifest.json", ShardedStorage),
+}
+
+JOURNAL_BACKENDS = ["json", "cached", "lazy", "gzip", "xz", "bz2"]
+
+# Uma mudança de cada tipo, aplicáveis em sequência sobre make_library()
+EDITS = [
+    dict(op="update-field", id="author1_2001", key="title", value="A new title"),
+    dict(op="update-field", id="author1_2001", key="note", value="a field that did not exist"),
+    dict(op="add", path=["Root", "Group 0"], name="New folder",
+         node={"new2024": None, "author2_2002": None, "Sub": {}},
+         productions={"new2024": {"entry-type": "article", "title": "New", "year": "2024"}}),
+    dict(op="add", path=["Root", "Group 1", "Project 0"], name="single2023", node=None,
+         productions={"single2023": {"entry-type": "misc", "title": "Single", "year": "2023"}}),
+    dict(op="rename", path=["Root", "Group 2", "Project 2"], name="Renamed project"),
+    dict(op="rename", path=["Root", "Group 1", "Project 2", "author23_2003"], name="renamed_id", production=True),
+    dict(op="move", src=["Root", "Group 0", "Project 1"], dst=["Root"]),
+    dict(op="move", src=["Root", "Group 1", "Project 0", "author12_2012"], dst=["Root"]),
+    dict(op="remove", path=["Root", "Group 1", "Project 1"],
+         productions=["author16_2016", "author17_2017", "author18_2018", "author19_2019"]),
+    dict(op="sync", path=["Root", "Group 0", "New folder"], file="/tmp/new.bib",
+         hashes={"new2024": "1" * 40}),
+]
+
+
+def make_library(n_groups=3, n_projects=3, per_folder=4):
+    """
+    Builds a small data tree: Root/Group g/Project p with productions, one production
+    filed in two folders, one filed directly in Root and a "sync" section.
+
+    Returns:
+        dict: Tree with the keys "structure", "productions" and "sync".
+    """
+    structure = {"Root": {}}
+    productions = {}
+    n = 0
+    for g in range(n_groups):
+        group = structure["Root"][f"Group {g}"] = {}
+        for p in range(n_projects):
+            project = group[f"Project {p}"] = {}
+            for _ in range(per_folder):
+                prod_id = f"author{n}_{2000 + n % 20}"
+                productions[prod_id] = {
+                    "entry-type": "article" if n % 3 else "book",
+                    "title": f"On the example number {n} – ação",
+                    "author": f"Author{n}, A. and Other, B.",
+                    "year": str(2000 + n % 20),
+                    "journal": "Journal of Examples",
+                }
+                project[prod_id] = None
+                n += 1
+    shared = next(iter(structure["Root"]["Group 0"]["Project 0"]))
+    structure["Root"]["Group 1"]["Project 1"][shared] = None
+    productions["loose2020"] = {"entry-type": "misc", "title": "Filed in Root", "year": "2020"}
+    structure["Root"]["loose2020"] = None
+    sync = {sync_key(["Root", "Group 2", "Project 2"]): {"file": "/tmp/lib.bib", "hashes": {shared: "0" * 40}}}
+    return {"structure": structure, "productions": productions, "sync": sync}
+
+
+def plain(data):
+    """
+    Converts a data tree to plain dicts, to compare trees read by different backends.
+    """
+    return {
+        "structure": copy_folder(data["structure"]),
+        "productions": {prod_id: dict(production.items()) for prod_id, production in data["productions"].items()},
+        "sync": data.get("sync", {}),
+    }
+
+
+class Session:
+    """
+    Works on a stored tree the way the main window does: every change is applied to the
+    data tree, reported to the backend and saved either as journal records or as a full
+    snapshot, as the backend prefers.
+    """
+
+    def __init__(self, storage, data):
+        self.storage = storage
+        self.data = data
+        self.index = ProductionIndex()
+        self.index.rebuild(data["structure"])
+        self.pending = []
+
+    def apply(self, records):
+        for record in records:
+            apply_change(self.data, record)
+            record = dict(record)
+            if isinstance(record.get("node"), dict):
+                record["node"] = copy_folder(record["node"])
+            self.pending.append(record)
+            self.index.apply(record)
+            self.storage.note_change(self.data, record, self.index)
+
+    def save(self):
+        pending, self.pending = self.pending, []
+        if self.storage.needs_full_write(len(pending)):
+            self.storage.write_tree(snapshot_tree(self.data))
+        elif pending:
+            self.storage.apply_changes(pending)
+
+    def compact(self):
+        self.pending = []
+        self.storage.write_tree(snapshot_tree(self.data))
@@ -0,0 +1,199 @@
+import os
+import sys
+import copy
+import json
+import socket
+import subprocess
+
+import pytest
+
+from academic_publication_manager.modules import storage as storage_module
+from academic_publication_manager.modules.journal import ChangeJournal, SessionMarker, journal_path
+
+from helpers import EDITS, JOURNAL_BACKENDS, Session, plain
+
+
+def dead_pid():
+    # Pid de um processo que já terminou
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def crash(storage):
+    # O processo termina sem close_session(): o marcador fica com o pid de um processo morto
+    with open(storage.session.path, 'w', encoding='utf-8') as f:
+        json.dump({"pid": dead_pid(), "host": socket.gethostname()}, f)
+
+
+@pytest.fixture(params=JOURNAL_BACKENDS)
+def journal_backend(request):
+    return request.param
+
+
+def test_crash_after_save(backend, open_tree, stored_library):
+    session = stored_library(backend)
+    session.storage.open_session()
+    for edit in EDITS:
+        session.apply([copy.deepcopy(edit)])
+        session.save()
+    crash(session.storage)
+
+    storage = open_tree(backend)
+    assert plain(storage.load()) == plain(session.data)
+    assert storage.unclean_shutdown
+
+
+def test_clean_close(backend, open_tree, stored_library):
+    session = stored_library(backend)
+    session.storage.open_session()
+    session.apply(copy.deepcopy(EDITS[:2]))
+    session.save()
+    session.storage.close_session()
+
+    storage = open_tree(backend)
+    storage.load()
+    assert not storage.unclean_shutdown
+    assert not os.path.exists(storage.session.path)
+
+
+def test_replay_journal(journal_backend, open_tree, stored_library):
+    session = stored_library(journal_backend)
+    session.apply(copy.deepcopy(EDITS))
+    session.save()
+    assert os.path.exists(journal_path(session.storage.path))
+
+    storage = open_tree(journal_backend)
+    assert plain(storage.load()) == plain(session.data)
+    assert storage.recovered_changes == len(EDITS)
+
+
+def test_torn_last_record(journal_backend, open_tree, stored_library):
+    session = stored_library(journal_backend)
+    session.apply(copy.deepcopy(EDITS[:4]))
+    session.save()
+    expected = plain(session.data)
+    session.apply(copy.deepcopy(EDITS[4:5]))
+    session.save()
+
+    # O último registro foi cortado no meio da gravação
+    path = journal_path(session.storage.path)
+    with open(path, 'rb+') as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    storage = open_tree(journal_backend)
+    data = storage.load()
+    assert plain(data) == expected
+    assert storage.recovered_changes == 4
+
+    # A próxima gravação descarta a linha incompleta
+    session = Session(storage, data)
+    session.apply(copy.deepcopy(EDITS[5:]))
+    session.save()
+    assert plain(open_tree(journal_backend).load()) == plain(session.data)
+
+
+def test_corrupted_record_stops_replay(journal_backend, open_tree, stored_library):
+    session = stored_library(journal_backend)
+    session.apply(copy.deepcopy(EDITS[:1]))
+    expected = plain(session.data)
+    session.apply(copy.deepcopy(EDITS[1:3]))
+    session.save()
+
+    path = journal_path(session.storage.path)
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    # Um byte trocado no segundo registro: o CRC não confere
+    lines[2] = lines[2].replace(b"note", b"nota")
+    with open(path, 'wb') as f:
+        f.write(b"".join(lines))
+
+    storage = open_tree(journal_backend)
+    assert plain(storage.load()) == expected
+    assert storage.recovered_changes == 1
+
+
+def test_journal_of_another_tree_file_is_ignored(journal_backend, open_tree, stored_library, library):
+    session = stored_library(journal_backend)
+    session.apply(copy.deepcopy(EDITS[:3]))
+    session.save()
+    path = journal_path(session.storage.path)
+    with open(path, 'rb') as f:
+        journal = f.read()
+
+    # O arquivo foi reescrito, mas o processo morreu antes de apagar o journal
+    rewritten = copy.deepcopy(library)
+    rewritten["productions"]["loose2020"]["title"] = "Rewritten"
+    open_tree(journal_backend).write_tree(rewritten)
+    with open(path, 'wb') as f:
+        f.write(journal)
+
+    storage = open_tree(journal_backend)
+    assert plain(storage.load()) == plain(rewritten)
+    assert storage.recovered_changes == 0
+
+
+def test_journal_without_header_is_ignored(journal_backend, open_tree, stored_library, library):
+    session = stored_library(journal_backend)
+    session.apply(copy.deepcopy(EDITS[:3]))
+    session.save()
+    path = journal_path(session.storage.path)
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(path, 'wb') as f:
+        f.write(b"".join(lines[1:]))
+
+    storage = open_tree(journal_backend)
+    assert plain(storage.load()) == plain(library)
+    assert storage.recovered_changes == 0
+
+
+def test_journal_is_compacted(journal_backend, open_tree, stored_library, monkeypatch):
+    monkeypatch.setattr(storage_module, "JOURNAL_COMPACT_LIMIT", 3)
+    session = stored_library(journal_backend)
+    path = journal_path(session.storage.path)
+    for edit in EDITS[:3]:
+        session.apply([copy.deepcopy(edit)])
+        session.save()
+    assert session.storage.journal.count == 3
+
+    session.apply([copy.deepcopy(EDITS[3])])
+    session.save()
+    assert not os.path.exists(path)
+    storage = open_tree(journal_backend)
+    assert plain(storage.load()) == plain(session.data)
+    assert storage.recovered_changes == 0
+
+
+def test_journal_append_and_read(tmp_path):
+    tree_path = str(tmp_path / "library.Publications.json")
+    journal = ChangeJournal(tree_path)
+    journal.base = "0" * 64
+    journal.append(copy.deepcopy(EDITS[:2]))
+    journal.append(copy.deepcopy(EDITS[2:4]))
+
+    reader = ChangeJournal(tree_path)
+    reader.base = "0" * 64
+    assert reader.read() == EDITS[:4]
+    assert reader.count == 4
+
+    reader.base = "1" * 64
+    assert reader.read() == []
+
+
+def test_session_marker(tmp_path):
+    tree_path = str(tmp_path / "library.Publications.json")
+    marker = SessionMarker(tree_path)
+    assert not marker.is_stale()
+
+    marker.create()
+    assert not marker.is_stale()
+    marker.remove()
+    assert not os.path.exists(marker.path)
+
+    with open(marker.path, 'w', encoding='utf-8') as f:
+        json.dump({"pid": dead_pid(), "host": socket.gethostname()}, f)
+    assert marker.is_stale()
+    # O marcador de outro processo não é removido
+    marker.remove()
+    assert os.path.exists(marker.path)
@@ -0,0 +1,169 @@
+import os
+import copy
+import json
+
+import pytest
+
+from academic_publication_manager.modules.storage import storage_for_path, convert_tree_file
+from academic_publication_manager.modules.undo    import inverse_changes
+
+from helpers import BACKENDS, EDITS, Session, make_library, plain
+
+
+def reopen(open_tree, backend):
+    return open_tree(backend).load()
+
+
+def without_empty_fields(data):
+    # Um campo vazio equivale a um campo ausente: é assim que o undo desfaz um campo novo
+    data = plain(data)
+    data["productions"] = {prod_id: {key: value for key, value in production.items() if value != ""}
+                           for prod_id, production in data["productions"].items()}
+    return data
+
+
+def test_write_and_load(backend, open_tree, library):
+    open_tree(backend).write_tree(copy.deepcopy(library))
+    assert plain(reopen(open_tree, backend)) == plain(library)
+
+
+@pytest.mark.parametrize("edit", EDITS, ids=lambda edit: edit["op"])
+def test_reopen_after_each_edit(backend, open_tree, stored_library, edit):
+    session = stored_library(backend)
+    session.apply([copy.deepcopy(edit)])
+    session.save()
+    assert plain(reopen(open_tree, backend)) == plain(session.data)
+
+
+def test_reopen_after_many_saves(backend, open_tree, stored_library):
+    session = stored_library(backend)
+    for edit in EDITS:
+        session.apply([copy.deepcopy(edit)])
+        session.save()
+    expected = plain(session.data)
+    assert plain(reopen(open_tree, backend)) == expected
+    # Sync state follows the renamed and the removed folders
+    assert set(expected["sync"]) == {'["Root", "Group 2", "Renamed project"]', '["Root", "Group 0", "New folder"]'}
+
+    # Compacting gives the same tree
+    session.compact()
+    assert plain(reopen(open_tree, backend)) == expected
+
+
+def test_edits_after_reopen(backend, open_tree, stored_library):
+    session = stored_library(backend)
+    session.apply(copy.deepcopy(EDITS[:4]))
+    session.save()
+
+    storage = open_tree(backend)
+    session = Session(storage, storage.load())
+    session.apply(copy.deepcopy(EDITS[4:]))
+    session.save()
+    assert plain(reopen(open_tree, backend)) == plain(session.data)
+
+
+def test_undo_restores_saved_tree(backend, open_tree, stored_library, library):
+    session = stored_library(backend)
+    undo = []
+    for edit in EDITS:
+        edit = copy.deepcopy(edit)
+        undo[:0] = inverse_changes(session.data, edit)
+        session.apply([edit])
+    session.save()
+    assert plain(reopen(open_tree, backend)) != plain(library)
+
+    session.apply(undo)
+    session.save()
+    assert without_empty_fields(session.data) == plain(library)
+    assert without_empty_fields(reopen(open_tree, backend)) == plain(library)
+
+
+def test_undo_of_folder_changed_before_save(backend, open_tree, stored_library, library):
+    # The restored folder is changed again before the save that writes it
+    session = stored_library(backend)
+    remove = dict(op="remove", path=["Root", "Group 0"], productions=[])
+    undo = inverse_changes(session.data, remove)
+    session.apply([remove])
+    session.save()
+    session.apply(undo)
+    session.apply([dict(op="move", src=["Root", "Group 0", "Project 2"], dst=["Root"]),
+                   dict(op="rename", path=["Root", "Project 2"], name="Project 2b")])
+    session.save()
+    assert plain(reopen(open_tree, backend)) == plain(session.data)
+
+
+@pytest.mark.parametrize("target", list(BACKENDS))
+def test_convert(tmp_path, library, target):
+    source = str(tmp_path / "source.Publications.json")
+    storage_for_path(source).write_tree(copy.deepcopy(library))
+    target_path = str(tmp_path / ("target" + BACKENDS[target][0]))
+    convert_tree_file(source, target_path)
+    assert plain(storage_for_path(target_path).load()) == plain(library)
+
+
+def test_sqlite_failed_save_keeps_previous_tree(open_tree, stored_library):
+    session = stored_library("sqlite")
+    expected = plain(session.data)
+    with pytest.raises(KeyError):
+        # A transação inteira é desfeita: o primeiro registro também não é gravado
+        session.storage.apply_changes([copy.deepcopy(EDITS[0]),
+                                       dict(op="move", src=["Root", "Missing", "x"], dst=["Root"])])
+    assert plain(reopen(open_tree, "sqlite")) == expected
+
+
+def test_sharded_failed_save_keeps_previous_tree(open_tree, stored_library, monkeypatch):
+    import academic_publication_manager.modules.storage as storage_module
+
+    session = stored_library("sharded")
+    expected = plain(session.data)
+    session.apply([copy.deepcopy(EDITS[0]), copy.deepcopy(EDITS[4])])
+
+    write = storage_module.atomic_write_json
+
+    def failing_write(path, data, *args, **kwargs):
+        if path == session.storage.path:
+            raise OSError("disk full")
+        return write(path, data, *args, **kwargs)
+
+    monkeypatch.setattr(storage_module, "atomic_write_json", failing_write)
+    with pytest.raises(OSError):
+        session.save()
+    # O manifesto antigo ainda aponta para os shards antigos
+    assert plain(reopen(open_tree, "sharded")) == expected
+
+    monkeypatch.setattr(storage_module, "atomic_write_json", write)
+    session.save()
+    assert plain(reopen(open_tree, "sharded")) == plain(session.data)
+    # Os shards gravados pela tentativa que falhou são apagados
+    manifest = json.loads(open(session.storage.path, encoding="utf-8").read())
+    assert sorted(os.listdir(session.storage.shard_dir)) == sorted(f"{shard_id}.json" for shard_id in manifest["shards"])
+
+
+def test_sharded_reads_only_needed_shards(open_tree, stored_library):
+    stored_library("sharded")
+    storage = open_tree("sharded")
+    data = {"structure": {}, "productions": {}}
+    for kind, key, value in storage.iter_load():
+        if kind == "section":
+            data[key] = value
+        else:
+            data["productions"][key] = value
+    storage.finish_load(data)
+    # Só o manifesto foi lido: a produção em Root, nenhuma de um shard
+    assert set(data["productions"]) == {"loose2020"}
+
+    assert storage.ensure_loaded(data, ["Root", "Group 1"]) == [["Root", "Group 1"]]
+    assert "author12_2012" in data["productions"] and "author0_2000" in data["productions"]
+    assert "author30_2010" not in data["productions"]
+
+
+def test_large_library(backend, open_tree):
+    library = make_library(n_groups=6, n_projects=6, per_folder=30)
+    open_tree(backend).write_tree(copy.deepcopy(library))
+    storage = open_tree(backend)
+    session = Session(storage, storage.load())
+    session.apply([dict(op="update-field", id=prod_id, key="year", value="1999")
+                   for prod_id in list(session.data["productions"])[::7]])
+    session.save()
+    assert plain(reopen(open_tree, backend)) == plain(session.data)
+    assert os.path.exists(storage.path)